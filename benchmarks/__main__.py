@@ -0,0 +1,11 @@
+import bench_tokenizer
+
+bench_tokenizer.run()
+
+import bench_stats
+
+bench_stats.run()
+
+import bench_dice
+
+bench_dice.run()
@@ -0,0 +1,54 @@
+import os
+import timeit
+
+from dice_roller.util import _dice, truerandom
+
+ROLLS = [(100, 6), (100, 7), (100, 100), (500, 20)]
+
+
+def per_die(dice, sides, times):
+    """
+    The way dice were rolled before bulk rolling, one die at a time.
+    """
+    return [dice.roll(sides) for _ in range(times)]
+
+
+def bulk(dice, sides, times):
+    return dice.roll_dice(sides, times)
+
+
+def sources(dice, number, times=500, sides=20):
+    """
+    Roll the same dice from every random source.
+
+    The seeded source rolls the same numbers on every run.  The entropy
+    pool is filled beforehand, so that random.org is never used.
+    """
+    print("Random sources: {}d{} x {} runs".format(times, sides, number))
+    truerandom.entropy.add(os.urandom(times * number * 4))
+    for name in truerandom.SOURCES:
+        source = truerandom.create_source(name, seed=1)
+        with dice.using(source):
+            elapsed = min(timeit.repeat(
+                lambda: dice.roll_dice(sides, times), number=number,
+                repeat=3))
+        print("  {:<10} {:8.2f} us/roll".format(
+            name, elapsed / number * 1e6))
+    truerandom.entropy.clear()
+
+
+def run(number=200):
+    print("Dice: {} rolls x {} runs".format(len(ROLLS), number))
+
+    dice = _dice.Dice()
+    for times, sides in ROLLS:
+        results = dict()
+        for func in [per_die, bulk]:
+            elapsed = min(timeit.repeat(
+                lambda: func(dice, sides, times), number=number, repeat=3))
+            results[func.__name__] = elapsed
+            print("  {:>3}d{:<4} {:<8} {:8.2f} us/roll".format(
+                times, sides, func.__name__, elapsed / number * 1e6))
+        print("  speedup: {:.2f}x".format(results['per_die'] / results['bulk']))
+
+    sources(dice, number)
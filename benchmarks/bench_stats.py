@@ -0,0 +1,93 @@
+import time
+
+import sqlalchemy
+import sqlalchemy.event
+
+from dice_roller import util
+from dice_roller.db import schema
+from dice_roller.bot.stats import Stats
+
+
+def character_sheet(size=200):
+    """
+    Create the values of a character sheet with the given number of stats.
+
+    The sheet has abilities, a modifier for each ability, and skills that
+    use a modifier and the proficiency bonus, which uses the level.
+    """
+    abilities = max(size // 10, 1)
+    values = {'level': '5', 'prof': 'ceil({level} / 4) + 1'}
+    for i in range(abilities):
+        values['a{}'.format(i)] = str(8 + i % 10)
+        values['m{}'.format(i)] = 'floor(({{a{}}} - 10) / 2)'.format(i)
+    for i in range(size - len(values)):
+        values['skill.s{}'.format(i)] = '{{m{}}} + {{prof}}'.format(
+            i % abilities)
+    return values
+
+
+def setup(values):
+    engine = sqlalchemy.create_engine('sqlite://')
+    schema.Base.metadata.create_all(engine)
+    session = sqlalchemy.orm.sessionmaker(bind=engine)()
+
+    server = schema.Server(id=1)
+    user = schema.User(id=1)
+    user.active_server = server
+    session.add_all([server, user])
+    for name, value in values.items():
+        group, name = name.split('.') if '.' in name else (None, name)
+        session.add(schema.Stat(user_id=1, server_id=1, group=group,
+                                name=name, value=value))
+    session.commit()
+
+    queries = [0]
+    sqlalchemy.event.listen(
+        engine, 'before_cursor_execute',
+        lambda *args: queries.__setitem__(0, queries[0] + 1))
+    return session, user, queries
+
+
+def recursive_calc_stat_value(session, user, stat):
+    """
+    The calculation that was used before the dependency graph.
+
+    It calculates a stat, then loads every stat of the user to search for
+    the stats that use it, and calculates them the same way.
+    """
+    stat.calc = None
+    util.dice.logging_enabled = True
+    eq = util.calculator.parse_args(stat.value, session, user,
+                                    use_calculated=False)
+    value = util.calculator.parse_equation(eq, session, user)
+    util.dice.logging_enabled = False
+    if not util.dice.rolled_dice:
+        stat.calc = value
+
+    name = stat.fullname
+    for st in user.stats.values():
+        if name in util.variables.getVariables(str(st.value).lower()):
+            recursive_calc_stat_value(session, user, st)
+
+
+def graph_calc_stat_value(session, user, stat):
+    Stats.calc_stat_value(session, user, stat)
+
+
+def run(size=200, edits=('level', 'a0', 'skill.s0')):
+    print("Stat recalculation: {} stats".format(size))
+
+    values = character_sheet(size)
+    for func in [recursive_calc_stat_value, graph_calc_stat_value]:
+        session, user, queries = setup(values)
+        stats = user.stats
+        for name in edits:
+            stat = stats[name]
+            queries[0] = 0
+            start = time.perf_counter()
+            with util.stats_cache.bypass():
+                func(session, user, stat)
+            elapsed = time.perf_counter() - start
+            session.rollback()
+            print("  {:<26} {:<9} {:8.2f} ms {:6} queries".format(
+                func.__name__, name, elapsed * 1e3, queries[0]))
@@ -0,0 +1,68 @@
+import re
+import timeit
+
+from dice_roller.util import _tokenizer
+
+# Roll strings as they look after the variables have been set
+CORPUS = [
+    '1d20',
+    '1d20 + 5',
+    '1d20+3',
+    '4d6',
+    'adv(20)',
+    'dis(20) + 2',
+    'top(4, 6, 3)',
+    '2d6 + 1d4 + 3',
+    '8d6',
+    '1d20 + floor((14 - 10) / 2) + 2',
+    'if(1d20 >= 15, 2d8 + 4, 0)',
+    'max(1d12, 1d12) + 7',
+    'mod:12(16) + 1d20',
+    '1d100 <= 45',
+    '(3 + 2)d6 - -1',
+    'round(1d20 * 1.5) + ceil(17 / 3)',
+    'and(1d20 > 10, 1d20 < 18)',
+    '10d10 + 10d10 + 10d10 + 10d10',
+]
+
+_strip_regex = re.compile(r"\s+")
+_parse_regex = re.compile(
+    r"((^|(?<=[^\d)]))[-][\d.]+|[\d.]+|[a-z]+(:[\d]+)?|:[\d]+|[<>=]+|[\W])")
+
+
+def regex_tokenize(string):
+    """
+    The tokenizer that was used before the single pass tokenizer.
+
+    It strips the string, splits it with a regex, and then classifies every
+    token by trying to convert it into a float.
+    """
+    stripped = re.sub(_strip_regex, "", string.lower())
+    tokens = list()
+    for token in [r[0] for r in re.findall(_parse_regex, stripped)]:
+        try:
+            tokens.append(float(token))
+        except ValueError:
+            tokens.append(token)
+    return tokens
+
+
+def single_pass_tokenize(string):
+    return _tokenizer.tokenize(string)
+
+
+def run(number=2000):
+    print("Tokenizer: {} strings x {} runs".format(len(CORPUS), number))
+
+    results = dict()
+    for func in [regex_tokenize, single_pass_tokenize]:
+        def run_corpus():
+            for string in CORPUS:
+                func(string)
+        elapsed = min(timeit.repeat(run_corpus, number=number, repeat=3))
+        results[func.__name__] = elapsed
+        print("  {:<22} {:8.2f} us/string".format(
+            func.__name__, elapsed / number / len(CORPUS) * 1e6))
+
+    print("  speedup: {:.2f}x".format(
+        results['regex_tokenize'] / results['single_pass_tokenize']))
@@ -4,7 +4,7 @@ import asyncio
 import discord
 from discord.ext import commands
 
-from .. import config, db
+from .. import config, db, util
 from ..config import config as conf
 
 from . import misc, dice, equations, stats, stat_config
@@ -39,6 +39,9 @@ class Bot:
         return [server.prefix, commands.when_mentioned(bot, message)]
 
     def setup(self):
+        # Start with the true random bytes that were left last time
+        util.dice.load_entropy()
+
         self.bot = commands.Bot(
             command_prefix=self.get_prefix,
             description=conf.config.description,
@@ -72,6 +75,8 @@ class Bot:
         self.bot.run(conf.config.token)
 
     def stop(self):
+        util.pool.close()
+        util.dice.save_entropy()
         if self.bot is None:
             return
         # Nothing can be done right now to stop the bot from outside the
@@ -123,26 +123,108 @@ class Dice:
             try:
                 if server is not None:
                     equation = util.calculator.parse_args(equation, session, user)
-                util.dice.logging_enabled = True
-                value = util.calculator.parse_equation(equation, session, user)
-                util.dice.logging_enabled = False
             except util.BadEquation as exception:
                 self.say(message, exception)
                 await self.send(message)
                 return
+            user_id, revision = util._pool.user_revision(user)
+            max_dice = util._pool.dice_budget(user)
 
-            dice = util.dice.rolled_dice
-            if dice:
-                self.say(message, self.print_dice(dice))
-                self.say(message, self.print_dice_one_liner(
-                    dice + [(value, None)]))
-
-            self.say(message, "**{}**".format(value))
+        try:
+            value, dice = await util.pool.run(
+                util._pool.evaluate, equation, user_id, revision,
+                max_dice=max_dice)
+        except util.BadEquation as exception:
+            self.say(message, exception)
             await self.send(message)
+            return
+
+        if dice:
+            self.say(message, self.print_dice(dice))
+            self.say(message, self.print_dice_one_liner(
+                dice + [(value, None)]))
+
+        self.say(message, "**{}**".format(value))
+        await self.send(message)
 
         if util.dice.low:
             asyncio.ensure_future(util.dice.load_random_buffer())
 
+    @commands.command(pass_context=True, aliases=['odds'])
+    async def prob(self, ctx: commands.Context, *, equation: str):
+        """
+        Calculates the odds of an equation.
+
+        Nothing is rolled, instead the exact odds of every result are found.
+        If the equation is too complex, the odds are estimated by calculating
+        it many times.
+
+        If the equation is a comparison, the chance that it is true is shown.
+
+        Example equations:
+
+          4d6 + {str}
+          1d20 + 5 >= 15
+        """
+
+        message = list()
+
+        with db.database.session() as session:
+            user, _ = db.database.getUserFromCtx(session, ctx)
+            server, _ = db.database.getServerFromCtx(session, ctx)
+
+            try:
+                if server is not None:
+                    equation = util.calculator.parse_args(equation, session,
+                                                          user)
+            except util.BadEquation as exception:
+                self.say(message, exception)
+                await self.send(message)
+                return
+            user_id, revision = util._pool.user_revision(user)
+
+        try:
+            # Nothing is rolled, so no entropy is lent
+            dist = await util.pool.run(
+                util._pool.evaluate_distribution, equation, user_id,
+                config.config.calculator.samples, revision, max_dice=0)
+        except util.BadEquation as exception:
+            self.say(message, exception)
+            await self.send(message)
+            return
+
+        if dist.is_condition:
+            self.say(message, "There is a{} **{:.2%}** chance".format(
+                '' if dist.exact else 'n estimated',
+                dist.probability(lambda v: v == 1)))
+            await self.send(message)
+            return
+
+        try:
+            summary = [
+                "mean     {:.2f}".format(dist.mean),
+                "std dev  {:.2f}".format(dist.stddev),
+                "range    {} to {}".format(dist.min, dist.max),
+            ]
+        except util.BadEquation as exception:
+            self.say(message, exception)
+            await self.send(message)
+            return
+
+        if not dist.exact:
+            self.say(message, "Estimated from {} rolls:".format(len(dist)))
+        self.say(message, "```python")
+        for line in summary:
+            self.say(message, line)
+        self.say(message, "")
+        self.say(message, "percent  result  chance of at least")
+        for percent in [10, 25, 50, 75, 90]:
+            value = dist.percentile(percent)
+            self.say(message, "{:>6}%  {:>6}  {:.2%}".format(
+                percent, value, dist.at_least(value)))
+        self.say(message, "```")
+        await self.send(message)
+
     @commands.command()
     async def coinflip(self):
         '''Flips a coin.'''
@@ -237,11 +319,10 @@ class Dice:
                 "You're supposed to enter number not whatever that was")
             return
 
-        util.dice.logging_enabled = True
-        total = util.dice.roll_top(sides, top_dice, times)
-        util.dice.logging_enabled = False
+        dice = list()
+        with util.dice.logging_to(dice):
+            total = util.dice.roll_top(sides, top_dice, times)
 
-        dice = util.dice.rolled_dice
         if len(dice) > 1:
             self.say(message, self.print_dice(dice))
 
@@ -272,11 +353,10 @@ class Dice:
                 "You're supposed to enter number not whatever that was")
             return
 
-        util.dice.logging_enabled = True
-        total = util.dice.roll_top(sides, top_dice, times, False)
-        util.dice.logging_enabled = False
+        dice = list()
+        with util.dice.logging_to(dice):
+            total = util.dice.roll_top(sides, top_dice, times, False)
 
-        dice = util.dice.rolled_dice
         if len(dice) > 1:
             self.say(message, self.print_dice(dice))
 
@@ -41,9 +41,15 @@ class Equations:
         return len(set(args))
 
     def get_equation(self, user, message, session, name) -> db.schema.Equation:
-        equation = db.database.get_from_string(
-            session, db.schema.Equation, name,
-            user.active_server_id, user.id)
+        equation = None
+        record = util.catalog.get(session, user.active_server_id, name,
+                                  user.id)
+        if record is not None:
+            equation = session.query(db.schema.Equation).get(record.id)
+        if equation is None:
+            equation = db.database.get_from_string(
+                session, db.schema.Equation, name,
+                user.active_server_id, user.id)
 
         if equation is not None:
             return equation
@@ -150,6 +156,7 @@ class Equations:
 
             session.add(new_eq)
             session.commit()
+            util.calculator.invalidate(user.active_server_id)
 
             self.say(message, "Created Equation " + new_eq.printName())
             await self.say_message(message)
@@ -176,6 +183,7 @@ class Equations:
                 if user.checkPermissions(ctx, equation):
                     equation.desc = description
                     session.commit()
+                    util.calculator.invalidate(user.active_server_id)
                     self.say(message, "Changed {} description".format(
                         equation.printName()))
                 else:
@@ -204,29 +212,50 @@ class Equations:
                 if user.checkPermissions(ctx, equation):
                     equation.value = eq.lower()
                     equation.params = self.get_num_params(eq)
-
-                    from . import stats
-                    success = stats.Stats.update_stats_equations(
-                        session, user.active_server, equation)
-
                     session.commit()
+                    util.calculator.invalidate(user.active_server_id)
 
-                    if success:
-                        self.say(message, "Changed {} equation".format(
-                            equation.printName()))
-                    else:
-                        self.say(message,
-                                "There were errors while updating everyone's stats")
-                        self.say(message,
-                                "Make sure that stats are updated, or that this equation is backwards compatible.")
-                        self.say(message,
-                                "\nThe equation {} is still changed though."
-                                .format(equation.printName()))
+                    self.say(message, "Changed {} equation".format(
+                        equation.printName()))
+
+                    # Find and update everyone's stats in the background,
+                    # the callback reports if any of them use the equation
+                    from . import stats
+                    util.jobs.submit(
+                        user.active_server_id, ('equation', equation.id),
+                        stats.Stats.update_stats_equations,
+                        user.active_server_id, equation.id,
+                        callback=self.stats_updated(
+                            ctx.message.channel, equation.printName()))
                 else:
                     self.say(message, "You don't have permission for that.")
 
             await self.say_message(message)
 
+    def stats_updated(self, channel, name):
+        """
+        Create a callback that reports when the stats that use an equation
+        have been updated.  Nothing is reported if no stats use it.
+        """
+        async def callback(result, error):
+            message = list()
+            if error is None and result == (0, 0):
+                # No stats use the equation
+                return
+            if error is None and not result[1]:
+                self.say(message, "Updated {} stats that use {}".format(
+                    result[0], name))
+            else:
+                self.say(message,
+                         "There were errors while updating everyone's stats")
+                self.say(message,
+                         "Make sure that stats are updated, or that this equation is backwards compatible.")
+                self.say(message,
+                         "\nThe equation {} is still changed though."
+                         .format(name))
+            await self.bot.send_message(channel, '\n'.join(message))
+        return callback
+
     @equations.command(pass_context=True, usage="<eq name>", name='del')
     async def _del(self, ctx: commands.Context, eq_name: str):
         """
@@ -249,6 +278,7 @@ class Equations:
                     name = equation.printName()
                     session.delete(equation)
                     session.commit()
+                    util.calculator.invalidate(user.active_server_id)
                     self.say(message, "Deleted " + name)
                 else:
                     self.say(message, "Sorry, your not allowed to do that :/")
@@ -275,26 +305,36 @@ class Equations:
 
             equation = self.get_equation(user, message, session, eq_name)
 
-            if equation is not None:
-                try:
-                    eq = util.calculator.parse_args(equation.value, session,
-                                                    user, args)
-                    util.dice.logging_enabled = True
-                    value = util.calculator.parse_equation(eq, session, user)
-                    util.dice.logging_enabled = False
-
-                    dice = util.dice.rolled_dice
-                    if dice:
-                        from .dice import Dice
-                        self.say(message, Dice.print_dice(dice))
-                        self.say(message, Dice.print_dice_one_liner(
-                            dice + [(value, "sum")]))
-
-                    self.say(message, "**{}**".format(value))
-                except util.BadEquation as be:
-                    self.say(message, be)
+            if equation is None:
+                await self.say_message(message)
+                return
 
-            await self.say_message(message)
+            try:
+                eq = util.calculator.parse_args(equation.value, session,
+                                                user, args)
+            except util.BadEquation as be:
+                self.say(message, be)
+                await self.say_message(message)
+                return
+            user_id, revision = util._pool.user_revision(user)
+            max_dice = util._pool.dice_budget(user)
+
+        try:
+            value, dice = await util.pool.run(
+                util._pool.evaluate, eq, user_id, revision,
+                max_dice=max_dice)
+
+            if dice:
+                from .dice import Dice
+                self.say(message, Dice.print_dice(dice))
+                self.say(message, Dice.print_dice_one_liner(
+                    dice + [(value, "sum")]))
+
+            self.say(message, "**{}**".format(value))
+        except util.BadEquation as be:
+            self.say(message, be)
+
+        await self.say_message(message)
 
         if util.dice.low:
             asyncio.ensure_future(util.dice.load_random_buffer())
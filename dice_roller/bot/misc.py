@@ -34,6 +34,17 @@ class Misc:
         self._logger.info(ctx.message.author.id + " pinged")
         await self.bot.say("PONGU!")
 
+    @commands.command(pass_context=True, hidden=True)
+    async def entropy(self, ctx):
+        '''Shows how the true random numbers are being fetched'''
+        if ctx.message.author.id not in config.config.mods:
+            await self.bot.say(util.get_random_index(config.lines.dumb))
+            return
+        state = util.dice.refiller.state
+        await self.bot.say('\n'.join(
+            "**{}**: {}".format(key, value)
+            for key, value in sorted(state.items())))
+
     @commands.command(pass_context=True)
     async def prefix(self, ctx, prefix: str = None):
         """
@@ -65,6 +76,134 @@ class Misc:
                 await self.bot.say(
                     "You don't have the permissions to change my prefix!")
 
+    @commands.command(pass_context=True, usage="[<limit> <value|default>]")
+    async def limits(self, ctx, limit: str = None, value: str = None):
+        """
+        Change the limits of calculations on this server.
+
+        The limits are:
+
+        * dice        the number of dice an equation can roll
+        * steps       the number of operations an equation can do
+        * equations   the number of custom equations an equation can use
+        * bits        the size of the numbers an equation can make
+
+        Setting a limit to default uses the bot's default limit.  A limit
+        can't be higher than the bot's default limit.
+
+        Note You must have permission to manage the server to do this.
+        """
+        columns = {
+            'dice': 'max_dice',
+            'steps': 'max_steps',
+            'equations': 'max_expansions',
+            'bits': 'max_bits'
+        }
+
+        with db.database.session() as session:
+            user = db.database.getUserFromCtx(session, ctx, commit=False)[0]
+            server = user.active_server
+
+            if server is None:
+                await self.bot.say("You don't have an active server!")
+                return
+
+            if limit is None:
+                budget = util._budget.Budget.for_server(server)
+                await self.bot.say('\n'.join([
+                    "```python",
+                    "dice       {}".format(budget.max_dice),
+                    "steps      {}".format(budget.max_steps),
+                    "equations  {}".format(budget.max_expansions),
+                    "bits       {}".format(budget.max_bits),
+                    "```"
+                ]))
+                return
+
+            limit = limit.lower()
+            if limit not in columns or value is None:
+                await self.bot.say(
+                    "Usage: `limits <dice|steps|equations|bits> <value>`")
+                return
+
+            if not user.checkPermissions(ctx):
+                await self.bot.say(
+                    "You don't have the permissions to change my limits!")
+                return
+
+            if value.lower() == 'default':
+                number = None
+            else:
+                try:
+                    number = int(value)
+                except ValueError:
+                    await self.bot.say("That's not a number, silly.")
+                    return
+                if number < 0:
+                    await self.bot.say("A limit can't be negative.")
+                    return
+                ceiling = getattr(util._budget.Budget(), columns[limit])
+                if number > ceiling:
+                    await self.bot.say(
+                        "The {} limit can't be higher than `{}`.".format(
+                            limit, ceiling))
+                    return
+
+            setattr(server, columns[limit], number)
+            session.commit()
+
+            await self.bot.say("Successfully changed the {} limit to `{}`".format(
+                limit, value.lower()))
+
+    @commands.command(pass_context=True, usage="[<source|default>]")
+    async def random(self, ctx, source: str = None):
+        """
+        Change where the dice of this server come from.
+
+        The sources are:
+
+        * randomorg   true random numbers from random.org
+        * system      the random numbers of the bot's computer
+        * pcg64       a fast generator, for when true randomness isn't needed
+
+        Setting the source to default uses the bot's default source.  The
+        seeded source, which rolls the same numbers every time, can only be
+        chosen for the whole bot in its config, for testing.
+
+        Note You must have permission to manage the server to do this.
+        """
+        with db.database.session() as session:
+            user = db.database.getUserFromCtx(session, ctx, commit=False)[0]
+            server = user.active_server
+
+            if server is None:
+                await self.bot.say("You don't have an active server!")
+                return
+
+            if source is None:
+                await self.bot.say("The dice come from `{}`".format(
+                    util.dice.server_source(server).name))
+                return
+
+            source = source.lower()
+            if source != 'default' and \
+                    source not in util.truerandom.SERVER_SOURCES:
+                await self.bot.say("Usage: `random <{}|default>`".format(
+                    '|'.join(util.truerandom.SERVER_SOURCES)))
+                return
+
+            if not user.checkPermissions(ctx):
+                await self.bot.say(
+                    "You don't have the permissions to change my dice!")
+                return
+
+            server.random_source = None if source == 'default' else source
+            session.commit()
+
+            await self.bot.say(
+                "Successfully changed the random source to `{}`".format(
+                    source))
+
     @commands.command(pass_context=True)
     async def active(self, ctx):
         """
@@ -279,6 +279,7 @@ class Config:
                 apply_stat(stat)
 
             session.commit()
+            util.calculator.invalidate(user.active_server_id)
 
             self.say(message, "Successfully applied {} to the server".format(
                 print_name))
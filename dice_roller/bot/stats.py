@@ -4,6 +4,7 @@ import asyncio
 from discord.ext import commands
 
 from .. import util, db
+from ..config import config
 
 
 class Stats:
@@ -94,77 +95,124 @@ class Stats:
                     name, val, wid_n=max_name_width
                 ))
 
+    @staticmethod
+    def stats_changed(session, user: db.schema.User):
+        """
+        Update the caches after the stats of a user have been committed.
+        """
+        util.stats_cache.invalidate(user.id, user.active_server_id)
+        util.stat_index.update_user(session, user.id, user.active_server_id)
+
     @classmethod
-    def update_stats_equations(cls, session, server, eq: db.schema.Equation):
+    def find_equation_stats(cls, session, server, eq: db.schema.Equation):
         """
-        update the calculated equations for all stats that use the given
-        equation
+        Find every stat that uses the given equation
+
+        :returns list: a list of (user, stat)
         """
 
+        # The stats that use an equation with the same name or id
+        found = util.stat_index.find(session, server.id, eq)
+        if not found:
+            return []
+
         stats = session.query(db.schema.Stat).filter(
-            db.schema.Stat.server_id == server.id
+            db.schema.Stat.id.in_(found)
         ).all()
+        users = dict((u.id, u) for u in session.query(db.schema.User).filter(
+            db.schema.User.id.in_(set(s.user_id for s in stats))
+        ).all())
 
-        errors = False
-
+        uses = list()
         for stat in stats:
-            user = session.query(db.schema.User).get(stat.user_id)
-            parsed = util.calculator.parse_args(stat.value.lower(), session,
-                                                user)
-            parsed = util.calculator._get_elements(parsed)
+            user = users[stat.user_id]
 
-            if any(db.database.get_from_string(
-                    session, db.schema.Equation, s, server.id) == eq
-                    for s in parsed):
+            # Check that the names refer to this equation for the user
+            records = util.catalog.get_all(
+                session, server.id, found[stat.id], user.id)
+            if any(r.id == eq.id for r in records.values()):
+                uses.append((user, stat))
+        return uses
 
+    @classmethod
+    async def update_stats_equations(cls, server_id, equation_id):
+        """
+        update the calculated equations for all stats that use the given
+        equation
+
+        This is run in the background by util.jobs.  The stats are committed
+        in batches, and other commands can run between each batch.
+
+        :returns (updated, failed): the number of stats that were updated,
+        and the number that had errors
+        """
+
+        batch_size = max(config.config.calculator.statBatchSize, 1)
+        updated = failed = 0
+
+        with db.database.session() as session:
+            server = session.query(db.schema.Server).get(server_id)
+            eq = session.query(db.schema.Equation).get(equation_id)
+            if server is None or eq is None:
+                # The equation was deleted before the job started
+                return updated, failed
+
+            uses = cls.find_equation_stats(session, server, eq)
+            for i, (user, stat) in enumerate(uses, 1):
                 try:
                     cls.calc_stat_value(session, user, stat)
+                    updated += 1
                 except util.BadEquation as be:
-                    errors = True
+                    failed += 1
                     cls._logger.warning(
                         "There was an error while calculating the stat value" +
                         " ({}): {}".format(str(stat), str(be)))
 
-        return not errors
+                if i % batch_size == 0 or i == len(uses):
+                    session.commit()
+                    util.stats_cache.invalidate(server_id=server_id)
+                    # Let other commands run
+                    await asyncio.sleep(0)
+
+        return updated, failed
 
     @classmethod
     def calc_stat_value(cls, session, user: db.schema.User,
-                        stat: db.schema.Stat, parse_randoms=False):
+                        stat: db.schema.Stat, parse_randoms=False,
+                        stats=None):
         """
         Calculate the stat values for the given stat, and all stats that depend
         on this stat.
 
-        raises util.BadEquation error on a bad equation
-        """
-
-        # 5. set calc to None
-        stat.calc = None
-
-        # 1. check if there are dice rolls
-        util.dice.logging_enabled = True
-        eq = util.calculator.parse_args(stat.value, session, user,
-                                        use_calculated=False)
-        # 2. calculate equation
-        value = util.calculator.parse_equation(eq, session, user)
-        util.dice.logging_enabled = False
-
-        dice = util.dice.rolled_dice
+        The stats are calculated in the order of their dependencies, so each
+        stat is calculated once.  stats are the user's stats if they're
+        already loaded.
 
-        if not dice or parse_randoms is True:
-            # 3. set calc to calculated equation
-            stat.calc = value
+        raises util.BadEquation error on a bad equation, or if the stats
+        depend on each other
+        """
+        if stats is None:
+            stats = user.stats
+        stats = dict((str(s), s) for s in stats.values())
+        graph = util._stat_graph.StatGraph(
+            dict((name, s.value) for name, s in stats.items()))
 
-        # 6. check if there are dependent stats
+        name = str(stat)
+        stats[name] = stat
+        graph.set(name, stat.value)
+        order = graph.order([name])
 
         errors = False
 
-        name = stat.fullname
-        for st in user.stats.values():
-            params = [fn for fn
-                      in util.variables.getVariables(str(st.value).lower())]
-            if name in params:
+        # The stats have changes that aren't committed yet
+        with util.stats_cache.bypass(stats):
+            dice = cls._calc_one(session, user, stat, parse_randoms)
+
+            for dependent in order:
+                if dependent == name:
+                    continue
                 try:
-                    cls.calc_stat_value(session, user, st)
+                    cls._calc_one(session, user, stats[dependent])
                 except util.BadEquation:
                     errors = True
 
@@ -174,6 +222,32 @@ class Stats:
 
         return dice
 
+    @classmethod
+    def _calc_one(cls, session, user: db.schema.User, stat: db.schema.Stat,
+                  parse_randoms=False):
+        """
+        Calculate the value of a single stat.
+        """
+
+        # 1. set calc to None
+        stat.calc = None
+
+        # 2. check if there are dice rolls
+        eq = util.calculator.parse_args(stat.value, session, user,
+                                        use_calculated=False)
+        # 3. calculate equation
+        context = util._calculator.EvaluationContext(session, user,
+                                                     rolled_dice=list())
+        value = util.calculator.parse_equation(eq, context=context)
+
+        dice = context.rolled_dice
+
+        if not dice or parse_randoms is True:
+            # 4. set calc to calculated equation
+            stat.calc = value
+
+        return dice
+
     @commands.group(pass_context=True, aliases=['st', 'stat'])
     async def stats(self, ctx: commands.Context):
         """
@@ -274,13 +348,14 @@ class Stats:
             stat = stats[stat.lower()]
 
             try:
-                self.calc_stat_value(session, user, stat)
+                self.calc_stat_value(session, user, stat, stats=stats)
             except util.BadEquation as be:
                 self.say(message, "Invalid equation: " + str(be))
                 await self.send(message)
                 session.rollback()
                 return
             session.commit()
+            self.stats_changed(session, user)
 
             self.say(message, "Set **{}** stat to".format(str(stat)))
             self.say(message, "```python")
@@ -318,6 +393,7 @@ class Stats:
             try:
                 del stats[stat.lower()]
                 session.commit()
+                self.stats_changed(session, user)
 
                 self.say(message, "Deleted your **{}** stat".format(
                     stat.lower()))
@@ -352,6 +428,7 @@ class Stats:
             else:
                 user.stats.clear()
                 session.commit()
+                self.stats_changed(session, user)
                 self.say(message, "Deleted all of your stats")
 
             await self.send(message)
@@ -386,6 +463,8 @@ class Stats:
             ).delete()
 
             session.commit()
+            util.stats_cache.invalidate(server_id=user.active_server_id)
+            util.stat_index.clear(user.active_server_id)
 
             self.say(message, "Successfully deleted all user's stats")
 
@@ -499,8 +578,7 @@ class Stats:
                 db.schema.RollStat.server_id == user.active_server_id
             ).order_by(db.schema.RollStat.group, db.schema.RollStat.name).all()
 
-            randoms = \
-                [k for k, v in util.calculator.precedence.items() if v >= 7]
+            randoms = util.calculator.random_functions
 
             def is_random(eq):
                 """
@@ -536,13 +614,10 @@ class Stats:
                 for default in default_stats:
                     stat = stats[stats.get_name(default.group, default.name)]
                     try:
-                        # Load more random numbers when low on rolled dice
-                        if util.dice.low:
-                            await util.dice.load_random_buffer()
-
                         dice = self.calc_stat_value(
                             session, user, stat,
-                            parse_randoms=True
+                            parse_randoms=True,
+                            stats=stats
                         )
 
                         if dice:
@@ -569,6 +644,7 @@ class Stats:
             await calc_stat(normal_stats)
 
             session.commit()
+            self.stats_changed(session, user)
 
             message.extend(errors)
 
@@ -6,6 +6,32 @@ class Random:
     def __init__(self, data):
         self.useRandomDotOrg = data.get('useRandomDotOrg', True)
         self.preFetchCount = data.get('preFetchCount', 30)
+        self.timeout = data.get('timeout', 5)
+        self.retries = data.get('retries', 2)
+        self.failureThreshold = data.get('failureThreshold', 3)
+        self.resetTimeout = data.get('resetTimeout', 300)
+        self.headroom = data.get('headroom', 60)
+        self.quotaTtl = data.get('quotaTtl', 600)
+        self.apiKey = data.get('apiKey', None)
+        self.entropyFile = data.get('entropyFile', 'entropy.bin')
+        # randomorg, system, pcg64 or seeded, by default randomorg when
+        # useRandomDotOrg is set, and system otherwise
+        self.source = data.get('source', None)
+        self.seed = data.get('seed', None)
+
+
+class Calculator:
+    def __init__(self, data):
+        self.cacheSize = data.get('cacheSize', 512)
+        self.samples = data.get('samples', 100000)
+        self.poolSize = data.get('poolSize', 2)
+        self.timeout = data.get('timeout', 10)
+        self.maxTasksPerWorker = data.get('maxTasksPerWorker', 100)
+        self.maxDice = data.get('maxDice', 1000)
+        self.maxSteps = data.get('maxSteps', 10000)
+        self.maxExpansions = data.get('maxExpansions', 200)
+        self.maxBits = data.get('maxBits', 1024)
+        self.statBatchSize = data.get('statBatchSize', 50)
 
 
 class Config:
@@ -13,6 +39,7 @@ class Config:
         self.prefix = data.get('prefix', '?')
         self.token = data.get('token', None)
         self.random = data.get('random', Random(dict()))
+        self.calculator = data.get('calculator', Calculator(dict()))
         self.mods = data.get('mods', [])
         self.db_file = data.get('db_file', 'sqlite:///db.sqlite')
         self.stat_config = data.get(
@@ -203,16 +230,44 @@ class SliceField(fields.Field):
 class RandomSchema(Schema):
     useRandomDotOrg = fields.Boolean()
     preFetchCount = fields.Integer()
+    timeout = fields.Float()
+    retries = fields.Integer()
+    failureThreshold = fields.Integer()
+    resetTimeout = fields.Float()
+    headroom = fields.Float()
+    quotaTtl = fields.Float()
+    apiKey = fields.String(allow_none=True)
+    entropyFile = fields.String(allow_none=True)
+    source = fields.String(allow_none=True)
+    seed = fields.Integer(allow_none=True)
 
     @post_load
     def loadRandom(self, data):
         return Random(data)
 
 
+class CalculatorSchema(Schema):
+    cacheSize = fields.Integer()
+    samples = fields.Integer()
+    poolSize = fields.Integer()
+    timeout = fields.Float()
+    maxTasksPerWorker = fields.Integer()
+    maxDice = fields.Integer()
+    maxSteps = fields.Integer()
+    maxExpansions = fields.Integer()
+    maxBits = fields.Integer()
+    statBatchSize = fields.Integer()
+
+    @post_load
+    def loadCalculator(self, data):
+        return Calculator(data)
+
+
 class ConfigSchema(Schema):
     prefix = fields.String()
     token = fields.String()
     random = fields.Nested(RandomSchema)
+    calculator = fields.Nested(CalculatorSchema)
     mods = fields.List(fields.String())
     db_file = fields.String()
     description = fields.String()
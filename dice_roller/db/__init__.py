@@ -76,6 +76,14 @@ class Database:
     def createSession(self):
         return self._session()
 
+    def dispose(self):
+        """
+        Close every connection to the database.
+
+        This should be called by a forked process before using the database.
+        """
+        self._engine.dispose()
+
     @contextmanager
     def session(self):
         session = self.createSession()
@@ -176,9 +184,19 @@ class Database:
         return self.getUser(session, ctx.message.author.id, active_server,
                             update_server=update_server, commit=commit)
 
+    @classmethod
+    def parse_name(cls, string) -> list:
+        """
+        Split a string into the name and id of an object.
+
+        `mod:12` is split into ['mod', '12'], `mod` into ['mod'], and `:12`
+        into ['', '12'].
+        """
+        return re.findall(cls._name_regex, string)
+
     @classmethod
     def get_from_string(cls, session, clss, string, server_id, user_id=None):
-        name = re.findall(cls._name_regex, string)
+        name = cls.parse_name(string)
 
         if len(name) > 1:
             # Get by the id
@@ -210,5 +228,70 @@ class Database:
 
         return obj
 
+    @classmethod
+    def get_all_from_strings(cls, session, clss, strings, server_id,
+                             user_id=None) -> dict:
+        """
+        Get the objects of many strings with a single query.
+
+        Each string is found in the same way as get_from_string: by its id,
+        then by the name of an object of the user, then by any object with
+        the name.
+
+        A dict of each string and its object is returned, strings that
+        aren't found are left out.
+        """
+        names = dict()
+        for string in set(strings):
+            name = cls.parse_name(string)
+            if name:
+                names[string] = name
+
+        ids = set()
+        for name in names.values():
+            if len(name) > 1:
+                try:
+                    ids.add(int(name[1]))
+                except ValueError:
+                    pass
+        lowered = set(name[0].lower() for name in names.values())
+
+        conditions = list()
+        if ids:
+            conditions.append(clss.id.in_(ids))
+        if lowered:
+            conditions.append(clss.name.in_(lowered))
+        if not conditions:
+            return dict()
+
+        objects = session.query(clss).filter(
+            clss.server_id == int(server_id),
+            sqlalchemy.or_(*conditions)
+        ).order_by(clss.id).all()
+
+        by_id = dict((obj.id, obj) for obj in objects)
+        by_name = dict()
+        by_creator = dict()
+        for obj in objects:
+            by_name.setdefault(obj.name, obj)
+            if user_id is not None and obj.creator_id == user_id:
+                by_creator.setdefault(obj.name, obj)
+
+        found = dict()
+        for string, name in names.items():
+            obj = None
+            if len(name) > 1:
+                try:
+                    obj = by_id.get(int(name[1]))
+                except ValueError:
+                    pass
+            if obj is None:
+                obj = by_creator.get(name[0].lower())
+            if obj is None:
+                obj = by_name.get(name[0].lower())
+            if obj is not None:
+                found[string] = obj
+        return found
+
 
 database = Database(config.config.db_file)
@@ -0,0 +1,29 @@
+"""Add server random source
+
+Revision ID: 5d2a7c9e1f30
+Revises: 8c1f4e2a9b7d
+Create Date: 2026-10-17 03:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a7c9e1f30'
+down_revision = '8c1f4e2a9b7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    with op.batch_alter_table('server') as batch_op:
+        batch_op.add_column(
+            sa.Column('random_source', sa.String(16), nullable=True))
+
+
+def downgrade():
+
+    with op.batch_alter_table('server') as batch_op:
+        batch_op.drop_column('random_source')
@@ -0,0 +1,38 @@
+"""Add server limits
+
+Revision ID: 8c1f4e2a9b7d
+Revises: 3abd6993e282
+Create Date: 2026-10-17 02:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f4e2a9b7d'
+down_revision = '3abd6993e282'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    with op.batch_alter_table('server') as batch_op:
+        batch_op.add_column(
+            sa.Column('max_dice', sa.Integer, nullable=True))
+        batch_op.add_column(
+            sa.Column('max_steps', sa.Integer, nullable=True))
+        batch_op.add_column(
+            sa.Column('max_expansions', sa.Integer, nullable=True))
+        batch_op.add_column(
+            sa.Column('max_bits', sa.Integer, nullable=True))
+
+
+def downgrade():
+
+    with op.batch_alter_table('server') as batch_op:
+        batch_op.drop_column('max_bits')
+        batch_op.drop_column('max_expansions')
+        batch_op.drop_column('max_steps')
+        batch_op.drop_column('max_dice')
@@ -295,6 +295,17 @@ class Server(Base):
     auto_add_stats = Column(Boolean, default=True)
     mod_id = Column(BigInteger, nullable=True)
 
+    # The limits of a calculation, the calculator config is used when a limit
+    # is None
+    max_dice = Column(Integer, nullable=True)
+    max_steps = Column(Integer, nullable=True)
+    max_expansions = Column(Integer, nullable=True)
+    max_bits = Column(Integer, nullable=True)
+
+    # The random source that dice are rolled from, the random config is used
+    # when it is None
+    random_source = Column(String(16), nullable=True)
+
     @property
     def mod(self):
         raise NotImplementedError
@@ -13,10 +13,31 @@ from . import _dice
 dice = _dice.Dice()
 
 
+from . import _catalog
+catalog = _catalog.EquationCatalog()
+
+
+from . import _stat_cache
+stats_cache = _stat_cache.StatsCache()
+from . import _stat_graph
+
+
 from . import _calculator
 calculator = _calculator.Calculator()
 
 
+from . import _stat_index
+stat_index = _stat_index.StatIndex()
+
+
+from . import _pool
+pool = _pool.EvaluationPool()
+
+
+from . import _jobs
+jobs = _jobs.JobQueue()
+
+
 def get_random_index(messages: list):
     return (messages[dice.roll(len(messages)) - 1])
 
@@ -0,0 +1,130 @@
+import copy
+import math
+
+from . import BadEquation
+from ._dice import Dice
+from ..config import config
+
+
+def _bits(value) -> float:
+    """
+    Get the number of bits needed to hold the whole part of a number.
+    """
+    value = abs(value)
+    if value < 1:
+        return 0
+    return math.log2(value) + 1
+
+
+class Budget:
+    """
+    The limits of a single calculation.
+
+    Everything a calculation does is charged to its budget, and a BadEquation
+    is raised as soon as one of the limits is passed, so that a hostile
+    equation is stopped before it can do much work.  A budget is shared by a
+    calculation and all of the custom equations it uses.
+
+    Any limit that isn't given is loaded from the calculator config.
+    """
+
+    def __init__(self, dice=None, steps=None, expansions=None, bits=None):
+        settings = config.config.calculator
+        self.max_dice = settings.maxDice if dice is None else dice
+        self.max_steps = settings.maxSteps if steps is None else steps
+        self.max_expansions = settings.maxExpansions \
+            if expansions is None else expansions
+        self.max_bits = settings.maxBits if bits is None else bits
+
+        self.dice = 0
+        self.steps = 0
+        self.expansions = 0
+
+    @classmethod
+    def for_server(cls, server):
+        """
+        Create a budget with the limits of a server.
+
+        The limits in the calculator config are the most that any server may
+        have, a server can only lower them.
+        """
+        budget = cls()
+        if server is None:
+            return budget
+        for name in ['max_dice', 'max_steps', 'max_expansions', 'max_bits']:
+            limit = getattr(server, name)
+            if limit is not None:
+                setattr(budget, name, min(limit, getattr(budget, name)))
+        return budget
+
+    def fork(self) -> 'Budget':
+        """
+        Copy the budget, to charge one of several alternatives to, such as
+        the branches of an if.
+        """
+        return copy.copy(self)
+
+    def join(self, forks):
+        """
+        Charge the most expensive of the alternatives that were charged to
+        forks of this budget, as only one of them is ever calculated.
+        """
+        for fork in forks:
+            self.dice = max(self.dice, fork.dice)
+            self.steps = max(self.steps, fork.steps)
+            self.expansions = max(self.expansions, fork.expansions)
+
+    def roll(self, count):
+        """
+        Charge a number of dice.
+
+        A single roll can never have more than Dice.MAX_ROLLS dice.
+        """
+        self.dice += min(max(count, 0), Dice.MAX_ROLLS)
+        if self.dice > self.max_dice:
+            raise BadEquation(
+                "The equation rolls too many dice, the limit is {}.".format(
+                    self.max_dice))
+
+    def step(self, count=1):
+        """
+        Charge a number of operations.
+        """
+        self.steps += count
+        if self.steps > self.max_steps:
+            raise BadEquation(
+                "The equation is too long, the limit is {} steps.".format(
+                    self.max_steps))
+
+    def expand(self):
+        """
+        Charge a custom equation.
+        """
+        self.expansions += 1
+        if self.expansions > self.max_expansions:
+            raise BadEquation(
+                "The equation uses too many equations, the limit is {}."
+                .format(self.max_expansions))
+
+    def _check_bits(self, bits):
+        if bits > self.max_bits:
+            raise BadEquation("The result of the equation is too large.")
+
+    def multiply(self, a, b):
+        """
+        Check that a * b isn't too large before it is calculated.
+        """
+        self._check_bits(_bits(a) + _bits(b))
+
+    def power(self, a, b):
+        """
+        Check that a ^ b isn't too large before it is calculated.
+        """
+        if b > 1 and abs(a) > 1:
+            self._check_bits(math.log2(abs(a)) * b)
+
+    def check(self, value):
+        """
+        Check that the result of a calculation isn't too large.
+        """
+        self._check_bits(_bits(value))
@@ -0,0 +1,100 @@
+import collections
+import threading
+
+
+class LRUCache:
+    """
+    A bounded mapping that discards the least recently used item once it is
+    full.
+
+    Every lookup through get() is counted as either a hit or a miss, so the
+    effectiveness of the cache can be monitored.  A size of 0 disables the
+    cache.
+
+    The cache is safe to share between threads.
+    """
+
+    def __init__(self, size=128):
+        self._lock = threading.Lock()
+        self._data = collections.OrderedDict()
+        self._size = max(int(size), 0)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        """
+        Setting the size will discard the oldest items that no longer fit.
+        """
+        with self._lock:
+            self._size = max(int(value), 0)
+            self._trim()
+
+    def _trim(self):
+        while len(self._data) > self._size:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        return self.get_any((key,), default)
+
+    def get_any(self, keys, default=None):
+        """
+        Get the value of the first key that is in the cache.
+
+        The lookup is counted as a single hit or miss.
+        """
+        with self._lock:
+            for key in keys:
+                try:
+                    value = self._data[key]
+                except KeyError:
+                    continue
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            if self._size == 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._trim()
+
+    def invalidate(self, predicate=None):
+        """
+        Remove every key that matches the predicate.
+
+        If no predicate is given, the whole cache is cleared.
+        """
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __str__(self):
+        return "<LRUCache(size={}, items={}, hits={}, misses={})>".format(
+            self._size, len(self._data), self.hits, self.misses)
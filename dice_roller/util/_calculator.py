@@ -1,9 +1,13 @@
 import re
 import math
-import collections
 
-from . import dice, BadEquation, variables
-from .. import db
+import numpy
+
+from . import dice, catalog, stats_cache, BadEquation, variables
+from . import _program, _tokenizer, _distribution, _sampler
+from ._cache import LRUCache
+from ._budget import Budget
+from ..config import config
 
 
 def isTrue(a):
@@ -13,37 +17,103 @@ def isTrue(a):
     return a > 0
 
 
-class FunctionDict(collections.Mapping):
+class EvaluationContext:
+    """
+    The state of a single calculation.
+
+    A context holds the session and user that custom equations are loaded
+    from, so the function tables of the Calculator are never modified while
+    an equation is calculated.  Nested custom equations share the equations
+    that have already been loaded by their parent context.
+
+    The Budget of the calculation is also shared with nested contexts, it is
+    loaded from the user's active server when it isn't given.
+
+    params are the values of the parameters of the inlined custom equation
+    that is being calculated.
 
-    def __init__(self, *args, **kwargs):
-        self.dict = dict(*args, **kwargs)
-        self._func = None
+    source is the RandomSource that the dice are rolled from, the source of
+    the user's active server when it isn't given.
+
+    rolled_dice is the list that every die rolled in the calculation is
+    added to, as a (value, sides) pair.  It is shared with nested contexts,
+    and the dice aren't logged if it is None.
+    """
+
+    def __init__(self, session=None, user=None, depth=0, equations=None,
+                 budget=None, source=None, rolled_dice=None):
+        self.session = session
+        self.user = user
+        self.depth = depth
+        self.equations = dict() if equations is None else equations
+        if budget is None:
+            budget = Budget.for_server(
+                user.active_server if user is not None else None)
+        self.budget = budget
+        if source is None:
+            source = dice.server_source(
+                user.active_server if user is not None else None)
+        self.source = source
+        self.rolled_dice = rolled_dice
+        self.params = None
+
+    @property
+    def scope(self):
+        """
+        The (server_id, user_id) pair that custom equations are loaded from.
 
-    def setFunction(self, function):
-        self._func = function
+        None if custom equations are not available.
+        """
+        if self.session is None or self.user is None:
+            return None
+        return (self.user.active_server_id, self.user.id)
+
+    def nested(self):
+        """
+        Create a context for a custom equation that is called by this one.
+        """
+        return EvaluationContext(self.session, self.user, self.depth + 1,
+                                 self.equations, self.budget, self.source,
+                                 self.rolled_dice)
+
+    def load_equations(self, names):
+        """
+        Load the custom equations of many names with a single query.
+
+        Equations that have already been loaded are skipped.
+        """
+        if self.scope is None:
+            return
+        names = set(n for n in names if n not in self.equations)
+        if not names:
+            return
+
+        found = catalog.get_all(self.session, self.user.active_server_id,
+                                names, self.user.id)
+        for name in names:
+            self.equations[name] = found.get(name)
+
+    def get_equation(self, name):
+        """
+        Get the EquationRecord of a custom equation by its name.
 
-    def __getitem__(self, key):
+        None is returned if there is no such equation.
+        """
         try:
-            return self.dict[key]
+            return self.equations[name]
         except KeyError:
             pass
-        if self._func is not None:
-            if callable(self._func):
-                return self._func(key)
-            else:
-                return self._func[key]
-        raise KeyError
 
-    def __iter__(self):
-        return iter(self.dict)
+        # Only identifiers can be equations
+        if not name or not (name[0].isalpha() or name[0] == ':'):
+            return None
 
-    def __len__(self):
-        return len(self._func)
-
-    def __str__(self):
-        return '{{{}}}'.format(', '.join(
-            '{}: {}'.format(i, v) for i, v in self.items()
-        ))
+        equation = None
+        if self.scope is not None:
+            equation = catalog.get(self.session, self.user.active_server_id,
+                                   name, self.user.id)
+        self.equations[name] = equation
+        return equation
 
 
 class Calculator:
@@ -55,10 +125,14 @@ class Calculator:
     needed if it has more or less than 2, and create the function as a lambda
     in the functions dict.
 
+    The function tables are never modified while calculating an equation,
+    anything that is specific to a single calculation is stored in its
+    EvaluationContext instead.
+
     """
 
     # Lower numbers mean a lower precedence (it is less important)
-    precedence = FunctionDict({
+    precedence = {
         'true': 1, 'false': 1,
         '<': 1, '>': 1, '=': 1, '<>': 1, '<=': 1, '>=': 1, 'or': 1, 'and': 1,
         '+': 2, '-': 2,
@@ -66,11 +140,11 @@ class Calculator:
         '^': 4, '%': 4,
         'round': 6, 'max': 6, 'min': 6, 'floor': 6, 'ceil': 6, 'if': 6,
         'adv': 7, 'dis': 7, 'top': 7, 'bot': 7, 'd': 7,
-    })
+    }
 
     # A function by default has 2 arguments, if it does not, list the number
     # required here.
-    function_length = FunctionDict({
+    function_length = {
         'round': 1,
         'adv': 1,
         'dis': 1,
@@ -81,10 +155,10 @@ class Calculator:
         'if': 3,
         'true': 0,
         'false': 0
-    })
+    }
 
     # All the functions are defined here as lambdas.
-    functions = FunctionDict({
+    functions = {
         # Basic functions
         '+': lambda a, b: a + b,
         '-': lambda a, b: a - b,
@@ -121,48 +195,142 @@ class Calculator:
         'true': lambda: 1,
         'false': lambda: 0
 
-    })
-
-    def __init__(self):
-        self._strip_regex = re.compile(r"\s+")
-        self._parse_regex = re.compile(
-            r"((^|(?<=[^\d)]))[-][\d.]+|[\d.]+|[a-z]+(:[\d]+)?|:[\d]+|[<>=]+|[\W])")
-        self._check_vars_regex = re.compile(r"{(.*?)}")
-        # _parse_regex info
-        #
-        # (^|(?<=[^\w)]))[-][\d.]+
-        # Negative Number
-        #   - (^|(?<=[^\w)]))
-        #     Assert that the next token will be unary
-        #   - [-]
-        #     Catch operator
-        #   - [\d.]+
-        #     Catch Decimal number
+    }
+
+    # Functions that roll dice.  These are never calculated while compiling an
+    # equation.
+    random_functions = frozenset(['d', 'adv', 'dis', 'top', 'bot'])
+
+    # Functions whose result is true (1) or false (0)
+    conditions = frozenset(['<', '<=', '>=', '>', '<>', '=', 'and', 'or'])
+
+    # Functions that are charged to the Budget of a calculation before they
+    # are called.  They are given the budget and the operands of the function.
+    budget_checks = {
+        '*': lambda budget, a, b: budget.multiply(a, b),
+        '^': lambda budget, a, b: budget.power(a, b),
+        'd': lambda budget, a, b: budget.roll(round(a)),
+        'adv': lambda budget, a: budget.roll(2),
+        'dis': lambda budget, a: budget.roll(2),
+        'top': lambda budget, a, b, c: budget.roll(round(a)),
+        'bot': lambda budget, a, b, c: budget.roll(round(a)),
+    }
+
+    # Functions that only calculate the operands they need.  Their operands
+    # are given as functions that take the EvaluationContext, so if(a, b, c)
+    # will never roll the dice of the branch that isn't taken.  A lazy function
+    # is used instead of the function of the same name in functions.
+    lazy_functions = {
+        'and': lambda ctx, a, b:
+            1 if isTrue(a(ctx)) and isTrue(b(ctx)) else 0,
+        'or': lambda ctx, a, b:
+            1 if isTrue(a(ctx)) or isTrue(b(ctx)) else 0,
+        'if': lambda ctx, a, b, c: b(ctx) if isTrue(a(ctx)) else c(ctx),
+    }
+
+    def __init__(self, cache_size=None):
+        if cache_size is None:
+            cache_size = config.config.calculator.cacheSize
+        # Parsed equations are cached by their normalized string.
         #
-        # [\d.]+
-        # Decimal Numbers
-        #
-        # [a-z]+(:[\d]+)?
-        # Functions
-        #
-        # :[\d]+
-        # Function ids
-        #
-        # [<>=]+
-        # Boolean operators
-        #
-        # [\W]
-        # Operators
+        # Equations that only use builtin functions are stored under the key
+        # (None, equation), and equations that use custom equations are stored
+        # under (((server_id, user_id), revision), equation) as they can only
+        # be reused by the same user in the same server, until the equations
+        # of the server change.
+        self.cache = LRUCache(cache_size)
+        # Compiled custom equations are cached by
+        # (equation id, revision, scope), with the text of the equation when
+        # it uses any stats.  The revision of a server in the catalog is
+        # changed whenever its equations change.
+        self.templates = LRUCache(cache_size)
+        self._strip_regex = re.compile(r"\s+")
+
+    def _normalize(self, string) -> str:
+        """
+        Lowercase an equation and remove all of its whitespace.
+        """
+        return re.sub(self._strip_regex, "", string.lower())
 
     def _get_elements(self, string) -> list:
         """
-        Parse the regex of an equation into a list of operands and operators.
+        Split an equation into a list of the text of its operands and
+        operators.
         """
-        stripped = re.sub(self._strip_regex, "", string.lower())
-        equation = [r[0] for r in re.findall(self._parse_regex, stripped)]
-        return equation
+        return [t.text for t in _tokenizer.tokenize(string)]
+
+    def get_equation_names(self, string) -> set:
+        """
+        Get the names of the custom equations that an equation uses, such as
+        `mod` or `mod:12`, without setting its variables.
+
+        The default values of variables are searched as well.
+        """
+        def without_variables(template):
+            for node in template:
+                if isinstance(node, variables.Literal):
+                    yield node.text
+                elif node.default is not None:
+                    yield from without_variables(node.default)
+                else:
+                    yield '0'
+
+        text = ''.join(without_variables(variables.parse(string.lower())))
+        try:
+            tokens = _tokenizer.tokenize(text)
+        except BadEquation:
+            return set()
+        functions = self.__class__.functions
+        return set(t.text for t in tokens
+                   if t.type == _tokenizer.IDENTIFIER
+                   and t.text not in functions)
+
+    def _get_precedence(self, name, context) -> int:
+        """
+        Get the precedence of a function.
 
-    def _load_equation(self, data: list) -> list:
+        Custom equations have a precedence of 5, anything else that isn't a
+        function has a precedence of 0.
+        """
+        try:
+            return self.__class__.precedence[name]
+        except KeyError:
+            pass
+        if context.get_equation(name) is not None:
+            return 5
+        return 0
+
+    def _get_function_length(self, name, context) -> int:
+        """
+        Get the number of operands that a function takes.
+        """
+        try:
+            return self.__class__.function_length[name]
+        except KeyError:
+            pass
+        equation = None
+        if name not in self.__class__.functions:
+            equation = context.get_equation(name)
+        if equation is not None:
+            return equation.params
+        return 2
+
+    def _call_equation(self, context, name, args) -> float:
+        """
+        Calculate a custom equation with the given arguments.
+        """
+        equation = context.get_equation(name)
+        if equation is None:
+            raise BadEquation("Invalid Function **{}**".format(name))
+
+        context.budget.expand()
+        return self.parse_equation(
+            self.parse_args(equation.value, context.session, context.user,
+                            args),
+            context=context.nested())
+
+    def _load_equation(self, tokens: list, context=None,
+                       template=False) -> list:
         """
         Parse an equation to be calculated easier by a computer using the
         Shunting Yard Algorithm.
@@ -172,18 +340,28 @@ class Calculator:
         ```
         5 + 4 * 3 => 5 4 3 * +
         ```
+
+        Params are only allowed in the template of a custom equation.
         """
+        if context is None:
+            context = EvaluationContext()
+
         stack = list()
         num_parens = 0
 
         equation = list()
 
-        for i in data:
-            try:
-                number = float(i)
-                equation.append(number)
-            except ValueError:
+        for token in tokens:
+            if token.type == _tokenizer.NUMBER:
+                equation.append(token.value)
+            elif token.type == _tokenizer.PARAM:
+                if not template:
+                    raise BadEquation(
+                        "Invalid Function **{}**".format(token.text))
+                equation.append(_program.Param(token.value))
+            else:
                 # If the item is not a number, it must be an operator
+                i = token.text
                 # Check if the item is the end of a parenthesis
                 if i == ')':
                     # If so, pop all the operands up to the accompanying
@@ -213,9 +391,9 @@ class Calculator:
                     else:
                         # If the precedence of the stack is greater than the
                         # current precedence, than pop until it's not
-                        while len(stack) > 0 and self.__class__.precedence.get(
-                                i, 0) <= self.__class__.precedence.get(
-                                stack[-1], 0):
+                        while len(stack) > 0 and self._get_precedence(
+                                i, context) <= self._get_precedence(
+                                stack[-1], context):
                             pop = stack.pop()
                             if pop == '(':
                                 raise BadEquation("Mismatched parentheses.")
@@ -231,35 +409,192 @@ class Calculator:
 
         return equation
 
-    def _calculate_equation(self, equation: list) -> float:
+    def _is_builtin(self, equation: list) -> bool:
         """
-        calculate a Shunting Yard equation.
+        Check if a parsed equation only uses builtin functions.
         """
-        stack = list()
+        return all(isinstance(i, float) or i in self.__class__.functions
+                   for i in equation)
+
+    def _load_equations(self, tokens, context):
+        """
+        Load every custom equation that the tokens of an equation use.
+        """
+        functions = self.__class__.functions
+        context.load_equations(
+            t.text for t in tokens
+            if t.type == _tokenizer.IDENTIFIER and t.text not in functions)
+
+    def _get_program(self, string: str, context=None) -> _program.Program:
+        """
+        Get the compiled equation for a string.
+
+        Equations are loaded from the cache when possible.
+        """
+        if context is None:
+            context = EvaluationContext()
+
+        normalized = self._normalize(string)
+        scope = context.scope
 
-        for i in equation:
-            if isinstance(i, float):
-                stack.append(i)
+        keys = [(None, normalized)]
+        if scope is not None:
+            keys.append(((scope, catalog.revision(scope[0])), normalized))
+
+        program = self.cache.get_any(keys)
+        if program is not None:
+            return program
+
+        # parse the string into a list of operators and operands.
+        equation = _tokenizer.tokenize(normalized)
+        self._load_equations(equation, context)
+
+        # Parse the equation using the Shunting Yard Algorithm
+        equation = self._load_equation(equation, context)
+
+        program = self._compile(equation, context)
+
+        if self._is_builtin(equation):
+            self.cache.put(keys[0], program)
+        elif scope is not None and not program.uses_stats:
+            self.cache.put(keys[1], program)
+
+        return program
+
+    def invalidate(self, server_id=None):
+        """
+        Remove cached equations that use the custom equations of a server.
+
+        This should be called whenever the custom equations of a server
+        change.  If no server is given, the whole cache is cleared.
+
+        The equations of the server are also removed from the catalog.
+        """
+        catalog.invalidate(server_id)
+        if server_id is None:
+            self.cache.invalidate()
+            self.templates.invalidate()
+            return
+        self.cache.invalidate(
+            lambda key: key[0] is not None and key[0][0][0] == server_id)
+
+    def revision(self, server_id) -> tuple:
+        """
+        Get the revision of the custom equations of a server.
+        """
+        return catalog.revision(server_id)
+
+    def sync(self, server_id, revision):
+        """
+        Make sure that the equations of a server are at the given revision.
+
+        This is used by other processes, so that equations that were changed
+        by the bot aren't used.
+        """
+        if catalog.sync(server_id, revision):
+            self.cache.invalidate(
+                lambda key: key[0] is not None and key[0][0][0] == server_id)
+
+    def _get_template(self, equation, context, depth):
+        """
+        Get the compiled body of a custom equation.
+
+        Its parameters are Params, so it can be inlined with any operands.
+        The stats that the equation uses are set in the template, so a
+        template that uses stats is only valid until the stats change.
+
+        :returns (root, uses_stats): or None if the equation can't be inlined
+        """
+        uses_stats = any(not v.isdigit()
+                         for v in variables.getVariables(equation.value))
+        placeholders = ['${}'.format(i) for i in range(equation.params or 0)]
+        key = (equation.id, catalog.revision(equation.server_id),
+               context.scope)
+
+        try:
+            if uses_stats:
+                text = self.parse_args(equation.value, context.session,
+                                       context.user, placeholders)
+                key += (text,)
             else:
-                # Load the operands
-                operands = list()
-                for _ in range(self.__class__.function_length.get(i, 2)):
-                    try:
-                        operands.insert(0, stack.pop())
-                    except IndexError:
-                        raise BadEquation("Invalid number of operands")
-                try:
-                    # Process the function
-                    stack.append(self.__class__.functions[i](*operands))
-                except KeyError:
-                    raise BadEquation("Invalid Function **{}**".format(i))
-                except Exception as e:
-                    raise BadEquation(str(e))
-
-        if len(stack) is not 1:
-            raise BadEquation("Invalid number of operands.")
-
-        return stack.pop()
+                # The stats don't need to be loaded
+                text = variables.setVariables(equation.value, *placeholders)
+        except (BadEquation, IndexError):
+            # The error is raised if the equation is ever calculated
+            return None
+
+        template = self.templates.get(key)
+        if template is not None:
+            return template or None
+
+        try:
+            tokens = _tokenizer.tokenize(self._normalize(text))
+            self._load_equations(tokens, context)
+            root = _program.build(
+                self._load_equation(tokens, context, template=True),
+                lambda name: self._get_function_length(name, context))
+            root, volatile = self._expand(root, context, depth + 1)
+            template = (_program.fold(root, self), uses_stats or volatile)
+        except (BadEquation, RecursionError):
+            # Equations that use their parameters in anything but an operand,
+            # such as `1{0}`, are calculated as text when they are called
+            template = False
+
+        self.templates.put(key, template)
+        return template or None
+
+    def _expand(self, node, context, depth=0):
+        """
+        Inline the custom equations that an equation uses.
+
+        :returns (node, uses_stats):
+        """
+        if not isinstance(node, (_program.Call, _program.Let)):
+            return node, False
+
+        uses_stats = False
+        args = list()
+        for arg in node.args:
+            arg, volatile = self._expand(arg, context, depth)
+            uses_stats = uses_stats or volatile
+            args.append(arg)
+        args = tuple(args)
+
+        if isinstance(node, _program.Let):
+            return _program.Let(node.name, args, node.body), uses_stats
+
+        name = node.name
+        call = _program.Call(name, args)
+        if name in self.__class__.functions or depth > 20:
+            return call, uses_stats
+
+        equation = context.get_equation(name)
+        if equation is None:
+            return call, uses_stats
+
+        template = self._get_template(equation, context, depth)
+        if template is None:
+            return call, uses_stats
+        body, volatile = template
+        return _program.Let(name, args, body), uses_stats or volatile
+
+    def _compile(self, equation: list, context=None) -> _program.Program:
+        """
+        Compile a Shunting Yard equation into a Program that can be calculated
+        without interpreting the equation again.
+
+        The custom equations that it uses are inlined.
+        """
+        if context is None:
+            context = EvaluationContext()
+
+        root = _program.build(
+            equation, lambda name: self._get_function_length(name, context))
+        try:
+            root, uses_stats = self._expand(root, context, context.depth)
+        except RecursionError:
+            raise BadEquation("The equation is too complex.")
+        return _program.Program(root, self, uses_stats)
 
     def parse_args(self, equation, session, user, args=None,
                    use_calculated=True):
@@ -269,41 +604,33 @@ class Calculator:
         if args is None:
             args = list()
 
-        loop = 0
-        stats = dict()
-        # Load the user's stats
-        for stat in user.stats.values():
-            if use_calculated:
-                stats[str(stat)] = stat.getValue()
-            else:
-                stats[str(stat)] = stat.value
-
-        while len(re.findall(self._check_vars_regex, equation)) > 0:
-            loop += 1
-            if loop >= 20:
-                raise BadEquation("Too much recursion in the equation!")
-            try:
-                equation = variables.setVariables(equation, *args, **stats)
-            except KeyError:
-                from string import Formatter
-                params = [fn for _, fn, _, _ in Formatter().parse(equation)
-                          if fn is not None]
-
-                missing_keys = list(set(params).difference(stats.keys()))
-
-                raise BadEquation(
-                    "Could not find the stats: "
-                    + ', '.join(["**{}**".format(mk) for mk in missing_keys])
-                )
-            except IndexError:
-                raise BadEquation(
-                    "Not enough arguments given"
-                )
+        # Stats that are being recalculated use the values they were set to
+        if use_calculated:
+            stats = stats_cache.get(session, user).calculated
+        else:
+            with stats_cache.bypass():
+                stats = stats_cache.get(session, user).values
+
+        try:
+            equation = variables.resolve_mapping(equation, args, stats)
+        except KeyError as exception:
+            raise BadEquation(
+                "Could not find the stat: **{}**".format(exception.args[0])
+            )
+        except IndexError:
+            raise BadEquation(
+                "Not enough arguments given"
+            )
+        except variables.RecursiveVariable as exception:
+            raise BadEquation(
+                "The variable **{}** uses itself!".format(exception.names[0]))
+        except variables.TooDeep:
+            raise BadEquation("Too much recursion in the equation!")
 
         return equation
 
     def parse_equation(self, string: str, session=None, user=None,
-                       _recursed=False, _repeats=None) -> float:
+                       context=None) -> float:
         """
         Parse a human readable equation.
 
@@ -327,81 +654,107 @@ class Calculator:
 
         The session parameter is optional, and is an instance of a server
         object. Using the session parameter allows the use of custom equations.
+
+        context is the EvaluationContext of the calculation, it is created
+        from the session and user when it isn't given.  A BadEquation error is
+        raised if the calculation goes over the limits of its Budget.
         """
+        if context is None:
+            context = EvaluationContext(session, user)
 
-        if _recursed > 20:
+        if context.depth > 20:
             raise BadEquation("Too much recursion in the equation!")
 
-        # Add the custom equations to the equation list
-        if session is not None:
-            repeats = dict() if _repeats is None else _repeats
-
-            def getEquation(eq_name):
-                try:
-                    return repeats[eq_name].params
-                except KeyError:
-                    pass
-                if user is not None:
-                    eq = db.database.get_from_string(
-                        session, db.schema.Equation, eq_name,
-                        user.active_server.id, user.id)
-                    if eq is None:
-                        raise KeyError
-                    repeats[eq_name] = eq
-                    return eq.params
-
-            def getEquationFunction(eq_name):
-                try:
-                    eq = repeats[eq_name]
-                except KeyError:
-                    pass
-                if user is not None:
-                    eq = db.database.get_from_string(
-                        session, db.schema.Equation, eq_name,
-                        user.active_server.id, user.id)
-                    if eq is None:
-                        raise KeyError
-                    repeats[eq_name] = eq
-
-                return lambda *args: self.parse_equation(
-                    self.parse_args(eq.value, session, user, args),
-                    session,
-                    user,
-                    _recursed=_recursed + 1)
-
-            def getEquationPrecedence(eq_name):
-                try:
-                    eq = repeats[eq_name]
-                except KeyError:
-                    pass
-                if user is not None:
-                    eq = db.database.get_from_string(
-                        session, db.schema.Equation, eq_name,
-                        user.active_server.id, user.id)
-                    if eq is None:
-                        raise KeyError
-                    repeats[eq_name] = eq
-                return 5    
-
-            self.__class__.functions.setFunction(getEquationFunction)
-            if _recursed is False:
-                self.__class__.function_length.setFunction(getEquation)
-                self.__class__.precedence.setFunction(getEquationPrecedence)
-
-        # parse the string into a list of operators and operands.
-        equation = self._get_elements(string)
-
-        # Parse the equation using the Shunting Yard Algorithm
-        equation = self._load_equation(equation)
+        # Load the compiled equation
+        program = self._get_program(string, context)
 
         # Find the answer to the equation
-        value = self._calculate_equation(equation)
-
-        # Reset the custom equations
-        if _recursed is False:
-            self.__class__.function_length.setFunction(None)
-            self.__class__.functions.setFunction(None)
-            self.__class__.precedence.setFunction(None)
+        with dice.using(context.source), dice.logging_to(context.rolled_dice):
+            value = program(context)
+        context.budget.check(value)
 
         # Force the result into an int if it's an integer value
         return int(value) if value == int(value) else value
+
+    def distribution(self, string: str, session=None, user=None,
+                     context=None, samples=None):
+        """
+        Calculate the exact probability distribution of an equation.
+
+        Nothing is rolled, instead the odds of every possible result are
+        found from the odds of each die.  The returned Distribution can give
+        the mean, variance, percentiles and the chance to beat a DC.
+
+        Custom equations are inlined, and their body is found separately for
+        each combination of their operands.  A BadEquation error is raised if
+        the equation has too many possible results.  If samples is given,
+        the equation is instead sampled that many times, and the estimated
+        Samples are returned.
+        """
+        if context is None:
+            context = EvaluationContext(session, user)
+
+        program = self._get_program(string, context)
+        # The budget is charged as if the equation was calculated once, and
+        # only if the distribution is used rather than samples
+        budget = context.budget.fork()
+        budget.step(program.steps)
+
+        try:
+            dist = _distribution.distribution(program.root, self, budget)
+        except _distribution.TooComplex:
+            if samples is None:
+                raise
+            return self.sample(string, samples, context=context)
+        except RecursionError:
+            raise BadEquation("The equation is too complex.")
+
+        # Force the results into ints if they are integer values
+        pmf = dict()
+        for value, p in dist.pmf.items():
+            if value == int(value):
+                value = int(value)
+            pmf[value] = pmf.get(value, 0) + p
+        budget.check(max(pmf, key=abs))
+        context.budget.join([budget])
+        return _distribution.Distribution(
+            pmf, self.is_condition(program.root))
+
+    def sample(self, string: str, samples: int, session=None, user=None,
+               context=None, seed=None) -> _sampler.Samples:
+        """
+        Calculate an equation many times at once.
+
+        This is used for equations that the exact distribution can't be
+        found for.  The whole equation is calculated on numpy arrays of all
+        the samples, so a million samples take a fraction of a second.
+
+        The dice are rolled with a numpy random generator, which is seeded
+        with seed when it is given.
+        """
+        if context is None:
+            context = EvaluationContext(session, user)
+
+        program = self._get_program(string, context)
+        rng = numpy.random.default_rng(seed)
+        # The budget is charged as if the equation was calculated once
+        context.budget.step(program.steps)
+
+        try:
+            values = _sampler.sample(program.root, self, context,
+                                     int(samples), rng)
+        except RecursionError:
+            raise BadEquation("The equation is too complex.")
+        if len(values):
+            context.budget.check(float(numpy.abs(values).max()))
+
+        return _sampler.Samples(values, self.is_condition(program.root))
+
+    def is_condition(self, node) -> bool:
+        """
+        Check if a compiled equation is a comparison or a logical function,
+        so that its result is true or false rather than a number.
+        """
+        while isinstance(node, _program.Let):
+            node = node.body
+        return isinstance(node, _program.Call) and node.name in self.conditions
@@ -0,0 +1,205 @@
+import collections
+import threading
+
+from .. import db
+
+# A snapshot of an Equation.  Unlike a row of the database, it isn't tied to
+# a session, so it can be shared by every calculation.
+EquationRecord = collections.namedtuple('EquationRecord', [
+    'id', 'server_id', 'creator_id', 'name', 'desc', 'value', 'params'])
+
+# The number of strings that aren't equations that are remembered for each
+# server
+MAX_ABSENT = 1000
+
+
+def _record(equation) -> EquationRecord:
+    return EquationRecord(equation.id, equation.server_id,
+                          equation.creator_id, equation.name, equation.desc,
+                          equation.value, equation.params)
+
+
+class _ServerEquations:
+    """
+    The equations of a single server, indexed by id, name and
+    (creator, name).  When two equations share a name, the oldest is used.
+
+    absent holds the (string, user_id) pairs that the database didn't have
+    an equation for either, until the server is invalidated.
+    """
+
+    def __init__(self, records):
+        self.absent = set()
+        self.by_id = dict()
+        self.by_name = dict()
+        self.by_creator = dict()
+        for record in sorted(records, key=lambda r: r.id):
+            self.by_id[record.id] = record
+            self.by_name.setdefault(record.name, record)
+            self.by_creator.setdefault((record.creator_id, record.name),
+                                       record)
+
+    def find(self, name, user_id=None) -> EquationRecord:
+        """
+        Find an equation in the same order as Database.get_from_string: by
+        its id, then by the name of an equation of the user, then by any
+        equation with the name.
+        """
+        if len(name) > 1:
+            try:
+                record = self.by_id.get(int(name[1]))
+            except ValueError:
+                record = None
+            if record is not None:
+                return record
+        lowered = name[0].lower()
+        if user_id is not None:
+            record = self.by_creator.get((user_id, lowered))
+            if record is not None:
+                return record
+        return self.by_name.get(lowered)
+
+
+class EquationCatalog:
+    """
+    The custom equations of every server, kept in memory.
+
+    The equations of a server are loaded from the database the first time
+    they are used, and are kept until the server is invalidated.  The
+    equation commands invalidate their server whenever an equation changes.
+
+    Each server has a revision that is changed every time it is
+    invalidated.  Other processes, such as the calculator pool, sync their
+    catalog to the revisions of the bot.
+
+    Every lookup is counted as a hit if it didn't need the database, or a
+    miss if it did.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = dict()
+        self._revisions = dict()
+        # Changed when every server is invalidated
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def revision(self, server_id) -> tuple:
+        """
+        Get the revision of a server, anything that was made from the
+        equations of the server is out of date once its revision changes.
+        """
+        return (self._generation, self._revisions.get(server_id, 0))
+
+    def invalidate(self, server_id=None):
+        """
+        Forget the equations of a server, or every server if none is given.
+        """
+        with self._lock:
+            if server_id is None:
+                self._generation += 1
+                self._servers.clear()
+                return
+            self._servers.pop(server_id, None)
+            self._revisions[server_id] = self._revisions.get(server_id, 0) + 1
+
+    def sync(self, server_id, revision) -> bool:
+        """
+        Invalidate a server if it isn't at the given revision.
+
+        :returns bool: whether the server was invalidated
+        """
+        with self._lock:
+            if self.revision(server_id) == revision:
+                return False
+            generation, count = revision
+            if generation != self._generation:
+                self._generation = generation
+                self._servers.clear()
+            self._servers.pop(server_id, None)
+            self._revisions[server_id] = count
+            return True
+
+    def reset_counters(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _load(self, session, server_id) -> _ServerEquations:
+        equations = session.query(db.schema.Equation).filter(
+            db.schema.Equation.server_id == server_id).all()
+        return _ServerEquations([_record(e) for e in equations])
+
+    def get_all(self, session, server_id, strings, user_id=None) -> dict:
+        """
+        Find the equations of many strings such as `mod` or `mod:12`.
+
+        Strings that aren't in the catalog are looked up in the database with
+        a single query, in case the catalog is out of date.  Strings that
+        aren't in the database either are remembered until the server is
+        invalidated, so that they are only looked up once.
+
+        A dict of each string and its EquationRecord is returned, strings
+        that aren't found are left out.
+        """
+        strings = set(strings)
+        if not strings:
+            return dict()
+
+        with self._lock:
+            server = self._servers.get(server_id)
+        loaded = server is None
+        if loaded:
+            server = self._load(session, server_id)
+            with self._lock:
+                self._servers[server_id] = server
+
+        found = dict()
+        missing = list()
+        for string in strings:
+            record = server.find(db.database.parse_name(string), user_id)
+            if record is not None:
+                found[string] = record
+            elif (string, user_id) not in server.absent:
+                missing.append(string)
+
+        # A catalog that was just loaded can't be out of date
+        if missing and not loaded:
+            fallback = db.database.get_all_from_strings(
+                session, db.schema.Equation, missing, server_id, user_id)
+            if fallback:
+                # The catalog is out of date
+                self.invalidate(server_id)
+            for string, equation in fallback.items():
+                found[string] = _record(equation)
+        if missing:
+            with self._lock:
+                if len(server.absent) + len(missing) > MAX_ABSENT:
+                    server.absent.clear()
+                server.absent.update((string, user_id) for string in missing
+                                     if string not in found)
+
+        with self._lock:
+            if loaded:
+                self.misses += len(strings)
+            else:
+                self.misses += len(missing)
+                self.hits += len(strings) - len(missing)
+
+        return found
+
+    def get(self, session, server_id, string, user_id=None) -> EquationRecord:
+        """
+        Find the equation of a string, or None if there isn't one.
+        """
+        return self.get_all(session, server_id, [string], user_id).get(string)
+
+    def __str__(self):
+        return "<EquationCatalog(servers={}, hits={}, misses={})>".format(
+            len(self._servers), self.hits, self.misses)
@@ -1,5 +1,6 @@
 import math
-import asyncio
+import contextlib
+import threading
 
 from . import truerandom
 
@@ -12,80 +13,244 @@ class Dice:
 
     def __init__(self):
         self._low = False
-        self._rolled_dice = list()
-        self._enable_logging = False
+        self._client = None
+        self._refiller = None
+        self._sources = dict()
+        # The seed of the sources, instead of the seed in the config
+        self._seed = None
+        self._local = threading.local()
 
     @property
-    def logging_enabled(self):
-        return self._enable_logging
+    def low(self):
+        return self._low
+
+    def get_source(self, name=None) -> truerandom.RandomSource:
+        """
+        Get the random source with a name, or the default source from the
+        config.
 
-    @logging_enabled.setter
-    def logging_enabled(self, value):
+        :raises ValueError: if there is no source with the name
         """
-        Setting this to True will clear the current log.
+        settings = config.config.random
+        if name is None:
+            name = settings.source or \
+                ('randomorg' if settings.useRandomDotOrg else 'system')
+        source = self._sources.get(name)
+        if source is None:
+            seed = settings.seed if self._seed is None else self._seed
+            source = truerandom.create_source(name, seed)
+            self._sources[name] = source
+        return source
+
+    def server_source(self, server) -> truerandom.RandomSource:
+        """
+        Get the random source that a server uses.
+
+        A server that chose a source that servers can't use, such as the
+        seeded source, uses the default source.
+        """
+        name = server.random_source if server is not None else None
+        if name not in truerandom.SERVER_SOURCES:
+            name = None
+        return self.get_source(name)
+
+    def reset_sources(self, seed=None):
         """
-        if value is True:
-            self._rolled_dice = list()
-        self._enable_logging = bool(value)
+        Forget every source, so that they are created again.
+
+        :param seed: the seed of the new sources, instead of the seed in the
+            config
+        """
+        self._sources.clear()
+        self._seed = seed
 
     @property
-    def low(self):
-        return self._low
+    def source(self) -> truerandom.RandomSource:
+        """
+        The source that dice are rolled from.
+        """
+        source = getattr(self._local, 'source', None)
+        return source if source is not None else self.get_source()
+
+    @contextlib.contextmanager
+    def using(self, source):
+        """
+        Roll the dice from a source within the block.
+        """
+        previous = getattr(self._local, 'source', None)
+        self._local.source = source
+        try:
+            yield source
+        finally:
+            self._local.source = previous
+
+    @contextlib.contextmanager
+    def logging_to(self, log: list):
+        """
+        Add each die that is rolled within the block to log, as a
+        (value, sides) pair.  The dice aren't logged if log is None.
+
+        The log is only used by the thread that the block runs in, so
+        calculations that overlap each keep their own log.
+        """
+        previous = getattr(self._local, 'log', None)
+        self._local.log = log
+        try:
+            yield log
+        finally:
+            self._local.log = previous
 
     @property
-    def rolled_dice(self):
+    def client(self) -> truerandom.RandomOrgClient:
+        """
+        The random.org client, with the settings from the config.
         """
-        This is a log of all the dice rolled.
+        if self._client is None:
+            settings = config.config.random
+            self._client = truerandom.RandomOrgClient(
+                timeout=settings.timeout,
+                retries=settings.retries,
+                failure_threshold=settings.failureThreshold,
+                reset_timeout=settings.resetTimeout,
+                api_key=settings.apiKey)
+        return self._client
 
-        To enable the logging of dice, the variable logging_enabled
-        should be set to True. That way, any unintentional dice rolls
-        will not be logged.
+    @property
+    def refiller(self) -> truerandom.Refiller:
+        """
+        The task that keeps the entropy pool filled.
+        """
+        if self._refiller is None:
+            settings = config.config.random
+            self._refiller = truerandom.Refiller(
+                truerandom.entropy,
+                truerandom.populate_random_buffer,
+                self.client,
+                use_true_random=settings.useRandomDotOrg,
+                min_bytes=settings.preFetchCount,
+                headroom=settings.headroom,
+                quota_ttl=settings.quotaTtl)
+        return self._refiller
+
+    def load_entropy(self):
+        """
+        Load the bytes that were left in the entropy pool when the bot
+        stopped, and keep the pool in the entropy file from now on.
+        """
+        path = config.config.random.entropyFile
+        if path:
+            truerandom.entropy.attach(truerandom.EntropyStore(path))
 
-        Reading from rolled_dice will clear the list.
+    def save_entropy(self):
         """
-        dice = self._rolled_dice
-        self._rolled_dice = list()
-        return dice
+        Save the bytes that are left in the entropy pool, and close the
+        entropy file.
+        """
+        truerandom.entropy.save()
+        store = truerandom.entropy.detach()
+        if store is not None:
+            store.close()
+
+    def lend_entropy(self, dice: int = None) -> bytes:
+        """
+        Take enough bytes out of the entropy pool for a worker process to
+        roll a number of dice from, by default the most dice that any
+        calculation can roll.
+        """
+        if dice is None:
+            dice = config.config.calculator.maxDice
+        if dice <= 0:
+            return b''
+        pool = truerandom.entropy
+        return pool.lend(math.ceil(dice * pool.bits_per_number / 8) + 8)
+
+    def repay_entropy(self, statement: dict):
+        """
+        Give back the bytes that a worker process didn't use to the entropy
+        pool.
+        """
+        truerandom.entropy.repay(statement)
+        if statement['drawn']:
+            self._low = truerandom.entropy.low
 
     async def load_random_buffer(self):
-        await truerandom.populate_random_buffer(
-            120,
-            config.config.random.preFetchCount,
-            config.config.random.useRandomDotOrg)
+        """
+        Ask for the entropy pool to be filled in the background.
+
+        Any number of these can run at once, as there is only a single
+        refill at a time.
+        """
+        self.refiller.request()
 
         self._low = False
 
     def __log_roll(self, value):
-        if self._enable_logging:
-            self._rolled_dice.append(value)
+        log = getattr(self._local, 'log', None)
+        if log is not None:
+            log.append(value)
 
     def _roll(self, sides: int) -> int:
         if sides == 1:
             self.__log_roll((1, 1))
             return 1
 
-        if 120 % sides == 0:
-            rand, self._low = truerandom.randint(120, use_true_random=True)
-            die = rand % sides + 1
-            self.__log_roll((die, sides))
-            return die
-        die = truerandom.randint(sides, use_true_random=False)[0]
+        source = self.source
+        die = source.randint(sides)
+        self._low = source.low
         self.__log_roll((die, sides))
         return die
 
-    def roll(self, sides: int) -> int:
-        # "Authentically" roll percentile dice
+    def _roll_many(self, sides: int, count: int) -> list:
+        """
+        Roll count dice at once, with the same odds and logging as calling
+        _roll count times.
+        """
+        if count <= 0:
+            return []
+
+        source = self.source
+        dice = source.randints(count, sides)
+        self._low = source.low
+
+        log = getattr(self._local, 'log', None)
+        if log is not None:
+            log.extend((die, sides) for die in dice)
+        return dice
+
+    @staticmethod
+    def _percentile_dice(sides: int) -> int:
+        """
+        Get the number of d10s that are used to roll a die, or 0 if it
+        isn't rolled with percentile dice.
+
+        A die with a power of 10 sides, other than a d10, is rolled with a
+        d10 for each digit.
+        """
         log10 = math.log10(sides)
         if sides != 10 and int(log10) == log10:
-            dice = len(str(sides)) - 1
-            result = 0
-            for i in reversed(range(dice)):
-                roll = self._roll(10)
-                roll = 0 if roll is 10 else roll
-                result += 10 ** i * roll
-            if result == 0:
-                result = sides
-            return result
+            return len(str(sides)) - 1
+        return 0
+
+    @staticmethod
+    def _join_percentile(sides: int, rolls) -> int:
+        """
+        Join the d10 rolls of the digits of a percentile die, from the
+        highest digit to the lowest.
+        """
+        result = 0
+        for roll in rolls:
+            result = result * 10 + (0 if roll == 10 else roll)
+        return result or sides
+
+    def roll(self, sides: int) -> int:
+        if sides == 1:
+            return 1
+
+        # "Authentically" roll percentile dice
+        digits = self._percentile_dice(sides)
+        if digits:
+            return self._join_percentile(
+                sides, [self._roll(10) for _ in range(digits)])
 
         return self._roll(sides)
 
@@ -113,15 +278,26 @@ class Dice:
         """
         Roll a number of dice.
 
-        The returned value is a list of all the values of the dice.
+        The returned value is a list of all the values of the dice.  All of
+        the dice are rolled at once.
 
         :param int sides: the number of sides on the dice
         :param int times: the number of times to roll the dice
 
         :returns list: a list of all the rolled dice
         """
-        return [self.roll(sides)
-                for _ in range(min(times, self.__class__.MAX_ROLLS))]
+        times = min(times, self.__class__.MAX_ROLLS)
+        if times <= 0:
+            return []
+        if sides == 1:
+            return [1] * times
+
+        digits = self._percentile_dice(sides)
+        if digits:
+            rolls = self._roll_many(10, times * digits)
+            return [self._join_percentile(sides, rolls[i:i + digits])
+                    for i in range(0, len(rolls), digits)]
+        return self._roll_many(sides, times)
 
     def roll_top(self, sides: int, top_rolls=3, times=4, best=True) -> int:
         """
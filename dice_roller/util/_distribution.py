@@ -0,0 +1,414 @@
+import math
+import itertools
+import collections
+
+import numpy
+
+from . import BadEquation, _program
+from ._dice import Dice
+
+# The number of different results that a distribution may have
+MAX_OUTCOMES = 10000
+
+# The number of combinations of operands that a function may be calculated
+# with
+MAX_COMBINATIONS = 250000
+
+# The number of combinations of operands that the body of a custom equation
+# may be calculated with
+MAX_EXPANSIONS = 1000
+
+# The number of products that keep_dice may calculate, about half a second
+MAX_KEEP_WORK = 400000000
+
+# Convolutions of more than this many products are done with an FFT
+FFT_THRESHOLD = 2 ** 20
+
+
+class TooComplex(BadEquation):
+    """
+    The exact distribution of an equation can't be calculated, but it can
+    still be estimated.
+    """
+    pass
+
+
+class Distribution:
+    """
+    The exact probability distribution of the result of an equation.
+
+    pmf is a dict of every possible result, and its probability.
+    is_condition is True if the equation is a comparison, so that its
+    results are true (1) or false (0).
+    """
+
+    exact = True
+
+    def __init__(self, pmf: dict, is_condition=False):
+        if len(pmf) > MAX_OUTCOMES:
+            raise TooComplex(
+                "The equation has too many possible results to calculate.")
+        self.pmf = pmf
+        self.is_condition = is_condition
+
+    @classmethod
+    def constant(cls, value):
+        return cls({value: 1.0})
+
+    def items(self) -> list:
+        """
+        Get a sorted list of every (result, probability) pair.
+        """
+        return sorted(self.pmf.items())
+
+    @property
+    def min(self):
+        return min(self.pmf)
+
+    @property
+    def max(self):
+        return max(self.pmf)
+
+    @property
+    def mean(self) -> float:
+        try:
+            return sum(v * p for v, p in self.pmf.items())
+        except OverflowError:
+            raise BadEquation("The results of the equation are too large.")
+
+    @property
+    def variance(self) -> float:
+        mean = self.mean
+        try:
+            return sum((v - mean) ** 2 * p for v, p in self.pmf.items())
+        except OverflowError:
+            raise BadEquation("The results of the equation are too large.")
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def probability(self, predicate) -> float:
+        """
+        Get the probability that the result satisfies the predicate.
+        """
+        return min(sum(p for v, p in self.pmf.items() if predicate(v)), 1.0)
+
+    def at_least(self, value) -> float:
+        """
+        Get the probability that the result is at least value, which is the
+        chance of beating a DC.
+        """
+        return self.probability(lambda v: v >= value)
+
+    def percentile(self, percent):
+        """
+        Get the smallest result that is at least as high as the given percent
+        of all results.
+        """
+        total = 0.0
+        items = self.items()
+        for value, p in items:
+            total += p
+            # Allow for some rounding errors in the sum of the probabilities
+            if total >= percent / 100 - 1e-9:
+                return value
+        return items[-1][0]
+
+    def __len__(self):
+        return len(self.pmf)
+
+
+def _mix(weighted) -> Distribution:
+    """
+    Combine distributions that each happen with the given probability.
+
+    weighted is an iterable of (probability, Distribution).
+    """
+    pmf = collections.defaultdict(float)
+    for weight, dist in weighted:
+        if weight == 0:
+            continue
+        for value, p in dist.pmf.items():
+            pmf[value] += weight * p
+    return Distribution(dict(pmf))
+
+
+def _combinations(dists):
+    """
+    Iterate through every combination of values of the distributions with
+    the probability of the combination.
+    """
+    size = 1
+    for dist in dists:
+        size *= len(dist)
+    if size > MAX_COMBINATIONS:
+        raise TooComplex(
+            "The equation has too many possible results to calculate.")
+
+    for combination in itertools.product(*[d.pmf.items() for d in dists]):
+        p = 1.0
+        for _, prob in combination:
+            p *= prob
+        yield tuple(v for v, _ in combination), p
+
+
+def _apply(func, dists) -> Distribution:
+    """
+    Get the distribution of a function of independent distributions.
+    """
+    pmf = collections.defaultdict(float)
+    for values, p in _combinations(dists):
+        try:
+            pmf[func(*values)] += p
+        except BadEquation:
+            raise
+        except Exception as e:
+            raise BadEquation(str(e))
+    return Distribution(dict(pmf))
+
+
+def check_sides(sides):
+    if sides < 1:
+        raise BadEquation("A die must have at least one side.")
+
+
+def _convolve(a, b):
+    """
+    Get the probabilities of the sum of two independent numbers, from the
+    arrays of the probabilities of each of their values.
+
+    Small arrays are convolved directly, which keeps the precision of the
+    least likely results.  Large arrays are convolved with an FFT, whose
+    rounding errors are far too small to change any of the odds that are
+    shown.
+    """
+    if len(a) * len(b) <= FFT_THRESHOLD:
+        return numpy.convolve(a, b)
+    size = len(a) + len(b) - 1
+    n = 1 << (size - 1).bit_length()
+    result = numpy.fft.irfft(numpy.fft.rfft(a, n) * numpy.fft.rfft(b, n),
+                             n)[:size]
+    # Rounding errors can make the least likely results slightly negative
+    return numpy.clip(result, 0, None)
+
+
+def sum_dice(times, sides) -> Distribution:
+    """
+    Get the distribution of the sum of a number of dice.
+
+    The dice are added by squaring, so only about log2(times) convolutions
+    are needed.
+    """
+    times = min(times, Dice.MAX_ROLLS)
+    if times <= 0:
+        return Distribution.constant(0)
+    check_sides(sides)
+    if times * (sides - 1) + 1 > MAX_OUTCOMES:
+        raise TooComplex(
+            "The equation has too many possible results to calculate.")
+
+    # probs[i] is the chance to roll a sum of i + times
+    die = numpy.full(sides, 1 / sides)
+    probs = numpy.ones(1)
+    count = times
+    while count:
+        if count & 1:
+            probs = _convolve(probs, die)
+        count >>= 1
+        if count:
+            die = _convolve(die, die)
+
+    return Distribution(dict(zip(range(times, times * sides + 1),
+                                 probs.tolist())))
+
+
+def keep_dice(times, sides, keep, best=True) -> Distribution:
+    """
+    Get the distribution of the sum of the highest (or lowest) dice.
+
+    The faces are gone through from best to worst, and the dice that land on
+    each face are counted until enough dice have been kept.  The dice that
+    are left over must all be worse than the current face.  The chances of
+    every sum of the counted dice are kept in an array for each number of
+    counted dice.
+    """
+    times = min(times, Dice.MAX_ROLLS)
+    keep = min(keep, times)
+    if keep <= 0:
+        return Distribution.constant(0)
+    if keep == times:
+        return sum_dice(times, sides)
+    check_sides(sides)
+    if keep * (sides - 1) + 1 > MAX_OUTCOMES:
+        raise TooComplex(
+            "The equation has too many possible results to calculate.")
+    size = keep * sides + 1
+    # Every face adds each number of counted dice to each of the others
+    if sides * keep * keep * size > MAX_KEEP_WORK:
+        raise TooComplex("Too many dice are kept to calculate the odds.")
+
+    faces = range(sides, 0, -1) if best else range(1, sides + 1)
+    face_p = 1 / sides
+
+    counted = numpy.arange(keep)
+    remaining = times - counted
+    on_face = numpy.arange(keep)
+    # ways[k, c] is the chance that c of the dice that are left after k were
+    # counted land on a face, not counting where the other dice land
+    ways = numpy.zeros((keep, keep))
+    ways[:, 0] = 1
+    for c in range(1, keep):
+        ways[:, c] = ways[:, c - 1] * (remaining - c + 1) / c * face_p
+    # Too few dice land on the face to keep the rest of the dice
+    too_few = on_face[None, :] < keep - counted[:, None]
+
+    # states[k, total] is the chance that k dice were counted on a better
+    # face, with a sum of total
+    states = numpy.zeros((keep, size))
+    states[0, 0] = 1.0
+    pmf = numpy.zeros(size)
+    for index, face in enumerate(faces):
+        # The chance that a die lands on a face that is worse than this one
+        worse = (sides - index - 1) / sides
+
+        # The chance that enough dice land on this face, and every other die
+        # on a worse face
+        short = (ways * worse ** (remaining[:, None] - on_face))[too_few]
+        done = (face_p + worse) ** remaining - numpy.bincount(
+            numpy.nonzero(too_few)[0], short, minlength=keep)
+        done = numpy.clip(done, 0, None)
+        for k in range(keep):
+            shift = face * (keep - k)
+            pmf[shift:] += states[k, :size - shift] * done[k]
+
+        new_states = numpy.zeros((keep, size))
+        for c in range(keep):
+            shift = face * c
+            new_states[c:, shift:] += \
+                ways[:keep - c, c, None] * states[:keep - c, :size - shift]
+        states = new_states
+
+    return Distribution(dict(
+        (v, p) for v, p in enumerate(pmf.tolist()) if p > 0))
+
+
+# The distributions of the random functions, these mirror the functions in
+# Calculator.functions
+random_distributions = {
+    'd': lambda a, b: sum_dice(round(a), round(b)),
+    'adv': lambda a: keep_dice(2, round(a), 1),
+    'dis': lambda a: keep_dice(2, round(a), 1, False),
+    'top': lambda a, b, c: keep_dice(round(a), round(b), round(c)),
+    'bot': lambda a, b, c: keep_dice(round(a), round(b), round(c), False),
+}
+
+
+def _fork(budget):
+    return None if budget is None else budget.fork()
+
+
+def _join(budget, forks):
+    if budget is not None:
+        budget.join(forks)
+
+
+def charge(node, bounds, calculator, budget) -> int:
+    """
+    Charge a function to the budget with the operands that cost the most.
+
+    bounds are the (lowest, highest) values of each operand.  Returns the
+    most dice that the function rolls.
+    """
+    check = calculator.budget_checks.get(node.name)
+    if budget is None or check is None:
+        return 0
+    dice = budget.dice
+    # The checks cost the most at the extremes of the operands
+    forks = list()
+    for operands in itertools.product(*[set(b) for b in bounds]):
+        fork = budget.fork()
+        check(fork, *operands)
+        forks.append(fork)
+    budget.join(forks)
+    return budget.dice - dice
+
+
+def distribution(node, calculator, budget=None) -> Distribution:
+    """
+    Get the distribution of a compiled equation.
+
+    Every die in an equation is rolled independently, so the distribution of
+    a function is found from the distributions of its operands.  An inlined
+    custom equation uses its operands more than once, so its body is found
+    separately for each combination of them.
+
+    If a budget is given, each function is charged to it with the operands
+    that cost the most, and only the most expensive of the alternatives,
+    such as the branches of an if, is charged.
+    """
+    if isinstance(node, _program.Constant):
+        return Distribution.constant(node.value)
+
+    if isinstance(node, _program.Let):
+        args = [distribution(a, calculator, budget) for a in node.args]
+        size = 1
+        for arg in args:
+            size *= len(arg)
+        if size > MAX_EXPANSIONS:
+            raise TooComplex(
+                "The equation has too many possible results to calculate.")
+        weighted = list()
+        forks = list()
+        for values, p in _combinations(args):
+            body = _program.fold(_program.substitute(node.body, dict(
+                (i, _program.Constant(v)) for i, v in enumerate(values))),
+                calculator)
+            fork = _fork(budget)
+            weighted.append((p, distribution(body, calculator, fork)))
+            forks.append(fork)
+        _join(budget, forks)
+        return _mix(weighted)
+
+    if isinstance(node, _program.Param):
+        raise TooComplex("Can't calculate the odds of the equation")
+
+    if node.name == 'if':
+        condition = distribution(node.args[0], calculator, budget)
+        from ._calculator import isTrue
+        p = condition.probability(isTrue)
+        weighted = list()
+        forks = list()
+        # Only calculate the branches that can happen
+        for branch, weight in [(node.args[1], p), (node.args[2], 1 - p)]:
+            if weight > 0:
+                fork = _fork(budget)
+                weighted.append((weight,
+                                 distribution(branch, calculator, fork)))
+                forks.append(fork)
+        _join(budget, forks)
+        return _mix(weighted)
+
+    args = [distribution(a, calculator, budget) for a in node.args]
+    charge(node, [(d.min, d.max) for d in args], calculator, budget)
+
+    if node.name in random_distributions:
+        func = random_distributions[node.name]
+        results = dict()
+        weighted = list()
+        for values, p in _combinations(args):
+            if values not in results:
+                try:
+                    results[values] = func(*values)
+                except BadEquation:
+                    raise
+                except Exception as e:
+                    raise BadEquation(str(e))
+            weighted.append((p, results[values]))
+        return _mix(weighted)
+
+    if node.name in calculator.functions:
+        return _apply(calculator.functions[node.name], args)
+
+    raise TooComplex(
+        "Can't calculate the odds of **{}**".format(node.name))
@@ -0,0 +1,104 @@
+import asyncio
+import collections
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class _Job:
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.callbacks = list()
+
+
+class JobQueue:
+    """
+    Runs coroutines in the background, one at a time for each group, such as
+    a server.
+
+    Each job has a key.  A job that is submitted while a job with the same
+    key is waiting is merged into it, so that repeated edits are only
+    handled once.  A job that is already running isn't merged, as it may have
+    missed the newer edit.
+
+    When a job finishes, the callbacks of every job that was merged into it
+    are awaited with callback(result, error).
+    """
+
+    def __init__(self):
+        # group -> key -> _Job, in the order they were submitted
+        self._waiting = dict()
+        self._tasks = dict()
+        self._running = dict()
+
+    def submit(self, group, key, func, *args, callback=None) -> bool:
+        """
+        Run `await func(*args)` after the other jobs of the group.
+
+        :returns bool: False if the job was merged with a waiting job
+        """
+        waiting = self._waiting.setdefault(group, collections.OrderedDict())
+        job = waiting.get(key)
+        merged = job is not None
+        if not merged:
+            job = waiting[key] = _Job(func, args)
+        if callback is not None:
+            job.callbacks.append(callback)
+
+        if group not in self._tasks:
+            self._tasks[group] = asyncio.ensure_future(self._run(group))
+        return not merged
+
+    async def _run(self, group):
+        waiting = self._waiting[group]
+        try:
+            while waiting:
+                key, job = waiting.popitem(last=False)
+                self._running[group] = key
+
+                result = error = None
+                try:
+                    result = await job.func(*job.args)
+                except Exception as exception:
+                    _logger.exception("The job {} failed".format(key))
+                    error = exception
+
+                for callback in job.callbacks:
+                    try:
+                        await callback(result, error)
+                    except Exception:
+                        _logger.exception(
+                            "The callback of the job {} failed".format(key))
+        finally:
+            self._running.pop(group, None)
+            del self._tasks[group]
+            if not waiting:
+                del self._waiting[group]
+
+    def running(self, group):
+        """
+        Get the key of the job of a group that is running, or None.
+        """
+        return self._running.get(group)
+
+    def pending(self, group=None) -> int:
+        """
+        Get the number of jobs that are waiting in a group, or in every group.
+        """
+        if group is not None:
+            return len(self._waiting.get(group, ()))
+        return sum(len(w) for w in self._waiting.values())
+
+    async def join(self):
+        """
+        Wait until every job has finished, including jobs that are submitted
+        while waiting.
+        """
+        while self._tasks:
+            await asyncio.wait(list(self._tasks.values()))
+
+    def __str__(self):
+        return "<JobQueue(running={}, waiting={})>".format(
+            len(self._running), self.pending())
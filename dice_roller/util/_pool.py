@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+
+import numpy
+
+from . import BadEquation, dice, calculator, stats_cache, truerandom
+from ._budget import Budget
+from ._calculator import EvaluationContext
+from .. import db
+from ..config import config
+
+_logger = logging.getLogger(__name__)
+
+
+def _init_worker(workers):
+    """
+    Setup a newly started worker process.
+
+    :param workers: a shared count of the workers that were started
+    """
+    # A forked worker has a copy of the entropy pool, and would roll the
+    # same numbers as the bot.  The workers only roll from the bytes that
+    # the bot lends them with each calculation, and leave the store of the
+    # bot alone.
+    truerandom.entropy.borrow(b'')
+    # The generators of the sources would also roll the same numbers, so
+    # every worker, even one that replaces another, is seeded from its own
+    # stream of the configured seed
+    with workers.get_lock():
+        workers.value += 1
+        index = workers.value
+    sequence = numpy.random.SeedSequence(config.config.random.seed,
+                                         spawn_key=(index,))
+    dice.reset_sources(int.from_bytes(
+        sequence.generate_state(4).tobytes(), 'little'))
+    # Connections can't be shared with the parent process
+    db.database.dispose()
+    # Ctrl-C is handled by the bot
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run_with_entropy(loan: bytes, func, *args):
+    """
+    Call func(*args) in a worker, rolling from the bytes that the bot lent.
+
+    The result, or the exception that func raised, is returned with the
+    statement of the loan, so that the bytes that weren't used are always
+    given back.
+    """
+    truerandom.entropy.borrow(loan)
+    try:
+        result, error = func(*args), None
+    except Exception as exception:
+        result, error = None, exception
+    return result, error, truerandom.entropy.statement()
+
+
+def _user(session, user_id):
+    if user_id is None:
+        return None
+    return session.query(db.schema.User).get(user_id)
+
+
+def user_revision(user) -> (int, tuple):
+    """
+    Get the id of a user, and the revision of their stats and their active
+    server's equations to calculate an equation in the pool with.
+    """
+    if user is None:
+        return None, None
+    server_id = user.active_server_id
+    return user.id, (calculator.revision(server_id),
+                     stats_cache.version(user.id, server_id))
+
+
+def dice_budget(user) -> int:
+    """
+    Get the most dice that a calculation by a user can roll, which is as
+    many as the entropy for the calculation is lent for.
+    """
+    return Budget.for_server(
+        user.active_server if user is not None else None).max_dice
+
+
+def _load_user(session, user_id, revision):
+    """
+    Load a user, and make sure that their stats and the equations of their
+    active server are at the same revision as in the bot.
+    """
+    user = _user(session, user_id)
+    if user is not None and revision is not None:
+        equations, stats = revision
+        calculator.sync(user.active_server_id, equations)
+        stats_cache.sync(user.id, user.active_server_id, stats)
+    return user
+
+
+def evaluate(equation: str, user_id=None, revision=None) -> (object, list):
+    """
+    Calculate an equation, and log the dice that were rolled.
+
+    The user is loaded by their id, so that it can be done in a worker
+    process.  Variables should already be parsed out of the equation.
+    revision is the user_revision() of the user.
+
+    :returns (value, rolled_dice):
+    """
+    with db.database.session() as session:
+        context = EvaluationContext(
+            session, _load_user(session, user_id, revision),
+            rolled_dice=list())
+        value = calculator.parse_equation(equation, context=context)
+        return value, context.rolled_dice
+
+
+def evaluate_distribution(equation: str, user_id=None, samples=None,
+                          revision=None):
+    """
+    Calculate the distribution of an equation.
+    """
+    with db.database.session() as session:
+        return calculator.distribution(
+            equation, session, _load_user(session, user_id, revision),
+            samples=samples)
+
+
+class EvaluationPool:
+    """
+    A pool of processes that equations are calculated in.
+
+    Equations are calculated in another process so that a slow equation
+    can't stop the bot from responding to anyone else.  If an equation takes
+    longer than the timeout, the pool is restarted to kill it.
+
+    The workers roll their dice from bytes of the bot's entropy pool, which
+    are lent with each calculation, and the bytes they don't use are given
+    back.
+
+    The pool is configured in the calculator section of the config.  If the
+    poolSize is 0, equations are calculated in the bot's process, where
+    they can't be stopped by the timeout.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._pending = set()
+        # Shared with the workers, to give each one its own seed
+        self._workers = multiprocessing.Value('L', 0)
+
+    @property
+    def enabled(self) -> bool:
+        return config.config.calculator.poolSize > 0
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    def start(self):
+        """
+        Start the worker processes if they aren't already running.
+        """
+        if self._pool is not None:
+            return
+        size = config.config.calculator.poolSize
+        _logger.info("Starting {} calculator processes".format(size))
+        self._pool = multiprocessing.Pool(
+            size, initializer=_init_worker, initargs=(self._workers,),
+            maxtasksperchild=config.config.calculator.maxTasksPerWorker or None)
+
+    def close(self):
+        """
+        Stop the worker processes, waiting for any calculations to finish.
+        """
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def _kill(self):
+        """
+        Kill every worker, and fail all of the calculations in the pool.
+        """
+        pool = self._pool
+        self._pool = None
+        pending = self._pending
+        self._pending = set()
+        for future in pending:
+            if not future.done():
+                future.set_exception(BadEquation(
+                    "The calculation was interrupted, please try again."))
+        return pool
+
+    async def run(self, func, *args, max_dice: int = None):
+        """
+        Run func(*args) in the pool.
+
+        max_dice is the most dice that func can roll, which is how much
+        entropy is lent to the worker, by default for the most dice of any
+        calculation.
+
+        If the pool is disabled, func is called right away.  A BadEquation
+        is raised if the function doesn't finish before the timeout.
+        """
+        if not self.enabled:
+            return func(*args)
+        self.start()
+
+        loop = asyncio.get_event_loop()
+        future = asyncio.Future(loop=loop)
+        self._pending.add(future)
+
+        def set_result(answer):
+            result, error, statement = answer
+            dice.repay_entropy(statement)
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def set_exception(exception):
+            if not future.done():
+                future.set_exception(exception)
+
+        # The dice are rolled from the bot's entropy pool, the bytes are lost
+        # if the worker is killed, but never used twice
+        loan = dice.lend_entropy(max_dice)
+        # The callbacks are called from the pool's result thread
+        self._pool.apply_async(
+            _run_with_entropy, (loan, func) + args,
+            callback=lambda v: loop.call_soon_threadsafe(set_result, v),
+            error_callback=lambda e: loop.call_soon_threadsafe(
+                set_exception, e))
+
+        timeout = config.config.calculator.timeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            _logger.warning("A calculation took longer than {}s, "
+                            "restarting the pool".format(timeout))
+            self._pending.discard(future)
+            future.cancel()
+            pool = self._kill()
+            # Terminating the pool waits for the workers to exit
+            await loop.run_in_executor(None, pool.terminate)
+            raise BadEquation("The equation took too long to calculate.")
+        finally:
+            self._pending.discard(future)
@@ -0,0 +1,323 @@
+from . import BadEquation
+from ._budget import Budget
+
+
+class Constant:
+    """
+    A number in a compiled equation.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return "<Constant({})>".format(self.value)
+
+
+class Call:
+    """
+    A function call in a compiled equation.
+
+    Operators are treated as functions, so `1 + 2` is a Call to `+` with the
+    arguments 1 and 2.
+    """
+
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __repr__(self):
+        return "<Call({}, {})>".format(self.name, self.args)
+
+
+class Param:
+    """
+    A parameter of a custom equation.
+
+    Its value is the operand of the Let that the custom equation was
+    inlined with.
+    """
+
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+    def __repr__(self):
+        return "<Param({})>".format(self.index)
+
+
+class Let:
+    """
+    A custom equation that was inlined into a compiled equation.
+
+    The operands are calculated once, and are the values of the Params in
+    the body.  The Params of any Let inside of the body belong to that Let.
+    """
+
+    __slots__ = ('name', 'args', 'body')
+
+    def __init__(self, name, args, body):
+        self.name = name
+        self.args = args
+        self.body = body
+
+    def __repr__(self):
+        return "<Let({}, {}, {})>".format(self.name, self.args, self.body)
+
+
+def build(equation, function_length) -> Call:
+    """
+    Build a tree of Constants and Calls from a Shunting Yard equation.
+
+    function_length is a function that gets the number of operands a function
+    takes.
+    """
+    stack = list()
+
+    for i in equation:
+        if isinstance(i, float):
+            stack.append(Constant(i))
+            continue
+        if isinstance(i, Param):
+            stack.append(i)
+            continue
+
+        length = function_length(i)
+        if len(stack) < length:
+            raise BadEquation("Invalid number of operands")
+
+        args = tuple(stack[len(stack) - length:])
+        del stack[len(stack) - length:]
+        stack.append(Call(i, args))
+
+    if len(stack) != 1:
+        raise BadEquation("Invalid number of operands.")
+
+    return stack.pop()
+
+
+def substitute(node, values: dict):
+    """
+    Replace the Params of an equation with the nodes in values by their
+    index.
+    """
+    if isinstance(node, Param):
+        return values.get(node.index, node)
+    if isinstance(node, Constant):
+        return node
+    args = tuple(substitute(a, values) for a in node.args)
+    if isinstance(node, Let):
+        # The body of a Let has its own Params
+        return Let(node.name, args, node.body)
+    return Call(node.name, args)
+
+
+def fold(node, calculator):
+    """
+    Replace every part of an equation that always has the same value with a
+    Constant.
+
+    A Call is folded when all of its operands are constant and it isn't a
+    random function or a custom equation.  An if with a constant condition is
+    replaced by the branch it takes.
+
+    If a function fails while folding, it is left as it is, so that the
+    error is only raised if it is ever calculated.  Functions with a budget
+    check are only folded if they are within the default Budget.
+
+    The constant operands of a Let are put in its body, and if they are all
+    constant, the Let is replaced by its body.
+    """
+    if isinstance(node, (Constant, Param)):
+        return node
+
+    if isinstance(node, Let):
+        args = tuple(fold(a, calculator) for a in node.args)
+        constants = dict((i, a) for i, a in enumerate(args)
+                         if isinstance(a, Constant))
+        body = node.body
+        if constants:
+            body = fold(substitute(body, constants), calculator)
+        if len(constants) == len(args):
+            if isinstance(body, Constant):
+                return Constant(_to_number(body.value))
+            return body
+        return Let(node.name, args, body)
+
+    args = tuple(fold(a, calculator) for a in node.args)
+    node = Call(node.name, args)
+
+    constant = all(isinstance(a, Constant) for a in args)
+
+    if node.name == 'if' and isinstance(args[0], Constant):
+        from ._calculator import isTrue
+        return args[1] if isTrue(args[0].value) else args[2]
+
+    if not constant or node.name in calculator.random_functions:
+        return node
+
+    values = [a.value for a in args]
+
+    try:
+        check = calculator.budget_checks.get(node.name)
+        if check is not None:
+            check(Budget(), *values)
+        if node.name in calculator.lazy_functions:
+            lazy = calculator.lazy_functions[node.name]
+            return Constant(lazy(None, *[
+                (lambda ctx, v=v: v) for v in values]))
+        if node.name in calculator.functions:
+            return Constant(calculator.functions[node.name](*values))
+    except Exception:
+        pass
+
+    return node
+
+
+def _to_number(value):
+    # Custom equations give an int when their value is a whole number
+    try:
+        return int(value) if value == int(value) else value
+    except (OverflowError, ValueError):
+        return value
+
+
+def compile_node(node, calculator):
+    """
+    Compile a node into a function that calculates its value.
+
+    The compiled function takes the EvaluationContext of the calculation.
+
+    Builtin functions are resolved while compiling, so calculating the
+    equation is just a chain of python function calls.  Lazy functions are
+    given the compiled functions of their operands, so they only calculate
+    the operands they need.  Any other function is passed to
+    calculator._call_equation(context, name, args) when it is calculated,
+    which is used for custom equations.
+
+    Functions in calculator.budget_checks are charged to the budget of the
+    context before they are called.
+
+    A Let stores the values of its operands in the params of the context
+    while its body is calculated, and each time it is calculated it is
+    charged to the budget as a custom equation.
+    """
+    if isinstance(node, Constant):
+        value = node.value
+        return lambda ctx: value
+
+    if isinstance(node, Param):
+        index = node.index
+        return lambda ctx: ctx.params[index]
+
+    if isinstance(node, Let):
+        args = [compile_node(a, calculator) for a in node.args]
+        body = compile_node(node.body, calculator)
+
+        def let(ctx):
+            values = [a(ctx) for a in args]
+            ctx.budget.expand()
+            params = ctx.params
+            ctx.params = values
+            try:
+                return _to_number(body(ctx))
+            finally:
+                ctx.params = params
+        return let
+
+    args = [compile_node(a, calculator) for a in node.args]
+
+    try:
+        lazy = calculator.lazy_functions[node.name]
+        return lambda ctx: lazy(ctx, *args)
+    except KeyError:
+        pass
+
+    try:
+        func = calculator.functions[node.name]
+    except KeyError:
+        name = node.name
+        call = calculator._call_equation
+        return lambda ctx: call(ctx, name, [a(ctx) for a in args])
+
+    check = calculator.budget_checks.get(node.name)
+    if check is not None:
+        def checked(ctx):
+            values = [a(ctx) for a in args]
+            if ctx is not None:
+                check(ctx.budget, *values)
+            return func(*values)
+        return checked
+
+    if len(args) == 0:
+        return lambda ctx: func()
+    if len(args) == 1:
+        a, = args
+        return lambda ctx: func(a(ctx))
+    if len(args) == 2:
+        a, b = args
+        return lambda ctx: func(a(ctx), b(ctx))
+    if len(args) == 3:
+        a, b, c = args
+        return lambda ctx: func(a(ctx), b(ctx), c(ctx))
+    return lambda ctx: func(*[a(ctx) for a in args])
+
+
+def count_steps(node) -> int:
+    """
+    Count the functions in an equation.
+    """
+    if isinstance(node, (Constant, Param)):
+        return 0
+    steps = 1 + sum(count_steps(a) for a in node.args)
+    if isinstance(node, Let):
+        steps += count_steps(node.body)
+    return steps
+
+
+class Program:
+    """
+    A compiled equation that can be calculated any number of times.
+
+    A Program doesn't hold any state of its own, so it can be shared between
+    calculations.  The parts of the equation that don't roll any dice are
+    calculated once while compiling.
+
+    Every function in the equation is charged as a step to the budget of the
+    context before it is calculated, even the branches of an if that won't
+    be taken.
+    """
+
+    def __init__(self, root, calculator, uses_stats=False):
+        # Whether the inlined custom equations used any stats
+        self.uses_stats = uses_stats
+        try:
+            self.root = fold(root, calculator)
+            self.steps = count_steps(self.root)
+            self._run = compile_node(self.root, calculator)
+        except RecursionError:
+            raise BadEquation("The equation is too complex.")
+
+    @property
+    def is_constant(self) -> bool:
+        """
+        Whether the equation always has the same value.
+        """
+        return isinstance(self.root, Constant)
+
+    def __call__(self, context=None) -> float:
+        if context is not None:
+            context.budget.step(self.steps)
+        try:
+            return self._run(context)
+        except BadEquation:
+            raise
+        except RecursionError:
+            raise BadEquation("The equation is too complex.")
+        except Exception as e:
+            raise BadEquation(str(e))
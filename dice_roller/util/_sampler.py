@@ -0,0 +1,328 @@
+import math
+
+import numpy
+
+from . import BadEquation, _program
+from ._dice import Dice
+from ._distribution import TooComplex, MAX_EXPANSIONS, check_sides, charge
+from ._program import _to_number
+
+# The number of dice that are rolled at once
+_CHUNK_SIZE = 2 ** 22
+
+# The number of groups of samples with different operands, times the dice
+# rolled for each of them, that a random function may be sampled with
+MAX_GROUP_DICE = 1000000
+
+
+class Samples:
+    """
+    The results of calculating an equation many times.
+
+    This has the same summaries as a Distribution, but they are estimated
+    from the samples.  values is a numpy array of every result.
+    """
+
+    exact = False
+
+    def __init__(self, values, is_condition=False):
+        self.values = values
+        self.is_condition = is_condition
+        self._sorted = None
+
+    @property
+    def min(self):
+        return _to_number(self.values.min())
+
+    @property
+    def max(self):
+        return _to_number(self.values.max())
+
+    @property
+    def mean(self) -> float:
+        try:
+            return float(self.values.mean())
+        except OverflowError:
+            raise BadEquation("The results of the equation are too large.")
+
+    @property
+    def variance(self) -> float:
+        try:
+            return float(self.values.var())
+        except OverflowError:
+            raise BadEquation("The results of the equation are too large.")
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def probability(self, predicate) -> float:
+        values, counts = numpy.unique(self.values, return_counts=True)
+        return sum(int(c) for v, c in zip(values, counts)
+                   if predicate(_to_number(v))) / len(self.values)
+
+    def at_least(self, value) -> float:
+        return float(numpy.count_nonzero(self.values >= value)) \
+            / len(self.values)
+
+    def percentile(self, percent):
+        """
+        Get the smallest result that is at least as high as the given percent
+        of all results.
+        """
+        if self._sorted is None:
+            self._sorted = numpy.sort(self.values)
+        index = int(math.ceil(percent / 100 * len(self._sorted))) - 1
+        return _to_number(self._sorted[min(max(index, 0),
+                                           len(self._sorted) - 1)])
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _check(values):
+    if not numpy.all(numpy.isfinite(values)):
+        raise BadEquation("The result is too large.")
+    return values
+
+
+def _divide(a, b):
+    if numpy.any(b == 0):
+        raise BadEquation("division by zero")
+    return numpy.true_divide(a, b)
+
+
+def _modulo(a, b):
+    if numpy.any(b == 0):
+        raise BadEquation("modulo by zero")
+    return numpy.mod(a, b)
+
+
+def _condition(func):
+    return lambda a, b: func(a, b).astype(float)
+
+
+# The vectorized versions of the builtin functions in Calculator.functions
+functions = {
+    '+': numpy.add,
+    '-': numpy.subtract,
+    '*': numpy.multiply,
+    '/': _divide,
+    '^': numpy.power,
+    '%': _modulo,
+
+    '<': _condition(numpy.less),
+    '<=': _condition(numpy.less_equal),
+    '>=': _condition(numpy.greater_equal),
+    '>': _condition(numpy.greater),
+    '<>': _condition(numpy.not_equal),
+    '=': _condition(numpy.equal),
+    'and': _condition(lambda a, b: (a > 0) & (b > 0)),
+    'or': _condition(lambda a, b: (a > 0) | (b > 0)),
+
+    'round': numpy.round,
+    'max': numpy.maximum,
+    'min': numpy.minimum,
+    'floor': numpy.floor,
+    'ceil': numpy.ceil,
+}
+
+
+def sum_dice(rng, size, times, sides):
+    """
+    Roll size sums of a number of dice.
+    """
+    times = min(times, Dice.MAX_ROLLS)
+    total = numpy.zeros(size)
+    if times <= 0:
+        return total
+    check_sides(sides)
+    chunk = max(_CHUNK_SIZE // times, 1)
+    for start in range(0, size, chunk):
+        count = min(chunk, size - start)
+        rolls = rng.integers(1, sides + 1, size=(count, times))
+        total[start:start + count] = rolls.sum(axis=1, dtype=float)
+    return total
+
+
+def keep_dice(rng, size, times, sides, keep, best=True):
+    """
+    Roll size sums of the highest (or lowest) of a number of dice.
+    """
+    times = min(times, Dice.MAX_ROLLS)
+    keep = min(keep, times)
+    if keep <= 0:
+        return numpy.zeros(size)
+    if keep == times:
+        return sum_dice(rng, size, times, sides)
+    check_sides(sides)
+
+    total = numpy.empty(size)
+    chunk = max(_CHUNK_SIZE // times, 1)
+    for start in range(0, size, chunk):
+        count = min(chunk, size - start)
+        rolls = rng.integers(1, sides + 1, size=(count, times))
+        if best:
+            kept = numpy.partition(rolls, times - keep, axis=1)[:, -keep:]
+        else:
+            kept = numpy.partition(rolls, keep - 1, axis=1)[:, :keep]
+        total[start:start + count] = kept.sum(axis=1)
+    return total
+
+
+# The vectorized random functions in Calculator.functions, they take the rng
+# and the number of samples before their operands.
+random_functions = {
+    'd': lambda rng, size, a, b: sum_dice(rng, size, a, b),
+    'adv': lambda rng, size, a: keep_dice(rng, size, 2, a, 1),
+    'dis': lambda rng, size, a: keep_dice(rng, size, 2, a, 1, False),
+    'top': lambda rng, size, a, b, c: keep_dice(rng, size, a, b, c),
+    'bot': lambda rng, size, a, b, c: keep_dice(rng, size, a, b, c, False),
+}
+
+
+def _groups(args) -> list:
+    """
+    Group the samples by the values of their operands.
+
+    Returns a list of the values of the operands, and the indices of the
+    samples that have those values.
+    """
+    size = len(args[0])
+    # Most operands are the same for every sample
+    if all(arg[0] == arg.min() == arg.max() for arg in args):
+        return [([float(arg[0]) for arg in args], numpy.arange(size))]
+
+    # Combine the operands into a single key for each sample, which is much
+    # faster to find the unique values of than the rows of a 2d array
+    values = list()
+    key = numpy.zeros(size, dtype=numpy.int64)
+    for arg in args:
+        unique, inverse = numpy.unique(arg, return_inverse=True)
+        values.append(unique)
+        key = key * len(unique) + inverse.reshape(-1)
+
+    keys, inverse = numpy.unique(key, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # The samples of each group are next to each other once sorted
+    order = numpy.argsort(inverse, kind='stable')
+    ends = numpy.cumsum(numpy.bincount(inverse, minlength=len(keys)))
+
+    groups = list()
+    start = 0
+    for combined, end in zip(keys, ends):
+        row = list()
+        for unique in reversed(values):
+            combined, index = divmod(int(combined), len(unique))
+            row.append(float(unique[index]))
+        groups.append((row[::-1], order[start:end]))
+        start = end
+    return groups
+
+
+def sample(node, calculator, context, size, rng, params=None, budget=None):
+    """
+    Calculate a compiled equation size times at once.
+
+    Every function works on numpy arrays of all the samples.  Dice whose
+    operands are different between samples are rolled in groups of samples
+    that have the same operands.
+
+    params are the samples of the Params of the inlined custom equation that
+    is being calculated.
+
+    Each function is charged to the budget, the budget of the context if it
+    isn't given, with the operands that cost the most of any sample, and
+    only the most expensive branch of an if is charged.
+    """
+    if budget is None:
+        budget = context.budget
+
+    if isinstance(node, _program.Constant):
+        return numpy.full(size, float(node.value))
+
+    if isinstance(node, _program.Param):
+        return params[node.index]
+
+    if isinstance(node, _program.Let):
+        args = [sample(a, calculator, context, size, rng, params, budget)
+                for a in node.args]
+        return sample(node.body, calculator, context, size, rng, args, budget)
+
+    if node.name == 'if':
+        condition = sample(node.args[0], calculator, context, size, rng,
+                           params, budget)
+        mask = condition > 0
+        result = numpy.empty(size)
+        forks = list()
+        # Only calculate the samples of each branch that are used
+        for branch, branch_mask in [(node.args[1], mask),
+                                    (node.args[2], ~mask)]:
+            fork = budget.fork()
+            result[branch_mask] = sample(
+                branch, calculator, context,
+                int(numpy.count_nonzero(branch_mask)), rng,
+                None if params is None else [p[branch_mask] for p in params],
+                fork)
+            forks.append(fork)
+        budget.join(forks)
+        return result
+
+    args = [sample(a, calculator, context, size, rng, params, budget)
+            for a in node.args]
+
+    if size == 0:
+        return numpy.empty(0)
+
+    dice = charge(node, [(float(a.min()), float(a.max())) for a in args],
+                  calculator, budget)
+
+    with numpy.errstate(all='ignore'):
+        if node.name in functions:
+            return _check(functions[node.name](*args))
+
+        if node.name in random_functions:
+            func = random_functions[node.name]
+            groups = _groups(args)
+            if len(groups) * dice > MAX_GROUP_DICE:
+                raise TooComplex(
+                    "The dice of the equation are too different between "
+                    "rolls to estimate the odds.")
+            result = numpy.empty(size)
+            for values, indices in groups:
+                result[indices] = func(rng, len(indices),
+                                       *[int(round(v)) for v in values])
+            return result
+
+        if node.name in calculator.functions:
+            # Constants such as true and false
+            return numpy.full(size, float(calculator.functions[node.name]()))
+
+    equation = context.get_equation(node.name)
+    if equation is None:
+        raise BadEquation("Invalid Function **{}**".format(node.name))
+
+    # Custom equations are compiled once for each set of operands
+    nested = context.nested()
+    if nested.depth > 20:
+        raise BadEquation("Too much recursion in the equation!")
+    groups = _groups(args) if args else [([], numpy.arange(size))]
+    if len(groups) > MAX_EXPANSIONS:
+        raise TooComplex("The operands of **{}** are too different between "
+                         "rolls to estimate the odds.".format(node.name))
+    result = numpy.empty(size)
+    forks = list()
+    for values, indices in groups:
+        fork = budget.fork()
+        fork.expand()
+        program = calculator._get_program(
+            calculator.parse_args(equation.value, context.session,
+                                  context.user,
+                                  [_to_number(v) for v in values]),
+            nested)
+        fork.step(program.steps)
+        result[indices] = sample(program.root, calculator, nested,
+                                 len(indices), rng, None, fork)
+        forks.append(fork)
+    budget.join(forks)
+    return result
@@ -0,0 +1,177 @@
+import collections
+import contextlib
+import threading
+import types
+
+from ._cache import LRUCache
+from .. import db
+
+# The stats of a user in a server at a version.  values are the stats as they
+# were set, and calculated are the values that equations use.  Neither can be
+# changed, so a snapshot can be shared by every calculation.
+StatsSnapshot = collections.namedtuple('StatsSnapshot', [
+    'version', 'values', 'calculated'])
+
+
+class _LiveValues(collections.Mapping):
+    """
+    A read only view of the current values of Stat objects.
+    """
+
+    def __init__(self, stats, get_value):
+        self._stats = stats
+        self._get_value = get_value
+
+    def __getitem__(self, key):
+        return self._get_value(self._stats[key])
+
+    def __len__(self):
+        return len(self._stats)
+
+    def __iter__(self):
+        return iter(self._stats)
+
+
+class StatsCache:
+    """
+    Snapshots of the stats of every (user, server), kept in memory.
+
+    A snapshot is loaded from the database the first time the stats are
+    used, and is reused until the stats change.  The stat commands
+    invalidate a user, or a whole server, whenever stats are set or
+    deleted.
+
+    Each (user, server) has a version that is changed every time it is
+    invalidated, and snapshots are cached by their version.  Other
+    processes, such as the calculator pool, sync their versions to the
+    versions of the bot.
+
+    Stats that are being recalculated have changes that aren't committed
+    yet, so the cache can be bypassed while they are calculated.
+    """
+
+    def __init__(self, size=1024):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._snapshots = LRUCache(size)
+        # Changed when every snapshot is invalidated
+        self._generation = 0
+        self._servers = dict()
+        self._users = dict()
+
+    def version(self, user_id, server_id) -> tuple:
+        """
+        Get the version of the stats of a user in a server.
+        """
+        return (self._generation, self._servers.get(server_id, 0),
+                self._users.get((user_id, server_id), 0))
+
+    def invalidate(self, user_id=None, server_id=None):
+        """
+        Forget the stats of a user in a server, everyone in a server if no
+        user is given, or everything if neither is given.
+        """
+        with self._lock:
+            if server_id is None:
+                self._generation += 1
+                self._snapshots.invalidate()
+            elif user_id is None:
+                self._servers[server_id] = self._servers.get(server_id, 0) + 1
+            else:
+                key = (user_id, server_id)
+                self._users[key] = self._users.get(key, 0) + 1
+
+    def sync(self, user_id, server_id, version) -> bool:
+        """
+        Change the version of a user in a server to the given version.
+
+        :returns bool: whether the version was changed
+        """
+        with self._lock:
+            if self.version(user_id, server_id) == version:
+                return False
+            generation, server, user = version
+            if generation != self._generation:
+                self._generation = generation
+                self._snapshots.invalidate()
+            self._servers[server_id] = server
+            self._users[(user_id, server_id)] = user
+            return True
+
+    @property
+    def bypassed(self) -> bool:
+        return getattr(self._local, 'bypass', 0) > 0
+
+    @contextlib.contextmanager
+    def bypass(self, stats=None):
+        """
+        Don't use the cache within the block.
+
+        If a mapping of the names of stats to Stat objects is given, their
+        current values are used, even as they change.  Otherwise the stats
+        are loaded from the session every time.
+        """
+        previous = getattr(self._local, 'live', None)
+        self._local.bypass = getattr(self._local, 'bypass', 0) + 1
+        if stats is not None:
+            self._local.live = StatsSnapshot(
+                None, _LiveValues(stats, lambda s: s.value),
+                _LiveValues(stats, lambda s: s.getValue()))
+        try:
+            yield
+        finally:
+            self._local.bypass -= 1
+            self._local.live = previous
+
+    def _load(self, session, user_id, server_id, version) -> StatsSnapshot:
+        stats = session.query(db.schema.Stat).filter(
+            db.schema.Stat.user_id == user_id,
+            db.schema.Stat.server_id == server_id
+        ).all()
+        return StatsSnapshot(
+            version,
+            types.MappingProxyType(dict((str(s), s.value) for s in stats)),
+            types.MappingProxyType(dict((str(s), s.getValue())
+                                        for s in stats)))
+
+    def get(self, session, user) -> StatsSnapshot:
+        """
+        Get a snapshot of the stats of a user in their active server.
+        """
+        server_id = user.active_server_id
+        version = self.version(user.id, server_id)
+        if self.bypassed:
+            live = getattr(self._local, 'live', None)
+            if live is not None:
+                return live
+            return self._load(session, user.id, server_id, version)
+
+        # Snapshots of older versions are never used again, and are dropped
+        # by the LRU cache as new ones are added
+        key = (user.id, server_id, version)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+
+        snapshot = self._load(session, user.id, server_id, version)
+        self._snapshots.put(key, snapshot)
+        return snapshot
+
+    @property
+    def hits(self) -> int:
+        return self._snapshots.hits
+
+    @property
+    def misses(self) -> int:
+        return self._snapshots.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self._snapshots.hit_rate
+
+    def reset_counters(self):
+        self._snapshots.reset_counters()
+
+    def __str__(self):
+        return "<StatsCache(snapshots={}, hits={}, misses={})>".format(
+            len(self._snapshots), self.hits, self.misses)
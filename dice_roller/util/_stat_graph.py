@@ -0,0 +1,110 @@
+import collections
+import heapq
+
+from . import BadEquation, variables
+
+
+class StatCycle(BadEquation):
+    """
+    Raised when stats depend on each other.
+
+    names is the chain of stats that lead back to the first one.
+    """
+
+    def __init__(self, names):
+        super().__init__("The stats {} depend on each other!".format(
+            ' -> '.join("**{}**".format(n) for n in names)))
+        self.names = names
+
+
+class StatGraph:
+    """
+    The dependencies between the stats of a user.
+
+    A stat depends on every stat that its value uses as a variable, so `mod`
+    with the value `({str} - 10) / 2` depends on `str`.  Variables that
+    aren't stats, such as parameters, are ignored.
+    """
+
+    def __init__(self, values):
+        """
+        :param values: a mapping of the name of each stat to its value
+        """
+        self.dependencies = dict()
+        self.dependents = collections.defaultdict(set)
+        for name, value in values.items():
+            self.set(name, value)
+
+    def set(self, name, value):
+        """
+        Add a stat, or change the value of a stat.
+        """
+        self.remove(name)
+        uses = variables.getVariables(str(value).lower())
+        self.dependencies[name] = uses
+        for used in uses:
+            self.dependents[used].add(name)
+
+    def remove(self, name):
+        for used in self.dependencies.pop(name, ()):
+            self.dependents[used].discard(name)
+
+    def affected(self, names) -> set:
+        """
+        Get the stats that have to be calculated again when the given stats
+        change: the stats themselves, and every stat that depends on them.
+        """
+        found = set(n for n in names if n in self.dependencies)
+        stack = list(found)
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    stack.append(dependent)
+        return found
+
+    def order(self, names=None) -> list:
+        """
+        Sort stats so that every stat comes after the stats it depends on.
+
+        If names are given, only the stats that are affected by them are
+        sorted, otherwise every stat is.  Stats with no order between them
+        are sorted by name.
+
+        :raises StatCycle: if any of the stats depend on each other
+        """
+        stats = set(self.dependencies) if names is None \
+            else self.affected(names)
+
+        # Kahn's algorithm, counting only the dependencies within the stats
+        waiting = dict((name, len(self.dependencies[name] & stats))
+                       for name in stats)
+        ready = [name for name, count in waiting.items() if count == 0]
+        heapq.heapify(ready)
+        ordered = list()
+        while ready:
+            name = heapq.heappop(ready)
+            ordered.append(name)
+            for dependent in self.dependents.get(name, ()):
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        heapq.heappush(ready, dependent)
+
+        if len(ordered) != len(stats):
+            raise StatCycle(self._find_cycle(
+                set(n for n, c in waiting.items() if c > 0)))
+        return ordered
+
+    def _find_cycle(self, stats) -> list:
+        """
+        Find a cycle among stats that all have unresolved dependencies.
+        """
+        # Every stat left has a dependency that is also left, so following
+        # the dependencies must eventually visit a stat twice
+        path = [min(stats)]
+        while True:
+            following = min(self.dependencies[path[-1]] & stats)
+            if following in path:
+                return path[path.index(following):] + [following]
+            path.append(following)
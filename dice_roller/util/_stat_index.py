@@ -0,0 +1,151 @@
+import collections
+import threading
+
+from . import calculator
+from .. import db
+
+
+def _keys(name) -> list:
+    """
+    Get the keys that a use of an equation is indexed by: `mod:12` is
+    indexed by both `mod` and `:12`.
+    """
+    name = db.database.parse_name(name)
+    keys = [name[0]] if name[0] else []
+    if len(name) > 1:
+        keys.append(':' + name[1])
+    return keys
+
+
+class _ServerIndex:
+    """
+    The equations used by the stats of a single server.
+    """
+
+    def __init__(self):
+        # stat id -> (user id, names of the equations it uses)
+        self.stats = dict()
+        # equation name, or :id -> stat ids
+        self.by_key = collections.defaultdict(set)
+
+    def set(self, stat_id, user_id, names):
+        self.remove(stat_id)
+        self.stats[stat_id] = (user_id, names)
+        for name in names:
+            for key in _keys(name):
+                self.by_key[key].add(stat_id)
+
+    def remove(self, stat_id):
+        user_id, names = self.stats.pop(stat_id, (None, ()))
+        for name in names:
+            for key in _keys(name):
+                self.by_key[key].discard(stat_id)
+
+    def remove_user(self, user_id):
+        for stat_id in [i for i, (u, _) in self.stats.items()
+                        if u == user_id]:
+            self.remove(stat_id)
+
+
+class StatIndex:
+    """
+    An index of the stats that use each custom equation.
+
+    The stats of a server are indexed the first time the server is
+    searched.  After that, the stat commands update the index whenever a
+    user's stats change, so that searching it never needs the database.
+
+    Stats are indexed by the names of the equations they use, as a name can
+    refer to a different equation once equations are added or deleted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = dict()
+
+    @staticmethod
+    def _names(value) -> set:
+        return calculator.get_equation_names(value)
+
+    def _query(self, session, server_id, user_id=None):
+        query = session.query(
+            db.schema.Stat.id, db.schema.Stat.user_id, db.schema.Stat.value
+        ).filter(db.schema.Stat.server_id == server_id)
+        if user_id is not None:
+            query = query.filter(db.schema.Stat.user_id == user_id)
+        return query.all()
+
+    def _load(self, session, server_id) -> _ServerIndex:
+        with self._lock:
+            server = self._servers.get(server_id)
+        if server is not None:
+            return server
+
+        server = _ServerIndex()
+        for stat_id, user_id, value in self._query(session, server_id):
+            server.set(stat_id, user_id, self._names(value or ''))
+        with self._lock:
+            return self._servers.setdefault(server_id, server)
+
+    def update_user(self, session, user_id, server_id):
+        """
+        Index the stats of a user again after they were changed.
+
+        Servers that haven't been indexed yet are skipped.
+        """
+        with self._lock:
+            server = self._servers.get(server_id)
+        if server is None:
+            return
+        stats = [(i, self._names(value or ''))
+                 for i, _, value in self._query(session, server_id, user_id)]
+        with self._lock:
+            server.remove_user(user_id)
+            for stat_id, names in stats:
+                server.set(stat_id, user_id, names)
+
+    def clear(self, server_id):
+        """
+        Remove every stat of a server from the index.
+        """
+        with self._lock:
+            self._servers[server_id] = _ServerIndex()
+
+    def invalidate(self, server_id=None):
+        """
+        Forget the index of a server, or every server if none is given.  It
+        is loaded again the next time it's needed.
+        """
+        with self._lock:
+            if server_id is None:
+                self._servers.clear()
+            else:
+                self._servers.pop(server_id, None)
+
+    def find(self, session, server_id, equation) -> dict:
+        """
+        Find the stats that might use an equation, by its name or its id.
+
+        Which equation a name refers to depends on the user, so the names
+        should be checked with the catalog.
+
+        :returns dict: the id of each stat, and the names it might use the
+        equation by, such as `mod` and `mod:12`
+        """
+        server = self._load(session, server_id)
+        keys = {equation.name.lower(), ':{}'.format(equation.id)}
+        with self._lock:
+            found = dict()
+            for key in keys:
+                for stat_id in server.by_key.get(key, ()):
+                    found[stat_id] = set(
+                        n for n in server.stats[stat_id][1]
+                        if keys.intersection(_keys(n)))
+            return found
+
+    def __len__(self):
+        return sum(len(s.stats) for s in self._servers.values())
+
+    def __str__(self):
+        return "<StatIndex(servers={}, stats={})>".format(
+            len(self._servers), len(self))
@@ -0,0 +1,140 @@
+import collections
+
+from . import BadEquation
+
+# Token types
+NUMBER = 'number'
+IDENTIFIER = 'identifier'
+OPERATOR = 'operator'
+LPAREN = 'lparen'
+RPAREN = 'rparen'
+COMMA = 'comma'
+PARAM = 'param'
+
+# type is one of the token types above, text is the text of the token without
+# any whitespace, value is the float value of a number, the index of a param
+# (the text for any other token), and offset is the index of the token in the
+# original string.
+Token = collections.namedtuple('Token', ['type', 'text', 'value', 'offset'])
+
+_DIGITS = frozenset('0123456789')
+_NUMBER = frozenset('0123456789.')
+_LETTERS = frozenset('abcdefghijklmnopqrstuvwxyz')
+_COMPARISONS = frozenset('<>=')
+_PUNCTUATION = {'(': LPAREN, ')': RPAREN, ',': COMMA}
+
+
+def tokenize(string: str) -> list:
+    """
+    Split an equation into a list of Tokens in a single pass.
+
+    Whitespace is ignored everywhere, even inside of a token, so `1 0d 6` is
+    the same as `10d6`.
+
+    These are the tokens that are recognized:
+
+    ```
+    number      1, 2.5, -3 (a minus is part of a number when it is unary)
+    identifier  adv, mod:3, :3
+    operator    + - * / ^ % < <= <> = >= > and any other symbol
+    parens      ( )
+    comma       ,
+    param       $0, $1 (the parameters of a custom equation)
+    ```
+
+    Letters and digits that aren't part of a token are skipped.
+
+    A BadEquation error is raised if a number is malformed.
+    """
+    string = string.lower()
+
+    # Whitespace is removed first, and the offsets of the remaining characters
+    # are only calculated when there was any whitespace
+    stripped = ''.join(string.split())
+    if len(stripped) == len(string):
+        offsets = None
+    else:
+        offsets = [i for i, c in enumerate(string) if not c.isspace()]
+    string = stripped
+    length = len(string)
+
+    tokens = list()
+    append = tokens.append
+    # Skip the keyword handling of Token.__new__, as it is the slowest part
+    # of creating a token
+    new_token = tuple.__new__
+
+    i = 0
+    while i < length:
+        c = string[i]
+        start = i
+
+        if c in _NUMBER or (c == '-' and i + 1 < length
+                            and string[i + 1] in _NUMBER
+                            and (i == 0 or (string[i - 1] not in _DIGITS
+                                            and string[i - 1] != ')'))):
+            i += 1
+            while i < length and string[i] in _NUMBER:
+                i += 1
+            text = string[start:i]
+            try:
+                value = float(text)
+            except ValueError:
+                raise BadEquation("Invalid number **{}**".format(text))
+            token_type = NUMBER
+
+        elif c in _LETTERS:
+            i += 1
+            while i < length and string[i] in _LETTERS:
+                i += 1
+            # Add the id of the function if there is one
+            if i + 1 < length and string[i] == ':' \
+                    and string[i + 1] in _DIGITS:
+                i += 2
+                while i < length and string[i] in _DIGITS:
+                    i += 1
+            text = value = string[start:i]
+            token_type = IDENTIFIER
+
+        elif c == ':' and i + 1 < length and string[i + 1] in _DIGITS:
+            i += 2
+            while i < length and string[i] in _DIGITS:
+                i += 1
+            text = value = string[start:i]
+            token_type = IDENTIFIER
+
+        elif c == '$' and i + 1 < length and string[i + 1] in _DIGITS:
+            i += 2
+            while i < length and string[i] in _DIGITS:
+                i += 1
+            text = string[start:i]
+            value = int(text[1:])
+            token_type = PARAM
+
+        elif c in _COMPARISONS:
+            i += 1
+            while i < length and string[i] in _COMPARISONS:
+                i += 1
+            text = value = string[start:i]
+            token_type = OPERATOR
+
+        elif c in _PUNCTUATION:
+            i += 1
+            text = value = c
+            token_type = _PUNCTUATION[c]
+
+        elif c.isalnum() or c == '_':
+            # Unknown letters are not a part of any token
+            i += 1
+            continue
+
+        else:
+            i += 1
+            text = value = c
+            token_type = OPERATOR
+
+        append(new_token(Token, (
+            token_type, text, value,
+            start if offsets is None else offsets[start])))
+
+    return tokens
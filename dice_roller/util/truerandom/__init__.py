@@ -1,7 +1,8 @@
 import logging
+import os
 import random
-import asyncio
-from asyncio import Queue
+
+import numpy
 
 # Urandom is used as a backup if your quota is used up.
 # You however have a quota of 200K bits per day with a
@@ -12,64 +13,150 @@ urandom = random.SystemRandom()
 
 from .randomwrapy import *
 
-random_buffer = dict()
-
 _logger = logging.getLogger(__name__)
 
 
 def urandom_list(count, max):
-    return [urandom.randint(1, max) for _ in range(count)]
+    """
+    Get a list of count random numbers from 1 to max from urandom.
+
+    All of the random bytes are read in a single block, and numbers that
+    would make the results uneven are rejected and drawn again.
+    """
+    if count <= 0:
+        return []
+    # A single number is faster without numpy
+    if count == 1 or max >= 2 ** 64:
+        return [urandom.randint(1, max) for _ in range(count)]
+
+    dtype = numpy.uint32 if max < 2 ** 32 else numpy.uint64
+    bits = numpy.iinfo(dtype).bits
+    # The largest multiple of max that fits, anything above it is rejected
+    limit = (2 ** bits // max) * max
+    # At most half of the numbers are ever rejected
+    accepted = 1 - (2 ** bits - limit) / 2 ** bits
+
+    numbers = list()
+    while len(numbers) < count:
+        needed = count - len(numbers)
+        draw = int(needed / accepted) + 1
+        block = numpy.frombuffer(os.urandom(draw * bits // 8), dtype=dtype)
+        if limit < 2 ** bits:
+            block = block[block < dtype(limit)]
+        numbers.extend((block[:needed] % dtype(max) + 1).tolist())
+    return numbers
+
+
+from .entropy import EntropyPool
+from .client import RandomOrgClient, RandomOrgError, CircuitOpen
+from .refill import Refiller
+from .store import EntropyStore
+from .sources import RandomSource, RandomOrgSource, SystemSource, \
+    PCG64Source, SeededSource
+
+# The true random bits that every die is rolled from
+entropy = EntropyPool(urandom_list)
+
+_client = None
+
+# The names of the sources that dice can be rolled from
+SOURCES = ('randomorg', 'system', 'pcg64', 'seeded')
+
+# The sources that a server can choose.  The seeded source rolls the same
+# numbers for everyone, so it can only be chosen in the config.
+SERVER_SOURCES = ('randomorg', 'system', 'pcg64')
+
+
+def create_source(name, seed=None) -> RandomSource:
+    """
+    Create the random source with a name.
 
+    :param seed: the seed of the pcg64 and seeded sources
+    :raises ValueError: if there is no source with the name
+    """
+    if name == 'randomorg':
+        return RandomOrgSource(entropy)
+    if name == 'system':
+        return SystemSource(urandom_list)
+    if name == 'pcg64':
+        return PCG64Source(seed)
+    if name == 'seeded':
+        return SeededSource(seed)
+    raise ValueError("There is no random source called {}".format(name))
+
+
+def get_client():
+    """
+    Get the random.org client that is used when no other client is given.
+    """
+    global _client
+    if _client is None:
+        _client = RandomOrgClient()
+    return _client
 
-async def populate_random_buffer(max, prefetch=None, use_true_random=True):
+
+async def populate_random_buffer(count=None, use_true_random=True,
+                                 client=None, check_quota=True) -> bool:
     """
-    Populate the random_buffer with random numbers.
+    Add count random bytes to the entropy pool.
+
+    If random.org can't be used, urandom bytes are added instead.
 
-    If the number is larger than 100, then urandom will be used.
+    :param check_quota: whether to ask random.org for the quota first
+    :returns bool: whether the bytes came from random.org
     """
 
-    num = prefetch if prefetch is not None else 30
+    num = count if count is not None else 30
+    data = None
 
     if use_true_random:
+        client = client if client is not None else get_client()
         try:
-            _logger.info('TrueRandom: Fetching {} true Random numbers from 1 to {}'.format(num, max))
-            numbers = rnumlistwithreplacement(num, max, 1)
+            if check_quota and await client.quota() < 1:
+                raise NoQuotaError(
+                    "Your www.random.org quota has already run out.")
+            _logger.info('TrueRandom: Fetching {} true random bytes'.format(num))
+            data = await client.random_bytes(num)
         except NoQuotaError:
             _logger.warning('TrueRandom: Daily quota has run out, using urandom instead')
-            numbers = urandom_list(num, max)
+        except CircuitOpen:
+            pass
+        except RandomOrgError as error:
+            _logger.warning('TrueRandom: {}, using urandom instead'.format(error))
+
+    true_random = data is not None
+    if data is None:
+        data = os.urandom(num)
+    entropy.add(data)
+    return true_random
+
+
+def randints(count, max, use_true_random=True):
+    """
+    Get count true random numbers from 1 to max.
+
+    The numbers are drawn from the entropy pool while it has any bits, and
+    the rest are taken from urandom in a single block.
+
+    :returns (numbers, low): whether the pool is running low
+    """
+    if use_true_random is True:
+        numbers = entropy.randints(count, max)
     else:
-        numbers = urandom_list(num, max)
+        numbers = urandom_list(count, max)
 
-    if str(max) not in random_buffer:
-        random_buffer[str(max)] = Queue()
-    
-    queue = random_buffer[str(max)]
-    for value in numbers:
-        await queue.put(int(value))
+    return numbers, entropy.low
 
 
 def randint(max, use_true_random=True):
     """
     Get a true random number.
-    
-    If you will be getting a large sum of random numbers, I
-    suggest calling prefetch with the amount of numbers
-    before collecting them.
 
     the range is [1-max] all inclusive
 
     :param max: the (inclusive) max number to get
-    """
-    index = str(max)
-
-    buf = random_buffer.get(index)
-
-    if buf is not None and use_true_random is True:
-        try:
-            ret = buf.get_nowait()
-        except asyncio.QueueEmpty:
-            ret = urandom_list(1, max)[0]
-    else:
-        ret = urandom_list(1, max)[0]
 
-    return ret, buf is None or buf.qsize() < 10
+    :returns (number, low): whether the pool is running low
+    """
+    numbers, low = randints(1, max, use_true_random)
+    return numbers[0], low
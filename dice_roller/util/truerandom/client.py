@@ -0,0 +1,301 @@
+import asyncio
+import base64
+import inspect
+import itertools
+import json
+import logging
+import random
+import time
+import urllib.parse
+
+import aiohttp
+
+from .randomwrapy import NoQuotaError
+
+_logger = logging.getLogger(__name__)
+
+
+class RandomOrgError(Exception):
+    """
+    Raised when random.org can't be reached, or answers with an error.
+
+    status is the HTTP status of the answer, or None if there wasn't one.
+    """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        """
+        Whether the request may work if it is made again.
+        """
+        return self.status is None or self.status >= 500
+
+
+class CircuitOpen(RandomOrgError):
+    """
+    Raised instead of making a request while random.org is failing.
+    """
+
+
+class RandomOrgClient:
+    """
+    A non-blocking client for random.org.
+
+    With an API key, the JSON-RPC API at api.random.org is used, which sends
+    random bytes as blobs and the quota that is left with every answer.
+    Otherwise the plain HTTP interface at www.random.org is used.
+
+    Requests are made one at a time with an aiohttp session, which keeps
+    the connection alive between them.  Each request has a timeout, and
+    requests that fail because of the connection or a 5xx error are
+    retried, waiting a random time of up to backoff * 2 ** attempt between
+    them.
+
+    Once failure_threshold requests in a row have failed, the circuit is
+    open, and every request fails straight away with CircuitOpen for
+    reset_timeout seconds.  The next request after that is let through, and
+    closes the circuit again if it works.
+    """
+
+    USER_AGENT = 'discordDiceBot'
+    RPC_PATH = '/json-rpc/4/invoke'
+    # JSON-RPC errors for a quota that has run out
+    QUOTA_ERRORS = (402, 403)
+
+    def __init__(self, url=None, timeout=5.0, retries=2, backoff=0.5,
+                 failure_threshold=3, reset_timeout=300.0, api_key=None):
+        if url is None:
+            url = 'https://api.random.org' if api_key \
+                else 'https://www.random.org'
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.api_key = api_key
+
+        # Created with the first request, so that they use the running loop
+        self._session = None
+        self._loop = None
+        self._lock = None
+
+        self.failures = 0
+        self._opened_at = None
+        self.requests = 0
+        # The quota that random.org sent with the last answer, if any
+        self.bits_left = None
+        self._ids = itertools.count(1)
+        # random.org asks for a delay between JSON-RPC requests
+        self._not_before = 0.0
+
+    @property
+    def state(self) -> str:
+        """
+        The state of the circuit: closed, open or half-open.
+        """
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def _succeeded(self):
+        if self._opened_at is not None:
+            _logger.info('TrueRandom: random.org is available again')
+        self.failures = 0
+        self._opened_at = None
+
+    def _failed(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            if self._opened_at is None:
+                _logger.warning(
+                    'TrueRandom: random.org failed {} times in a row, not '
+                    'using it for {} seconds'.format(
+                        self.failures, self.reset_timeout))
+            self._opened_at = time.monotonic()
+
+    async def get(self, path, **params) -> bytes:
+        """
+        Make a GET request, and get the body of the answer.
+
+        :raises CircuitOpen: if random.org is failing
+        :raises RandomOrgError: if the request failed
+        """
+        target = path
+        if params:
+            target += '?' + urllib.parse.urlencode(sorted(params.items()))
+        return await self._send('GET', target)
+
+    async def post(self, path, body: bytes,
+                   content_type='application/json') -> bytes:
+        """
+        Make a POST request, and get the body of the answer.
+
+        :raises CircuitOpen: if random.org is failing
+        :raises RandomOrgError: if the request failed
+        """
+        return await self._send('POST', path, body, content_type)
+
+    async def _send(self, method, target, body=None, content_type=None):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.state == 'open':
+                raise CircuitOpen("random.org is unavailable")
+
+            attempt = 0
+            while True:
+                try:
+                    answer = await asyncio.wait_for(
+                        self._request(method, target, body, content_type),
+                        self.timeout)
+                except RandomOrgError as exception:
+                    error = exception
+                except asyncio.TimeoutError:
+                    error = RandomOrgError(
+                        "random.org didn't answer within {} seconds".format(
+                            self.timeout))
+                except (aiohttp.ClientError, OSError, ValueError) \
+                        as exception:
+                    error = RandomOrgError(
+                        "Could not reach random.org: {}".format(
+                            str(exception) or type(exception).__name__))
+                else:
+                    self._succeeded()
+                    return answer
+
+                if not error.retryable:
+                    raise error
+                if attempt >= self.retries:
+                    self._failed()
+                    raise error
+                attempt += 1
+                await asyncio.sleep(
+                    random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def _request(self, method, target, body=None,
+                       content_type=None) -> bytes:
+        if self._session is None or self._session.closed:
+            self._loop = asyncio.get_event_loop()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=1),
+                headers={'User-Agent': self.USER_AGENT})
+        headers = dict()
+        if content_type is not None:
+            headers['Content-Type'] = content_type
+
+        self.requests += 1
+        async with self._session.request(method, self.url + target,
+                                         data=body,
+                                         headers=headers) as response:
+            answer = await response.read()
+            if response.status != 200:
+                raise RandomOrgError("random.org answered {}: {}".format(
+                    response.status,
+                    answer.decode('utf-8', 'replace').strip()[:100]),
+                    response.status)
+            return answer
+
+    def close(self):
+        """
+        Close the connection to random.org.
+        """
+        session, self._session = self._session, None
+        if session is None or session.closed:
+            return
+        closing = session.close()
+        # Newer versions of aiohttp close the session in a coroutine
+        if inspect.isawaitable(closing):
+            if self._loop.is_running():
+                asyncio.ensure_future(closing, loop=self._loop)
+            else:
+                self._loop.run_until_complete(closing)
+
+    async def rpc(self, method, **params) -> dict:
+        """
+        Call a method of the JSON-RPC API, and get its result.
+
+        :raises NoQuotaError: if the quota of the API key has run out
+        :raises RandomOrgError: if the call failed
+        """
+        delay = self._not_before - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        params['apiKey'] = self.api_key
+        request = dict(jsonrpc='2.0', method=method, params=params,
+                       id=next(self._ids))
+        answer = await self.post(self.RPC_PATH,
+                                 json.dumps(request).encode('utf-8'))
+        try:
+            answer = json.loads(answer.decode('utf-8'))
+        except ValueError:
+            raise RandomOrgError("random.org sent a bad JSON-RPC answer")
+
+        error = answer.get('error')
+        if error is not None:
+            if error.get('code') in self.QUOTA_ERRORS:
+                raise NoQuotaError(error.get('message'))
+            raise RandomOrgError("random.org answered {}: {}".format(
+                error.get('code'), error.get('message')), error.get('code'))
+
+        result = answer.get('result') or dict()
+        if 'bitsLeft' in result:
+            self.bits_left = result['bitsLeft']
+        if result.get('advisoryDelay'):
+            self._not_before = time.monotonic() + \
+                result['advisoryDelay'] / 1000
+        return result
+
+    async def quota(self) -> int:
+        """
+        Get the number of bits that are left in the quota, of the API key if
+        there is one, or of this IP address.
+        """
+        if self.api_key:
+            result = await self.rpc('getUsage')
+            return result['bitsLeft']
+        body = await self.get('/quota/', format='plain')
+        return int(body.split()[0])
+
+    async def integers(self, num, min, max) -> list:
+        """
+        Get num random integers from min to max.
+        """
+        body = await self.get('/integers/', num=num, min=min, max=max, col=1,
+                              base=10, format='plain', rnd='new')
+        numbers = [int(n) for n in body.split()]
+        if len(numbers) != num:
+            raise RandomOrgError("random.org sent {} numbers instead of "
+                                 "{}".format(len(numbers), num))
+        return numbers
+
+    async def random_bytes(self, count) -> bytes:
+        """
+        Get count random bytes in a single request.
+
+        With an API key they are sent as a blob, otherwise as integers from
+        0 to 255.
+        """
+        if not self.api_key:
+            return bytes(await self.integers(count, 0, 255))
+
+        result = await self.rpc('generateBlobs', n=1, size=count * 8,
+                                format='base64')
+        try:
+            data = base64.b64decode(result['random']['data'][0])
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise RandomOrgError("random.org sent a bad blob")
+        if len(data) != count:
+            raise RandomOrgError("random.org sent {} bytes instead of "
+                                 "{}".format(len(data), count))
+        return data
+
+    def __str__(self):
+        return "<RandomOrgClient(state={}, failures={}, requests={})>" \
+            .format(self.state, self.failures, self.requests)
@@ -0,0 +1,308 @@
+import collections
+import functools
+import math
+import threading
+
+import numpy
+
+
+@functools.lru_cache(maxsize=256)
+def _word_plan(max: int):
+    """
+    Find how to draw numbers from 0 to max - 1 from words of bytes.
+
+    Each word holds `per_word` numbers, as the digits of a number from 0 to
+    max ** per_word - 1, and words of limit or more are rejected so that
+    every number is as likely.  The size of word that uses the fewest bits
+    for each number is used.
+
+    Returns (dtype, per_word, limit, powers), where powers are the value of
+    each digit, or None if max doesn't fit in a word.
+    """
+    best = None
+    for dtype in (numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64):
+        bits = numpy.iinfo(dtype).bits
+        if max >= 2 ** bits:
+            continue
+        per_word = int(bits // math.log2(max))
+        # Correct the rounding of the logarithm
+        while max ** per_word > 2 ** bits:
+            per_word -= 1
+        while max ** (per_word + 1) <= 2 ** bits:
+            per_word += 1
+        limit = (2 ** bits // max ** per_word) * max ** per_word
+        cost = bits * 2 ** bits / (per_word * limit)
+        if best is None or cost < best[0]:
+            best = (cost, dtype, per_word, limit)
+    if best is None:
+        return None
+    _, dtype, per_word, limit = best
+    powers = numpy.array([max ** i for i in range(per_word)],
+                         dtype=numpy.uint64)
+    return dtype, per_word, limit, powers
+
+
+class EntropyPool:
+    """
+    A pool of random bits that uniform numbers in any range are drawn from.
+
+    Bytes from any source, such as random.org, are added to the pool.
+    Numbers are drawn from whole words of the pool at once with numpy.  As
+    many numbers as fit are packed into each word, and the words that would
+    make the numbers uneven are rejected, so a d20 uses about 4.7 bits.
+
+    Once the pool is empty, the rest of the dice are drawn by the fallback
+    function, fallback(count, max), in a single block.  Every bit that is
+    used from the pool is counted, both in total and for each size of die.
+
+    The bytes are used in the order they were added.  A pool can be attached
+    to an EntropyStore, which keeps the bytes that haven't been used across
+    restarts.
+    """
+
+    # The pool is low when it has fewer bits than low_bits, which starts at
+    # this, enough for about ten dice
+    LOW_BITS = 64
+
+    def __init__(self, fallback):
+        self._fallback_randints = fallback
+        self.low_bits = self.LOW_BITS
+        self._lock = threading.Lock()
+        self._data = bytearray()
+        # The index of the next byte in _data
+        self._start = 0
+        self._store = None
+
+        self.added_bits = 0
+        self.used_bits = 0
+        self.fallback_dice = 0
+        # Every number that was drawn, from the pool or not
+        self.drawn = 0
+        # sides -> [number of dice from the pool, bits used]
+        self.usage = collections.defaultdict(lambda: [0, 0])
+
+    @property
+    def available_bits(self) -> int:
+        """
+        The number of bits from the pool that haven't been used.
+        """
+        return (len(self._data) - self._start) * 8
+
+    @property
+    def low(self) -> bool:
+        return self.available_bits < self.low_bits
+
+    def add(self, data: bytes):
+        """
+        Add random bytes to the pool.
+        """
+        with self._lock:
+            self._data.extend(data)
+            self.added_bits += len(data) * 8
+
+    def clear(self):
+        """
+        Remove every bit from the pool.
+        """
+        with self._lock:
+            self._data.clear()
+            self._start = 0
+
+    def attach(self, store):
+        """
+        Add the bytes that are left in a store to the pool, and keep the
+        bytes of the pool in the store from now on.
+        """
+        with self._lock:
+            data = store.load()
+            self._data.extend(data)
+            self.added_bits += len(data) * 8
+            self._store = store
+            self._save()
+
+    def detach(self):
+        """
+        Stop using the store, without changing it.
+        """
+        with self._lock:
+            store, self._store = self._store, None
+        return store
+
+    def save(self):
+        """
+        Write the bytes that haven't been used to the store, if there is one.
+        """
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if self._store is not None:
+            self._store.save(self._data[self._start:])
+
+    def lend(self, count: int) -> bytes:
+        """
+        Take up to count bytes out of the pool, for a worker process to draw
+        dice from.  The bytes that the worker doesn't use are given back
+        with repay().
+        """
+        with self._lock:
+            return self._take(min(count, len(self._data) - self._start))
+
+    def borrow(self, data: bytes):
+        """
+        Draw dice only from bytes that another pool lent, such as the pool
+        of the bot in a worker process.  The bytes and the counts of the
+        pool are replaced.
+        """
+        with self._lock:
+            self._store = None
+            self._data = bytearray(data)
+            self._start = 0
+            self.added_bits = len(data) * 8
+            self.used_bits = 0
+            self.fallback_dice = 0
+            self.drawn = 0
+            self.usage.clear()
+
+    def statement(self) -> dict:
+        """
+        Take the bytes of a loan that weren't used out of the pool, with the
+        counts of what was drawn from it, to give back to the pool that lent
+        them.
+        """
+        with self._lock:
+            data = self._take(len(self._data) - self._start)
+            return dict(data=data, used_bits=self.used_bits,
+                        fallback_dice=self.fallback_dice, drawn=self.drawn,
+                        usage=dict((s, tuple(u))
+                                   for s, u in self.usage.items()))
+
+    def repay(self, statement: dict):
+        """
+        Give back the bytes of a loan that weren't used, and count the dice
+        that were drawn from it.
+
+        The bytes are used before any others, and are kept in the store from
+        the next save.
+        """
+        with self._lock:
+            self._data[self._start:self._start] = statement['data']
+            self.used_bits += statement['used_bits']
+            self.fallback_dice += statement['fallback_dice']
+            self.drawn += statement['drawn']
+            for sides, (dice, bits) in statement['usage'].items():
+                usage = self.usage[sides]
+                usage[0] += dice
+                usage[1] += bits
+
+    def _take(self, count: int) -> bytes:
+        """
+        Take the next count bytes of the pool.
+        """
+        # The store has to know that the bytes are used before they are
+        if self._store is not None:
+            self._store.take(count)
+        data = bytes(self._data[self._start:self._start + count])
+        self._start += count
+        if self._start >= 4096 and self._start * 2 >= len(self._data):
+            del self._data[:self._start]
+            self._start = 0
+        return data
+
+    def _draw_words(self, count: int, max: int, plan) -> list:
+        """
+        Draw up to count numbers from 0 to max - 1 from words of the pool.
+        """
+        dtype, per_word, limit, powers = plan
+        size = numpy.dtype(dtype).itemsize
+        bits = size * 8
+        accepted = limit / 2 ** bits
+
+        numbers = list()
+        while len(numbers) < count:
+            words = (len(self._data) - self._start) // size
+            if words == 0:
+                break
+            needed = count - len(numbers)
+            words = min(words, math.ceil(needed / per_word / accepted))
+            block = numpy.frombuffer(self._take(words * size), dtype=dtype)
+            self.used_bits += words * size * 8
+            if limit < 2 ** bits:
+                block = block[block < limit]
+            # Split each word into its digits
+            digits = block.astype(numpy.uint64)[:, None] // powers % max
+            numbers.extend(digits.reshape(-1)[:needed].tolist())
+        return numbers
+
+    def _draw_large(self, count: int, max: int) -> list:
+        """
+        Draw up to count numbers from 0 to max - 1, for numbers that don't
+        fit in a word.
+        """
+        size = (max.bit_length() + 7) // 8
+        limit = (2 ** (size * 8) // max) * max
+
+        numbers = list()
+        while len(numbers) < count and \
+                len(self._data) - self._start >= size:
+            value = int.from_bytes(self._take(size), 'little')
+            self.used_bits += size * 8
+            if value < limit:
+                numbers.append(value % max)
+        return numbers
+
+    def randint(self, max: int) -> int:
+        """
+        Draw a number from 1 to max.
+        """
+        return self.randints(1, max)[0]
+
+    def randints(self, count: int, max: int) -> list:
+        """
+        Draw count numbers from 1 to max.
+        """
+        if max < 1:
+            raise ValueError("max must be at least 1")
+        if max == 1:
+            return [1] * count
+
+        plan = _word_plan(max)
+        with self._lock:
+            before = self.used_bits
+            if plan is None:
+                numbers = self._draw_large(count, max)
+            else:
+                numbers = self._draw_words(count, max, plan)
+            numbers = [n + 1 for n in numbers]
+            if self.used_bits > before:
+                usage = self.usage[max]
+                usage[0] += len(numbers)
+                usage[1] += self.used_bits - before
+
+            missing = count - len(numbers)
+            self.fallback_dice += missing
+            self.drawn += count
+        if missing > 0:
+            numbers.extend(self._fallback_randints(missing, max))
+        return numbers
+
+    @property
+    def bits_per_number(self) -> float:
+        """
+        The average number of bits that were used for a die of any size, or
+        8 before any dice are drawn from the pool.
+        """
+        dice = sum(d for d, _ in self.usage.values())
+        bits = sum(b for _, b in self.usage.values())
+        return bits / dice if dice else 8.0
+
+    def bits_per_die(self, sides: int) -> float:
+        """
+        Get the average number of bits that were used for a die.
+        """
+        dice, bits = self.usage.get(sides, (0, 0))
+        return bits / dice if dice else 0.0
+
+    def __str__(self):
+        return "<EntropyPool(available={}, used={}, fallback={})>".format(
+            self.available_bits, self.used_bits, self.fallback_dice)
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import math
+import time
+
+from .client import RandomOrgError
+from .randomwrapy import NoQuotaError
+
+_logger = logging.getLogger(__name__)
+
+
+class Refiller:
+    """
+    A single background task that keeps the entropy pool filled.
+
+    The task tracks how fast numbers are drawn from the pool, as an
+    exponentially weighted moving average of numbers per second, and keeps
+    enough bits in the pool to last for `headroom` seconds at that rate.
+    Once the pool has less than half of that, it is filled up again.
+
+    The quota from random.org is cached for `quota_ttl` seconds, and every
+    fetch is spent against the cached value, so the quota isn't asked for
+    before every fetch.  If random.org sends the quota with its answer, the
+    cache is updated with it instead, so that each refill is a single
+    request.  When the quota is too low, the pool is filled from
+    urandom instead.
+
+    Any number of refills can be requested at once, they only wake the task.
+    """
+
+    # The most numbers that random.org gives in a single request
+    MAX_BYTES = 10000
+
+    def __init__(self, pool, populate, client, use_true_random=True,
+                 min_bytes=30, headroom=60.0, half_life=60.0, interval=5.0,
+                 quota_ttl=600.0):
+        """
+        :param pool: the EntropyPool to fill
+        :param populate: the coroutine that fills the pool,
+            populate(count, use_true_random, client, check_quota) -> bool
+        """
+        self.pool = pool
+        self._populate = populate
+        self.client = client
+        self.use_true_random = use_true_random
+        self.min_bytes = min_bytes
+        self.headroom = headroom
+        self.half_life = half_life
+        self.interval = interval
+        self.quota_ttl = quota_ttl
+
+        self._task = None
+        # Created with the task, so that it uses the running loop
+        self._wake = None
+
+        # Numbers drawn per second
+        self.rate = 0.0
+        self._drawn = pool.drawn
+        self._sampled_at = time.monotonic()
+
+        self.quota = None
+        self._quota_at = None
+
+        self.requests = 0
+        self.refills = 0
+        self.true_bytes = 0
+        self.urandom_bytes = 0
+        self.refilling = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def target_bytes(self) -> int:
+        """
+        The number of bytes to keep in the pool.
+        """
+        bits = self.rate * self.pool.bits_per_number * self.headroom
+        return min(max(math.ceil(bits / 8), self.min_bytes), self.MAX_BYTES)
+
+    @property
+    def low_bits(self) -> int:
+        """
+        The pool is filled when it has fewer bits than this.
+        """
+        return max(self.target_bytes * 8 // 2, self.pool.LOW_BITS)
+
+    def request(self):
+        """
+        Ask for the pool to be filled, if it is low.
+
+        The task is started if it isn't running.
+        """
+        self.requests += 1
+        if not self.running:
+            self._wake = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        self._wake.set()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def sample(self):
+        """
+        Update the rate from the numbers drawn since the last sample.
+        """
+        now = time.monotonic()
+        elapsed = now - self._sampled_at
+        if elapsed <= 0:
+            return
+        rate = (self.pool.drawn - self._drawn) / elapsed
+        # Older rates lose half of their weight every half_life seconds
+        weight = 1 - 0.5 ** (elapsed / self.half_life)
+        self.rate += weight * (rate - self.rate)
+        self._drawn = self.pool.drawn
+        self._sampled_at = now
+        self.pool.low_bits = self.low_bits
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            self.sample()
+            if self.pool.available_bits < self.low_bits:
+                try:
+                    await self.refill()
+                except Exception:
+                    _logger.exception('TrueRandom: The refill failed')
+
+    async def _get_quota(self):
+        """
+        Get the cached quota, asking random.org for it once it is too old.
+        """
+        now = time.monotonic()
+        if self._quota_at is None or now - self._quota_at >= self.quota_ttl:
+            try:
+                self.quota = await self.client.quota()
+                self._quota_at = now
+            except NoQuotaError:
+                self.quota = 0
+                self._quota_at = now
+            except RandomOrgError as error:
+                _logger.warning(
+                    'TrueRandom: Could not get the quota: {}'.format(error))
+                return None
+        return self.quota
+
+    async def refill(self):
+        """
+        Fill the pool up to the target size.
+        """
+        count = max(self.target_bytes - self.pool.available_bits // 8, 1)
+        self.refilling = True
+        try:
+            quota = None
+            if self.use_true_random:
+                quota = await self._get_quota()
+                if quota is not None and quota < count * 8:
+                    _logger.warning('TrueRandom: {} bits are left in the '
+                                    'quota, using urandom'.format(quota))
+                    quota = None
+
+            # The pool is filled from urandom if random.org fails
+            true_random = await self._populate(
+                count, quota is not None, self.client, False)
+            if true_random:
+                self.quota -= count * 8
+                # The JSON-RPC API sends the quota with every answer
+                if self.client.bits_left is not None:
+                    self.quota = self.client.bits_left
+                    self._quota_at = time.monotonic()
+        finally:
+            self.refilling = False
+
+        # Keep the new bytes if the bot restarts
+        self.pool.save()
+
+        self.refills += 1
+        if true_random:
+            self.true_bytes += count
+        else:
+            self.urandom_bytes += count
+
+    @property
+    def state(self) -> dict:
+        """
+        The state of the refills, for monitoring.
+        """
+        return dict(
+            running=self.running,
+            refilling=self.refilling,
+            rate=self.rate,
+            available_bits=self.pool.available_bits,
+            low_bits=self.low_bits,
+            target_bytes=self.target_bytes,
+            quota=self.quota,
+            requests=self.requests,
+            refills=self.refills,
+            true_bytes=self.true_bytes,
+            urandom_bytes=self.urandom_bytes,
+            client=self.client.state)
+
+    def __str__(self):
+        return "<Refiller(rate={:.2f}, target={}, quota={}, refills={})>" \
+            .format(self.rate, self.target_bytes, self.quota, self.refills)
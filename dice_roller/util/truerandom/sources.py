@@ -0,0 +1,124 @@
+import random
+
+import numpy
+
+
+class RandomSource:
+    """
+    Where the numbers of the dice come from.
+
+    A source gives uniform numbers from 1 to max.  low is True when the
+    source is running out of true random numbers, and should be refilled.
+    """
+
+    name = None
+    # Whether the numbers are the same every time for the same seed
+    deterministic = False
+
+    def randints(self, count: int, max: int) -> list:
+        """
+        Get count numbers from 1 to max.
+        """
+        raise NotImplementedError
+
+    def randint(self, max: int) -> int:
+        """
+        Get a number from 1 to max.
+        """
+        return self.randints(1, max)[0]
+
+    @property
+    def low(self) -> bool:
+        return False
+
+    def __str__(self):
+        return "<{}(name={})>".format(type(self).__name__, self.name)
+
+
+class RandomOrgSource(RandomSource):
+    """
+    True random numbers from random.org, drawn from an entropy pool.
+
+    Once the pool is empty, numbers are drawn from the fallback of the pool
+    until it is refilled.
+    """
+
+    name = 'randomorg'
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def randints(self, count, max):
+        return self.pool.randints(count, max)
+
+    @property
+    def low(self):
+        return self.pool.low
+
+
+class SystemSource(RandomSource):
+    """
+    Numbers from the CSPRNG of the operating system.
+    """
+
+    name = 'system'
+
+    def __init__(self, randints):
+        """
+        :param randints: randints(count, max), such as urandom_list
+        """
+        self._randints = randints
+
+    def randints(self, count, max):
+        return self._randints(count, max)
+
+
+class PCG64Source(RandomSource):
+    """
+    A fast NumPy PCG64 generator, for servers that don't need true
+    randomness.
+
+    Numbers that don't fit in an int64 are drawn with Python's generator,
+    which is seeded from the PCG64 generator.
+    """
+
+    name = 'pcg64'
+
+    def __init__(self, seed=None):
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self._generator = numpy.random.Generator(numpy.random.PCG64(seed))
+        self._random = random.Random(
+            int(self._generator.integers(2 ** 63)))
+
+    def randints(self, count, max):
+        if count <= 0:
+            return []
+        if max >= 2 ** 63:
+            return [self._random.randint(1, max) for _ in range(count)]
+        return self._generator.integers(
+            1, max, size=count, endpoint=True).tolist()
+
+
+class SeededSource(RandomSource):
+    """
+    A deterministic generator, that rolls the same dice every time for the
+    same seed.  It is meant for tests and benchmarks.
+
+    Python's Mersenne Twister is used, as its numbers are the same on every
+    platform and version.
+    """
+
+    name = 'seeded'
+    deterministic = True
+
+    def __init__(self, seed=0):
+        self._random = random.Random()
+        self.seed(seed)
+
+    def seed(self, seed=0):
+        self._random.seed(0 if seed is None else seed)
+
+    def randints(self, count, max):
+        return [self._random.randrange(max) + 1 for _ in range(count)]
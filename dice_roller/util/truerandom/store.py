@@ -0,0 +1,93 @@
+import mmap
+import os
+import struct
+
+
+class EntropyStore:
+    """
+    A memory mapped file that keeps the unused bytes of an entropy pool
+    across restarts.
+
+    The file has a header with the offset of the first byte that hasn't
+    been used, and the end of the bytes, followed by the bytes.  The offset
+    is moved past bytes before they are used, so that a byte is never used
+    twice, even if the bot crashes.  As the header is written to the
+    mapped memory, it is kept even if the bot is killed, but the operating
+    system may not have written it to disk if it crashes first.
+    """
+
+    MAGIC = b'DDBE'
+    VERSION = 1
+    # magic, version, consumed offset, end
+    HEADER = struct.Struct('<4sHxxII')
+    _CONSUMED = 8
+
+    def __init__(self, path, capacity=32768):
+        self.path = path
+        self.capacity = capacity
+
+        size = self.HEADER.size + capacity
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, version, consumed, end = self.HEADER.unpack_from(self._map)
+        if magic != self.MAGIC or version != self.VERSION \
+                or not consumed <= end <= capacity:
+            consumed = end = 0
+            self._write_header(consumed, end)
+        self._consumed = consumed
+        self._end = end
+
+    def _write_header(self, consumed, end):
+        self.HEADER.pack_into(self._map, 0, self.MAGIC, self.VERSION,
+                              consumed, end)
+
+    @property
+    def available(self) -> int:
+        """
+        The number of bytes that haven't been used.
+        """
+        return self._end - self._consumed
+
+    def load(self) -> bytes:
+        """
+        Get the bytes that haven't been used.
+        """
+        start = self.HEADER.size
+        return bytes(self._map[start + self._consumed:start + self._end])
+
+    def save(self, data):
+        """
+        Replace the bytes in the file with data, keeping as much of it as
+        fits.
+        """
+        data = bytes(data[:self.capacity])
+        # Nothing is left to use while the bytes are being written
+        self._write_header(0, 0)
+        start = self.HEADER.size
+        self._map[start:start + len(data)] = data
+        self._write_header(0, len(data))
+        self._map.flush()
+        self._consumed = 0
+        self._end = len(data)
+
+    def take(self, count=1):
+        """
+        Mark the next count bytes as used.
+        """
+        if self._consumed < self._end:
+            self._consumed = min(self._consumed + count, self._end)
+            struct.pack_into('<I', self._map, self._CONSUMED, self._consumed)
+
+    def close(self):
+        self._map.flush()
+        self._map.close()
+
+    def __str__(self):
+        return "<EntropyStore(path={}, available={})>".format(
+            self.path, self.available)
@@ -1,7 +1,41 @@
+import collections
 import re
 
+from ._cache import LRUCache
+
 regex = re.compile(r'{([\w.]+)(?:\s*\?\s*(.+))?}')
 
+# The nodes of a parsed template.  A default is the parsed template to use
+# when the variable isn't given, or None.
+Literal = collections.namedtuple('Literal', ['text'])
+Positional = collections.namedtuple('Positional', ['index', 'default'])
+Named = collections.namedtuple('Named', ['name', 'default'])
+
+# Templates are parsed once, and cached by their text
+_templates = LRUCache(1024)
+
+# The number of variables that can be nested inside each other when resolving
+MAX_DEPTH = 20
+
+
+class RecursiveVariable(ValueError):
+    """
+    Raised when the value of a variable uses itself.
+
+    names is the chain of variables that lead back to the first one.
+    """
+
+    def __init__(self, names):
+        super().__init__(' -> '.join(map(str, names)))
+        self.names = names
+
+
+class TooDeep(ValueError):
+    """
+    Raised when variables are nested more than MAX_DEPTH times.
+    """
+    pass
+
 
 def _split_variables(text):
     """
@@ -38,21 +72,95 @@ def _split_variables(text):
     return separated
 
 
+def _parse_variable(text):
+    """
+    Parse a single {variable} block, or return None if it isn't one.
+    """
+    match = regex.fullmatch(text)
+    if match is None:
+        return None
+    name, default = match.groups()
+    if default is not None:
+        default = parse(default)
+    try:
+        return Positional(int(name), default)
+    except ValueError:
+        return Named(name, default)
+
+
+def parse(text) -> tuple:
+    """
+    Parse a string into a tuple of Literal, Positional, and Named nodes.
+
+    Braces that aren't a valid variable are kept as literal text.
+    """
+    template = _templates.get(text)
+    if template is not None:
+        return template
+
+    nodes = list()
+    for part in _split_variables(text):
+        node = None
+        if part.startswith('{'):
+            node = _parse_variable(part)
+        if node is None:
+            # Join neighbouring text into a single literal
+            if nodes and isinstance(nodes[-1], Literal):
+                part = nodes.pop().text + part
+            node = Literal(part)
+        nodes.append(node)
+
+    template = tuple(nodes)
+    _templates.put(text, template)
+    return template
+
+
+def _walk(template):
+    for node in template:
+        yield node
+        if not isinstance(node, Literal) and node.default is not None:
+            yield from _walk(node.default)
+
+
 def getVariables(text):
     """
     Get a set of the variables the text uses
     """
-    split = _split_variables(text)
+    variables = set()
+    for node in _walk(parse(text)):
+        if isinstance(node, Positional):
+            variables.add(str(node.index))
+        elif isinstance(node, Named):
+            variables.add(node.name)
+    return variables
 
-    variables = list()
 
-    for t in split:
-        result = re.findall(regex, t)
-        if result:
-            variables.append(result[0][0])
-            if result[0][1]:
-                variables.extend(getVariables(result[0][1]))
-    return set(variables)
+def _lookup(node, args, kwargs):
+    """
+    Get the value of a variable.
+
+    :raises IndexError: for a missing positional variable
+    :raises KeyError: for a missing named variable
+    """
+    if isinstance(node, Positional):
+        if node.index >= len(args):
+            raise IndexError(node.index)
+        return args[node.index]
+    return kwargs[node.name]
+
+
+def _render(template, args, kwargs, out):
+    for node in template:
+        if isinstance(node, Literal):
+            out.append(node.text)
+            continue
+        try:
+            out.append(str(_lookup(node, args, kwargs)))
+        except (KeyError, IndexError):
+            if node.default is None:
+                # There is no default value for a missing variable
+                raise
+            _render(node.default, args, kwargs, out)
 
 
 def setVariables(text, *args, **kwargs):
@@ -73,31 +181,74 @@ def setVariables(text, *args, **kwargs):
     >>> setVariables('{asdf} {0?foobar} {1?{bam}}', 'a', asdf='b', bam='c')
     'b a c'
     ```
-    """
-    split = _split_variables(text)
 
+    The values aren't searched for variables, use resolve() for that.
+    """
     out = list()
+    _render(parse(text), args, kwargs, out)
+    return ''.join(out)
+
+
+def resolve(text, *args, **kwargs):
+    """
+    Set variables in a string, and the variables used by their values.
+
+    Each value that has variables of its own, such as a stat of `{str} + 2`,
+    is resolved once and reused.  The whole string is resolved in one pass.
 
-    for t in split:
-        result = re.findall(regex, t)
-        if result:
-            r = result[0]
+    ```
+    >>> resolve('{0} + {mod}', '{str}', mod='{str} / 2', str='4')
+    '4 + 4 / 2'
+    ```
+
+    :raises RecursiveVariable: if a value uses itself
+    :raises TooDeep: if values are nested more than MAX_DEPTH times
+    :raises KeyError, IndexError: like setVariables
+    """
+    return resolve_mapping(text, args, kwargs)
+
+
+def resolve_mapping(text, args, stats):
+    """
+    Like resolve, but the named variables are looked up in the stats
+    mapping, which isn't copied.
+    """
+    kwargs = stats
+    resolved = dict()
+    # The variables that are being resolved, to find cycles
+    stack = list()
+
+    def value_of(key, value):
+        if key in resolved:
+            return resolved[key]
+        if key in stack:
+            raise RecursiveVariable(stack[stack.index(key):] + [key])
+        if len(stack) >= MAX_DEPTH:
+            raise TooDeep()
+
+        stack.append(key)
+        out = list()
+        render(parse(str(value)), out)
+        stack.pop()
+
+        resolved[key] = ''.join(out)
+        return resolved[key]
+
+    def render(template, out):
+        for node in template:
+            if isinstance(node, Literal):
+                out.append(node.text)
+                continue
             try:
-                # Try to replace the variable with either the positional arg,
-                # or keyword arg
-                try:
-                    out.append(args[int(r[0])])
-                except ValueError:
-                    out.append(kwargs[r[0]])
+                value = _lookup(node, args, kwargs)
             except (KeyError, IndexError):
-                if not r[1]:
-                    # There is no default value for a missing variable, raise
-                    # the exception
+                if node.default is None:
                     raise
-                # Replace the variable with the default variable
-                out.append(setVariables(r[1], *args, **kwargs))
-        else:
-            # This is not a variable block, so nothing needs to be done
-            out.append(t)
+                render(node.default, out)
+                continue
+            key = node.index if isinstance(node, Positional) else node.name
+            out.append(value_of(key, value))
 
-    return ''.join(map(str, out))
+    out = list()
+    render(parse(text), out)
+    return ''.join(out)
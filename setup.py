@@ -12,7 +12,8 @@ INSTALL_REQUIRES = [
       'ruamel.yaml',
       'marshmallow',
       'SQLAlchemy',
-      'alembic'
+      'alembic',
+      'numpy'
 ]
 
 
@@ -2,5 +2,21 @@ import unittest
 
 from test_equations import TestEquationParser
 from test_variables import TestVariableParser
+from test_cache import TestLRUCache, TestEquationCache
+from test_tokenizer import TestTokenizer
+from test_distribution import TestDistribution
+from test_sampler import TestSampler
+from test_pool import TestEvaluationPool
+from test_budget import TestBudget
+from test_catalog import TestEquationCatalog
+from test_stat_cache import TestStatsCache
+from test_stat_graph import TestStatGraph
+from test_stat_index import TestStatIndex
+from test_jobs import TestJobQueue
+from test_dice import TestDice
+from test_entropy import TestEntropyPool, TestEntropyStore
+from test_random_client import TestRandomOrgClient
+from test_refill import TestRefiller
+from test_sources import TestRandomSource
 
 unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from dice_roller import util
+from dice_roller.util import _calculator, _budget
+
+
+class TestBudget(unittest.TestCase):
+
+    def calculate(self, equation, **limits):
+        context = _calculator.EvaluationContext(
+            budget=_budget.Budget(**limits))
+        return util.calculator.parse_equation(equation, context=context)
+
+    def test_dice(self):
+        self.calculate('10d6 + 10d6', dice=20)
+        with self.assertRaises(util.BadEquation):
+            self.calculate('10d6 + 10d6 + 1d6', dice=20)
+        with self.assertRaises(util.BadEquation):
+            self.calculate('top(30, 6, 3)', dice=20)
+        # Dice in an if branch that isn't taken aren't rolled
+        self.calculate('if(1d2 > 5, 100d6, 1d6)', dice=2)
+
+    def test_steps(self):
+        self.calculate('1d6 + 1d6 + 1d6', steps=5)
+        with self.assertRaises(util.BadEquation):
+            self.calculate('1d6 + 1d6 + 1d6 + 1d6', steps=5)
+
+    def test_bits(self):
+        self.assertEqual(self.calculate('round(2)^round(60)', bits=64),
+                         2 ** 60)
+        with self.assertRaises(util.BadEquation):
+            self.calculate('round(2)^round(100)', bits=64)
+        with self.assertRaises(util.BadEquation):
+            self.calculate('round(2^40) * round(2^40)', bits=64)
+        # The default budget stops huge powers before they are calculated
+        with self.assertRaises(util.BadEquation):
+            util.calculator.parse_equation('500d1000000^500d1000000')
+
+    def test_distribution(self):
+        context = _calculator.EvaluationContext(
+            budget=_budget.Budget(dice=20))
+        util.calculator.distribution('if(1d2 > 1, 10d6, 10d4)',
+                                     context=context)
+        with self.assertRaises(util.BadEquation):
+            util.calculator.distribution('(1d30)d6', context=context)
+        # Powers are checked with the largest operands
+        with self.assertRaises(util.BadEquation):
+            util.calculator.distribution('1d20^1d300')
+
+    def test_server(self):
+        class Server:
+            max_dice = 10
+            max_steps = 10 ** 9
+            max_expansions = None
+            max_bits = None
+
+        # A server can lower the limits of the config, but not raise them
+        budget = _budget.Budget.for_server(Server())
+        default = _budget.Budget()
+        self.assertEqual(budget.max_dice, 10)
+        self.assertEqual(budget.max_steps, default.max_steps)
+        self.assertEqual(budget.max_expansions, default.max_expansions)
+        self.assertEqual(budget.max_bits, default.max_bits)
+
+    def test_shared(self):
+        # Nested contexts share the budget of their parent
+        context = _calculator.EvaluationContext(budget=_budget.Budget(dice=5))
+        nested = context.nested()
+        self.assertIs(nested.budget, context.budget)
+        nested.budget.roll(5)
+        with self.assertRaises(util.BadEquation):
+            context.budget.roll(1)
+        with self.assertRaises(util.BadEquation):
+            _budget.Budget(expansions=0).expand()
@@ -0,0 +1,74 @@
+import unittest
+
+from dice_roller import util
+from dice_roller.util._cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        # Reading a makes b the least recently used item
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_counters(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual(cache.get_any(['b', 'a']), 1)
+
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+
+    def test_resize(self):
+        cache = LRUCache(3)
+        for i in range(3):
+            cache.put(i, i)
+        cache.size = 1
+        self.assertEqual(len(cache), 1)
+        self.assertIn(2, cache)
+
+        cache.size = 0
+        cache.put('a', 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        cache = LRUCache(4)
+        for i in range(4):
+            cache.put(i, i)
+        cache.invalidate(lambda k: k % 2 == 0)
+        self.assertEqual(len(cache), 2)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+
+class TestEquationCache(unittest.TestCase):
+
+    def setUp(self):
+        util.calculator.invalidate()
+        util.calculator.cache.reset_counters()
+
+    def test_repeat_equation(self):
+        util.calculator.parse_equation('1 + 2 * 3')
+        self.assertEqual(util.calculator.cache.misses, 1)
+
+        # Whitespace and case are ignored when looking up equations
+        self.assertEqual(util.calculator.parse_equation('1+2*3'), 7)
+        self.assertEqual(util.calculator.parse_equation('1 + 2 * 3'), 7)
+        self.assertEqual(util.calculator.cache.hits, 2)
+        self.assertEqual(util.calculator.cache.misses, 1)
+
+    def test_invalidate(self):
+        util.calculator.parse_equation('max(1, 2)')
+        util.calculator.invalidate()
+        util.calculator.parse_equation('max(1, 2)')
+        self.assertEqual(util.calculator.cache.misses, 2)
@@ -0,0 +1,95 @@
+import unittest
+
+from dice_roller import db
+from dice_roller.util import _catalog
+
+
+def record(id, creator_id, name, value='1', params=0):
+    return _catalog.EquationRecord(id, 1, creator_id, name, '', value, params)
+
+
+class TestEquationCatalog(unittest.TestCase):
+
+    def test_find(self):
+        equations = _catalog._ServerEquations([
+            record(3, 10, 'mod'),
+            record(2, 11, 'mod'),
+            record(5, 11, 'twice'),
+        ])
+
+        # The user's own equation is used first
+        self.assertEqual(equations.find(['mod'], 10).id, 3)
+        # Otherwise the oldest equation with the name
+        self.assertEqual(equations.find(['mod'], 12).id, 2)
+        self.assertEqual(equations.find(['MOD']).id, 2)
+        # An id is used before the name
+        self.assertEqual(equations.find(['mod', '3'], 11).id, 3)
+        self.assertEqual(equations.find(['', '5']).name, 'twice')
+        self.assertEqual(equations.find(['mod', '9'], 11).id, 2)
+        self.assertIsNone(equations.find(['nope']))
+
+    def test_revisions(self):
+        catalog = _catalog.EquationCatalog()
+        start = catalog.revision(1)
+
+        catalog.invalidate(1)
+        self.assertNotEqual(catalog.revision(1), start)
+        self.assertEqual(catalog.revision(2), start)
+
+        # Invalidating everything changes every revision
+        revision = catalog.revision(1)
+        catalog.invalidate()
+        self.assertNotEqual(catalog.revision(1), revision)
+        self.assertNotEqual(catalog.revision(2), start)
+
+    def test_sync(self):
+        bot = _catalog.EquationCatalog()
+        worker = _catalog.EquationCatalog()
+        worker._servers[1] = _catalog._ServerEquations([record(1, 10, 'a')])
+
+        self.assertFalse(worker.sync(1, bot.revision(1)))
+        self.assertIn(1, worker._servers)
+
+        bot.invalidate(1)
+        self.assertTrue(worker.sync(1, bot.revision(1)))
+        self.assertNotIn(1, worker._servers)
+        self.assertEqual(worker.revision(1), bot.revision(1))
+
+        bot.invalidate()
+        self.assertTrue(worker.sync(1, bot.revision(1)))
+        self.assertEqual(worker.revision(1), bot.revision(1))
+
+    def test_absent(self):
+        catalog = _catalog.EquationCatalog()
+        catalog._load = lambda session, server_id: \
+            _catalog._ServerEquations([record(1, 10, 'mod')])
+        lookups = list()
+
+        def get_all_from_strings(session, table, strings, server_id,
+                                 user_id):
+            lookups.append(sorted(strings))
+            return dict()
+
+        old = db.database.get_all_from_strings
+        db.database.get_all_from_strings = get_all_from_strings
+        try:
+            # The database isn't asked right after the catalog is loaded
+            self.assertEqual(catalog.get_all(None, 1, ['mod', 'typo']),
+                             dict(mod=record(1, 10, 'mod')))
+            self.assertEqual(lookups, [])
+            # Strings that aren't equations are remembered
+            catalog.get_all(None, 1, ['typo', 'other'])
+            catalog.get_all(None, 1, ['typo', 'other'])
+            self.assertEqual(lookups, [['other']])
+
+            # Until the server is invalidated
+            catalog.invalidate(1)
+            catalog.get_all(None, 1, ['typo'])
+            catalog.get_all(None, 1, ['typo'])
+            self.assertEqual(lookups, [['other']])
+            # They are remembered for each user
+            catalog.get_all(None, 1, ['mod', 'typo'], 11)
+            catalog.get_all(None, 1, ['mod', 'typo'], 11)
+            self.assertEqual(lookups, [['other'], ['typo']])
+        finally:
+            db.database.get_all_from_strings = old
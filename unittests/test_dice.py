@@ -0,0 +1,66 @@
+import unittest
+import collections
+
+from dice_roller.util import _dice, truerandom
+
+
+class TestDice(unittest.TestCase):
+
+    def setUp(self):
+        self.dice = _dice.Dice()
+
+    def roll_logged(self, sides, times):
+        with self.dice.logging_to(list()) as log:
+            rolls = self.dice.roll_dice(sides, times)
+        return rolls, log
+
+    def test_urandom_list(self):
+        for count, sides in [(1000, 6), (1000, 7), (1000, 120),
+                             (100, 2 ** 32 - 1), (100, 2 ** 32),
+                             (100, 2 ** 64), (100, 2 ** 40 + 3),
+                             (10, 2 ** 70)]:
+            numbers = truerandom.urandom_list(count, sides)
+            self.assertEqual(len(numbers), count)
+            self.assertTrue(all(1 <= n <= sides for n in numbers))
+            self.assertTrue(all(type(n) is int for n in numbers))
+        self.assertEqual(truerandom.urandom_list(0, 6), [])
+
+    def test_uniform(self):
+        counts = collections.Counter(truerandom.urandom_list(70000, 7))
+        self.assertEqual(set(counts), set(range(1, 8)))
+        for value in counts.values():
+            self.assertAlmostEqual(value / 70000, 1 / 7, delta=0.01)
+
+    def test_roll_dice(self):
+        rolls, logged = self.roll_logged(7, 100)
+        self.assertEqual(len(rolls), 100)
+        self.assertEqual(logged, [(r, 7) for r in rolls])
+
+        rolls, logged = self.roll_logged(20, 10)
+        self.assertEqual(logged, [(r, 20) for r in rolls])
+        self.assertTrue(all(1 <= r <= 20 for r in rolls))
+
+        # The number of dice is limited
+        self.assertEqual(len(self.dice.roll_dice(6, 10000)),
+                         _dice.Dice.MAX_ROLLS)
+        self.assertEqual(self.dice.roll_dice(6, 0), [])
+        self.assertEqual(self.dice.roll_dice(0, 0), [])
+
+    def test_percentile(self):
+        rolls, logged = self.roll_logged(100, 50)
+        self.assertEqual(len(rolls), 50)
+        self.assertTrue(all(1 <= r <= 100 for r in rolls))
+        # Every percentile die is rolled with two d10s
+        self.assertEqual(len(logged), 100)
+        self.assertTrue(all(sides == 10 for _, sides in logged))
+        for roll, (tens, ones) in zip(rolls, zip(logged[::2], logged[1::2])):
+            self.assertEqual(roll, _dice.Dice._join_percentile(
+                100, [tens[0], ones[0]]))
+
+        self.assertEqual(_dice.Dice._join_percentile(100, [10, 10]), 100)
+        self.assertEqual(_dice.Dice._join_percentile(100, [10, 7]), 7)
+        self.assertEqual(_dice.Dice._join_percentile(1000, [3, 10, 1]), 301)
+
+        # A d1 isn't rolled or logged
+        self.assertEqual(self.roll_logged(1, 3), ([1, 1, 1], []))
+        self.assertEqual(self.dice.roll(1), 1)
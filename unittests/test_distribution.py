@@ -0,0 +1,94 @@
+import unittest
+import itertools
+
+from dice_roller import util
+from dice_roller.util import _distribution
+
+
+class TestDistribution(unittest.TestCase):
+
+    def assertPmfEqual(self, dist, pmf):
+        self.assertSetEqual(set(dist.pmf), set(pmf))
+        for value, p in pmf.items():
+            self.assertAlmostEqual(dist.pmf[value], p)
+
+    def test_dice(self):
+        dist = util.calculator.distribution('1d6')
+        self.assertPmfEqual(dist, dict((i, 1 / 6) for i in range(1, 7)))
+
+        dist = util.calculator.distribution('2d6')
+        self.assertAlmostEqual(dist.pmf[7], 1 / 6)
+        self.assertAlmostEqual(dist.mean, 7)
+        self.assertAlmostEqual(dist.variance, 35 / 6)
+
+        dist = util.calculator.distribution('40d6')
+        self.assertEqual(dist.min, 40)
+        self.assertEqual(dist.max, 240)
+        self.assertAlmostEqual(dist.mean, 140)
+
+        # Large sums are convolved with an FFT, which gives the same odds
+        direct = _distribution.sum_dice(30, 20)
+        threshold = _distribution.FFT_THRESHOLD
+        _distribution.FFT_THRESHOLD = 0
+        try:
+            self.assertPmfEqual(_distribution.sum_dice(30, 20), direct.pmf)
+        finally:
+            _distribution.FFT_THRESHOLD = threshold
+
+    def test_keep_dice(self):
+        # Compare the distributions against every possible roll
+        for times, sides, keep, best in [(4, 6, 3, True), (5, 4, 2, False),
+                                         (3, 5, 1, True)]:
+            counts = dict()
+            for roll in itertools.product(range(1, sides + 1), repeat=times):
+                value = sum(sorted(roll, reverse=best)[:keep])
+                counts[value] = counts.get(value, 0) + 1
+            self.assertPmfEqual(
+                _distribution.keep_dice(times, sides, keep, best),
+                dict((v, c / sides ** times) for v, c in counts.items())
+            )
+
+        self.assertAlmostEqual(util.calculator.distribution('adv(20)').mean,
+                               13.825)
+        self.assertAlmostEqual(util.calculator.distribution('dis(20)').mean,
+                               7.175)
+
+        # Too many kept dice are refused before any work is done
+        self.assertRaises(_distribution.TooComplex, _distribution.keep_dice,
+                          500, 100, 99)
+
+    def test_functions(self):
+        dist = util.calculator.distribution('1d20 + 5 >= 15')
+        self.assertTrue(dist.is_condition)
+        self.assertAlmostEqual(dist.pmf[1], 0.55)
+        # Only comparisons are conditions, not results of 0 or 1
+        self.assertFalse(util.calculator.distribution('1d2 - 1').is_condition)
+        self.assertFalse(util.calculator.distribution('1d1').is_condition)
+
+        dist = util.calculator.distribution('1d20')
+        self.assertAlmostEqual(dist.at_least(15), 0.3)
+        self.assertEqual(dist.percentile(50), 10)
+
+        dist = util.calculator.distribution('if(1d2 > 1, 1d4, 10)')
+        self.assertAlmostEqual(dist.pmf[10], 0.5)
+        self.assertAlmostEqual(dist.pmf[1], 0.125)
+
+        dist = util.calculator.distribution('max(1d6, 3)')
+        self.assertAlmostEqual(dist.pmf[3], 0.5)
+
+        dist = util.calculator.distribution('(1d2)d4')
+        self.assertAlmostEqual(dist.pmf[1], 1 / 8)
+        self.assertAlmostEqual(dist.mean, 3.75)
+
+    def test_errors(self):
+        self.assertRaises(util.BadEquation, util.calculator.distribution,
+                          '1d0')
+        self.assertRaises(util.BadEquation, util.calculator.distribution,
+                          '1d6 / (1d2 - 1)')
+        self.assertRaises(util.BadEquation, util.calculator.distribution,
+                          '500d1000000')
+
+        # Results too large for a float can't be averaged
+        dist = _distribution.Distribution({1: 0.5, 2 ** 1100: 0.5})
+        with self.assertRaises(util.BadEquation):
+            dist.mean
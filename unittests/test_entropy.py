@@ -0,0 +1,153 @@
+import unittest
+import collections
+import os
+import shutil
+import tempfile
+
+from dice_roller.util import truerandom
+from dice_roller.util.truerandom.entropy import EntropyPool
+from dice_roller.util.truerandom.store import EntropyStore
+
+
+class TestEntropyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = EntropyPool(truerandom.urandom_list)
+
+    def test_uniform(self):
+        self.pool.add(os.urandom(70000))
+        counts = collections.Counter(self.pool.randints(70000, 7))
+        self.assertEqual(set(counts), set(range(1, 8)))
+        for value in counts.values():
+            self.assertAlmostEqual(value / 70000, 1 / 7, delta=0.01)
+        self.assertEqual(self.pool.fallback_dice, 0)
+
+    def test_accounting(self):
+        self.pool.add(os.urandom(1000))
+        self.assertEqual(self.pool.available_bits, 8000)
+        self.pool.randints(100, 20)
+        self.pool.randints(100, 6)
+        self.pool.randint(100)
+        self.assertEqual(self.pool.used_bits + self.pool.available_bits,
+                         self.pool.added_bits)
+        self.assertEqual(self.pool.usage[20][0], 100)
+        self.assertEqual(self.pool.usage[6][0], 100)
+        # Several dice are packed into each word, so little more than
+        # log2(n) bits are used for each die
+        self.assertLess(self.pool.bits_per_die(6), 4)
+        self.assertLess(self.pool.bits_per_die(20), 6)
+        self.assertEqual(self.pool.bits_per_die(8), 0.0)
+
+    def test_fallback(self):
+        self.assertTrue(self.pool.low)
+        numbers = self.pool.randints(10, 6)
+        self.assertEqual(len(numbers), 10)
+        self.assertTrue(all(1 <= n <= 6 for n in numbers))
+        self.assertEqual(self.pool.fallback_dice, 10)
+        self.assertEqual(self.pool.used_bits, 0)
+
+        # Dice are drawn from the pool until it is empty
+        self.pool.add(b'\xff')
+        numbers = self.pool.randints(10, 2)
+        self.assertEqual(len(numbers), 10)
+        self.assertEqual(self.pool.used_bits, 8)
+        self.assertEqual(self.pool.available_bits, 0)
+        self.assertEqual(self.pool.fallback_dice, 12)
+
+    def test_words(self):
+        # Every size of word, and numbers that don't fit in one
+        self.pool.add(os.urandom(100000))
+        for sides in [2, 6, 20, 256, 1000, 2 ** 31, 2 ** 40 + 3, 2 ** 70]:
+            numbers = self.pool.randints(100, sides)
+            self.assertEqual(len(numbers), 100)
+            self.assertTrue(all(1 <= n <= sides for n in numbers))
+            self.assertTrue(all(type(n) is int for n in numbers))
+        self.assertEqual(self.pool.fallback_dice, 0)
+        self.assertEqual(self.pool.used_bits + self.pool.available_bits,
+                         self.pool.added_bits)
+
+    def test_clear(self):
+        self.pool.add(os.urandom(100))
+        self.assertFalse(self.pool.low)
+        self.pool.clear()
+        self.assertEqual(self.pool.available_bits, 0)
+        self.assertEqual(self.pool.randints(3, 1), [1, 1, 1])
+        self.assertRaises(ValueError, self.pool.randint, 0)
+
+    def test_compact(self):
+        data = os.urandom(20000)
+        self.pool.add(data)
+        self.pool.randints(10000, 256)
+        self.assertEqual(self.pool.available_bits, 10000 * 8)
+        self.assertEqual(bytes(self.pool._data[self.pool._start:]),
+                         data[10000:])
+
+
+class TestEntropyStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'entropy.bin')
+        self.pool = EntropyPool(truerandom.urandom_list)
+
+    def tearDown(self):
+        store = self.pool.detach()
+        if store is not None:
+            store.close()
+        shutil.rmtree(self.directory)
+
+    def reopen(self, **kwargs):
+        """
+        Open the file again, as the bot would after a restart.
+        """
+        store = self.pool.detach()
+        if store is not None:
+            store.close()
+        self.pool = EntropyPool(truerandom.urandom_list)
+        self.pool.attach(EntropyStore(self.path, **kwargs))
+        return self.pool._store
+
+    def test_restart(self):
+        self.pool.attach(EntropyStore(self.path))
+        self.assertEqual(self.pool.available_bits, 0)
+        data = os.urandom(500)
+        self.pool.add(data)
+        self.pool.save()
+
+        store = self.reopen()
+        self.assertEqual(store.available, 500)
+        self.assertEqual(self.pool.available_bits, 500 * 8)
+        self.assertEqual(self.pool.added_bits, 500 * 8)
+        self.assertEqual(store.load(), data)
+
+    def test_crash(self):
+        self.pool.attach(EntropyStore(self.path))
+        data = os.urandom(200)
+        self.pool.add(data)
+        self.pool.save()
+
+        # Bytes are marked as used as soon as they are, without saving
+        self.pool.randints(50, 20)
+        used = self.pool.used_bits // 8 + (self.pool.used_bits % 8 > 0)
+        store = self.reopen()
+        self.assertEqual(store.available, 200 - used)
+        self.assertEqual(store.load(), data[used:])
+
+        # Bytes that weren't saved are lost, but never used twice
+        self.pool.add(os.urandom(100))
+        self.assertEqual(self.reopen().available, 200 - used)
+
+    def test_bad_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'nonsense' * 10)
+        store = EntropyStore(self.path, capacity=100)
+        self.assertEqual(store.available, 0)
+        self.assertEqual(os.path.getsize(self.path),
+                         EntropyStore.HEADER.size + 100)
+
+        store.save(bytes(range(150)))
+        self.assertEqual(store.load(), bytes(range(100)))
+        store.close()
+
+        # A smaller file can't hold the bytes that were left
+        self.assertEqual(self.reopen(capacity=50).available, 0)
@@ -1,6 +1,8 @@
 import unittest
+import collections
 
-from dice_roller import util
+from dice_roller import util, db
+from dice_roller.util import _calculator
 
 # see https://docs.python.org/3.5/library/unittest.html for info on creating a
 # testcase
@@ -71,3 +73,151 @@ class TestEquationParser(unittest.TestCase):
     def test_complex_equations(self):
         self.assertEqual(util.calculator.parse_equation('(floor(5 * 4 + 3 / 6) % 6)'), 2)
         self.assertEqual(util.calculator.parse_equation('((5 * 4 + 3 / 6) % 6)'), 2.5)
+
+    def test_compiled_program(self):
+        program = util.calculator._get_program('max(2 * 3, 4) + floor(1.5)')
+        self.assertEqual(program(), 7)
+        # A program can be calculated any number of times
+        self.assertEqual(program(), 7)
+
+        self.fail_on_success('1 +')
+        self.fail_on_success('max(1)')
+
+    def test_context(self):
+        context = _calculator.EvaluationContext()
+        self.assertEqual(
+            util.calculator.parse_equation('max(1, 2)', context=context), 2)
+
+        # Custom equations aren't available without a session
+        self.assertIsNone(context.get_equation('foo'))
+
+        context = _calculator.EvaluationContext(depth=21)
+        self.assertRaises(util.BadEquation, util.calculator.parse_equation,
+                          '1 + 1', context=context)
+
+    def rolled_dice(self, roll):
+        context = _calculator.EvaluationContext(rolled_dice=list())
+        util.calculator.parse_equation(roll, context=context)
+        return context.rolled_dice
+
+    def test_short_circuit(self):
+        # Only the branch that is taken should roll any dice
+        self.assertEqual(len(self.rolled_dice('if(1, 1d6, 8d6)')), 1)
+        self.assertEqual(len(self.rolled_dice('if(0, 1d6, 8d6)')), 8)
+        self.assertEqual(len(self.rolled_dice('if(1d2 > 0, 2d6, 8d6)')), 3)
+
+        self.assertListEqual(self.rolled_dice('and(0, 1d6)'), [])
+        self.assertListEqual(self.rolled_dice('or(1, 1d6)'), [])
+        self.assertEqual(len(self.rolled_dice('and(1, 1d6)')), 1)
+        self.assertEqual(len(self.rolled_dice('or(0, 1d6)')), 1)
+
+    def test_roll_log(self):
+        # Each calculation logs its dice in its own context, even when it
+        # is calculated while another one is logging
+        outer = list()
+        inner = _calculator.EvaluationContext(rolled_dice=list())
+        with util.dice.logging_to(outer):
+            util.calculator.parse_equation('2d6', context=inner)
+            util.calculator.parse_equation('3d6')
+            util.dice.roll(6)
+        self.assertEqual(len(inner.rolled_dice), 2)
+        self.assertEqual(len(outer), 1)
+
+    def test_constant_folding(self):
+        program = util.calculator._get_program('floor((14 - 10) / 2) + 3')
+        self.assertTrue(program.is_constant)
+        self.assertEqual(program(), 5)
+
+        program = util.calculator._get_program('floor((14 - 10) / 2) + 1d20')
+        self.assertFalse(program.is_constant)
+        self.assertEqual(program.root.args[0].value, 2)
+
+        # Only the branch that is taken is kept
+        program = util.calculator._get_program('if(2 > 1, 1d6, 1 / 0)')
+        self.assertEqual(program.root.name, 'd')
+
+        # Errors are still raised when the equation is calculated
+        self.fail_on_success('1 / 0')
+        self.fail_on_success('if(1d2 > 0, 1 / 0, 1 / 0)')
+
+    def inline_context(self, **equations):
+        """
+        Create a context with custom equations, without a database.
+        """
+        class Session:
+            """
+            A session that only has an empty table of stats.
+            """
+            def query(self, cls):
+                if cls is not db.schema.Stat:
+                    raise AssertionError("Queried {}".format(cls))
+                return self
+
+            def filter(self, *criteria):
+                return self
+
+            def all(self):
+                return []
+
+        class User:
+            id = 1
+            active_server_id = 1
+            active_server = None
+
+        class Equation:
+            server_id = 1
+
+            def __init__(self, id, value, params):
+                self.id = id
+                self.value = value
+                self.params = params
+
+        # Any other name isn't an equation
+        context = _calculator.EvaluationContext(
+            Session(), User(), equations=collections.defaultdict(lambda: None))
+        for i, (name, (value, params)) in enumerate(sorted(equations.items())):
+            context.equations[name] = Equation(i, value, params)
+        return context
+
+    def test_inline_equations(self):
+        util.calculator.invalidate()
+        context = self.inline_context(
+            mod=('floor(({0} - 10) / 2)', 1),
+            twice=('mod({0}) * 2', 1),
+            both=('{0} + {0}', 1),
+            cat=('1{0}', 1)
+        )
+
+        # Equations with constant operands are calculated while compiling
+        program = util.calculator._get_program('twice(16) + mod(8)', context)
+        self.assertTrue(program.is_constant)
+        self.assertEqual(program(context), 5)
+
+        # The operands of an equation are only calculated once
+        context.rolled_dice = list()
+        value = util.calculator.parse_equation('both(1d20)', context=context)
+        dice = context.rolled_dice
+        self.assertEqual(len(dice), 1)
+        self.assertEqual(value, dice[0][0] * 2)
+
+        # Equations that can't be inlined are still calculated as text
+        self.assertEqual(
+            util.calculator.parse_equation('cat(5)', context=context), 15)
+
+        # Operators are never looked up as equations, the session would fail
+        # if they were
+        self.assertIsNone(context.get_equation('('))
+        self.assertIsNone(context.get_equation('+'))
+
+        # A template is compiled once for every use
+        util.calculator.parse_equation('twice(1d6) + twice(1d4)',
+                                       context=context)
+        self.assertGreater(util.calculator.templates.hits, 0)
+
+        # Inlined equations can still be charged to the budget
+        context.budget.max_expansions = context.budget.expansions
+        self.fail_on_success_context('both(1d6)', context)
+
+    def fail_on_success_context(self, roll, context):
+        self.assertRaises(util.BadEquation, util.calculator.parse_equation,
+                          roll, context=context)
@@ -0,0 +1,82 @@
+import unittest
+import asyncio
+
+from dice_roller.util import _jobs
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = _jobs.JobQueue()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.log = list()
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    async def job(self, name, steps=2):
+        self.log.append(('start', name))
+        for _ in range(steps):
+            await asyncio.sleep(0)
+        self.log.append(('end', name))
+        if name == 'bad':
+            raise ValueError(name)
+        return name
+
+    def callback(self, name):
+        async def callback(result, error):
+            self.log.append(('done', name, result, type(error)))
+        return callback
+
+    def test_order(self):
+        async def submit():
+            self.jobs.submit(1, 'a', self.job, 'a')
+            self.jobs.submit(1, 'b', self.job, 'b')
+            self.jobs.submit(2, 'c', self.job, 'c')
+            self.assertEqual(self.jobs.pending(), 3)
+            await self.jobs.join()
+
+        self.loop.run_until_complete(submit())
+
+        # Jobs of a group are run one at a time, groups run at the same time
+        starts = [entry[1] for entry in self.log if entry[0] == 'start']
+        self.assertEqual(starts, ['a', 'c', 'b'])
+        self.assertLess(self.log.index(('end', 'a')),
+                        self.log.index(('start', 'b')))
+        self.assertEqual(self.jobs.pending(), 0)
+
+    def test_merge(self):
+        async def submit():
+            self.assertTrue(self.jobs.submit(
+                1, 'a', self.job, 'a', callback=self.callback(1)))
+            await asyncio.sleep(0)
+            # The first job is running, so the next one isn't merged
+            self.assertEqual(self.jobs.running(1), 'a')
+            self.assertTrue(self.jobs.submit(
+                1, 'a', self.job, 'a', callback=self.callback(2)))
+            self.assertFalse(self.jobs.submit(
+                1, 'a', self.job, 'a', callback=self.callback(3)))
+            await self.jobs.join()
+
+        self.loop.run_until_complete(submit())
+
+        self.assertEqual(self.log.count(('start', 'a')), 2)
+        self.assertEqual(
+            [entry for entry in self.log if entry[0] == 'done'],
+            [('done', 1, 'a', type(None)), ('done', 2, 'a', type(None)),
+             ('done', 3, 'a', type(None))])
+
+    def test_error(self):
+        async def submit():
+            self.jobs.submit(1, 'bad', self.job, 'bad',
+                             callback=self.callback(1))
+            self.jobs.submit(1, 'a', self.job, 'a')
+            await self.jobs.join()
+
+        self.loop.run_until_complete(submit())
+
+        self.assertIn(('done', 1, None, ValueError), self.log)
+        # The jobs after a failed job are still run
+        self.assertIn(('end', 'a'), self.log)
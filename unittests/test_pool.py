@@ -0,0 +1,127 @@
+import unittest
+import asyncio
+import math
+import os
+import time
+
+from dice_roller import util
+from dice_roller.util import _pool, truerandom
+from dice_roller.config import config
+
+
+def _slow_roll(sides):
+    """
+    Roll a die once every worker is busy, so that each worker rolls one.
+    """
+    time.sleep(0.5)
+    return util.dice.roll(sides)
+
+
+class TestEvaluationPool(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = config.config.calculator
+        self.old = (self.settings.poolSize, self.settings.timeout)
+        self.settings.poolSize = 2
+        self.settings.timeout = 1
+        self.pool = _pool.EvaluationPool()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.pool.close()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.settings.poolSize, self.settings.timeout = self.old
+
+    def run_all(self, *coroutines):
+        return self.loop.run_until_complete(asyncio.gather(
+            *coroutines, return_exceptions=True))
+
+    def test_evaluate(self):
+        value, dice = self.run_all(
+            self.pool.run(_pool.evaluate, '2d4 + 3'))[0]
+        self.assertEqual(len(dice), 2)
+        self.assertEqual(value, sum(d[0] for d in dice) + 3)
+
+        error = self.run_all(self.pool.run(_pool.evaluate, '5 / 0'))[0]
+        self.assertIsInstance(error, util.BadEquation)
+
+        dist = self.run_all(
+            self.pool.run(_pool.evaluate_distribution, '2d6'))[0]
+        self.assertAlmostEqual(dist.mean, 7)
+
+    def test_disabled(self):
+        self.settings.poolSize = 0
+        value, _ = self.run_all(self.pool.run(_pool.evaluate, '1 + 1'))[0]
+        self.assertEqual(value, 2)
+        self.assertFalse(self.pool.running)
+
+    def test_timeout(self):
+        start = time.time()
+        results = self.run_all(
+            self.pool.run(time.sleep, 30),
+            self.pool.run(_pool.evaluate, '1 + 2'))
+        self.assertLess(time.time() - start, 10)
+        self.assertIsInstance(results[0], util.BadEquation)
+        self.assertEqual(results[1], (3, []))
+
+        # The pool is restarted after it was killed
+        value, _ = self.run_all(self.pool.run(_pool.evaluate, '4 * 2'))[0]
+        self.assertEqual(value, 8)
+
+    def test_entropy(self):
+        # The workers roll from the entropy pool of the bot
+        random = config.config.random
+        old = random.source
+        random.source = 'randomorg'
+        pool = truerandom.entropy
+        pool.add(os.urandom(10000))
+        before = (pool.added_bits, pool.used_bits, pool.drawn,
+                  pool.fallback_dice)
+        try:
+            value, dice = self.run_all(
+                self.pool.run(_pool.evaluate, '10d20'))[0]
+        finally:
+            random.source = old
+        self.assertEqual(len(dice), 10)
+        self.assertEqual(pool.drawn - before[2], 10)
+        self.assertEqual(pool.fallback_dice, before[3])
+        self.assertGreater(pool.used_bits, before[1])
+        # The bytes that weren't used were given back
+        self.assertEqual(pool.added_bits, before[0])
+        self.assertEqual(pool.used_bits + pool.available_bits,
+                         pool.added_bits)
+        pool.clear()
+
+    def test_loan(self):
+        # Only enough entropy for the dice of the calculation is lent
+        pool = truerandom.entropy
+        pool.add(os.urandom(10000))
+        before = pool.available_bits
+        try:
+            loan = util.dice.lend_entropy(10)
+            self.assertEqual(len(loan),
+                             math.ceil(10 * pool.bits_per_number / 8) + 8)
+            self.assertEqual(util.dice.lend_entropy(0), b'')
+            util.dice.repay_entropy(dict(data=loan, used_bits=0,
+                                         fallback_dice=0, drawn=0, usage={}))
+            self.assertEqual(pool.available_bits, before)
+
+            value, dice = self.run_all(self.pool.run(
+                _pool.evaluate, '3d6', max_dice=3))[0]
+            self.assertEqual(len(dice), 3)
+        finally:
+            pool.clear()
+
+    def test_seeds(self):
+        # Every worker rolls different numbers, even from the same seed
+        random = config.config.random
+        old = random.source, random.seed
+        random.source, random.seed = 'seeded', 1
+        try:
+            results = self.run_all(self.pool.run(_slow_roll, 2 ** 60),
+                                   self.pool.run(_slow_roll, 2 ** 60))
+        finally:
+            random.source, random.seed = old
+        self.assertNotEqual(results[0], results[1])
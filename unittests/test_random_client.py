@@ -0,0 +1,265 @@
+import unittest
+import asyncio
+import base64
+import http.server
+import json
+import socketserver
+import threading
+import time
+import urllib.parse
+
+from dice_roller.util import truerandom
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    A stand-in for random.org, that does what server.behaviour says.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, text):
+        behaviour = self.server.behaviour
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        if behaviour.get('chunked'):
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(body), 7):
+                chunk = body[i:i + 7]
+                self.wfile.write('{:x}\r\n'.format(len(chunk)).encode())
+                self.wfile.write(chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        # Close the connection without telling the client
+        if behaviour.get('close'):
+            self.close_connection = True
+
+    def do_GET(self):
+        behaviour = self.server.behaviour
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        self.server.paths.append(url.path)
+
+        time.sleep(behaviour.get('delay', 0))
+        if behaviour.get('errors', 0) > 0:
+            behaviour['errors'] -= 1
+            self.send_body(503, 'Error: The server is busy')
+        elif url.path == '/quota/':
+            self.send_body(200, '{}\n'.format(behaviour.get('quota', 1000)))
+        elif url.path == '/integers/':
+            num, min = int(query['num']), int(query['min'])
+            self.send_body(200, ''.join('{}\n'.format(min + i % 256)
+                                        for i in range(num)))
+        else:
+            self.send_body(404, 'Error: Not found')
+
+
+    def do_POST(self):
+        behaviour = self.server.behaviour
+        self.server.paths.append(self.path)
+        request = json.loads(self.rfile.read(
+            int(self.headers['Content-Length'])).decode())
+        params = request['params']
+        self.server.calls.append((request['method'], params))
+
+        answer = dict(jsonrpc='2.0', id=request['id'])
+        if params['apiKey'] != 'key':
+            answer['error'] = dict(code=400, message='Bad key')
+        elif behaviour.get('quota', 1000) <= 0:
+            answer['error'] = dict(code=402, message='Out of bits')
+        elif request['method'] == 'getUsage':
+            answer['result'] = dict(bitsLeft=behaviour.get('quota', 1000))
+        elif request['method'] == 'generateBlobs':
+            size = params['size'] // 8
+            behaviour['quota'] = behaviour.get('quota', 1000) - size * 8
+            data = bytes(i % 256 for i in range(size))
+            answer['result'] = dict(
+                random=dict(data=[base64.b64encode(data).decode()]),
+                bitsUsed=size * 8, bitsLeft=behaviour['quota'],
+                advisoryDelay=behaviour.get('advisoryDelay', 0))
+        self.send_body(200, json.dumps(answer))
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The client gives up on slow answers before they are sent
+        pass
+
+
+class TestRandomOrgClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.behaviour = dict()
+        self.server.connections = 0
+        self.server.paths = list()
+        self.server.calls = list()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.client = self.create_client()
+
+    def tearDown(self):
+        self.client.close()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def create_client(self, **kwargs):
+        settings = dict(timeout=1, retries=2, backoff=0.01,
+                        failure_threshold=2, reset_timeout=0.2)
+        settings.update(kwargs)
+        return truerandom.RandomOrgClient(
+            'http://127.0.0.1:{}'.format(self.server.server_address[1]),
+            **settings)
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def populate(self, count):
+        before = truerandom.entropy.added_bits
+        self.run_async(truerandom.populate_random_buffer(
+            count, True, self.client))
+        return truerandom.entropy.added_bits - before
+
+    def populate_without_quota(self, count):
+        before = truerandom.entropy.added_bits
+        self.run_async(truerandom.populate_random_buffer(
+            count, True, self.client, False))
+        return truerandom.entropy.added_bits - before
+
+    def test_keep_alive(self):
+        self.assertEqual(self.run_async(self.client.quota()), 1000)
+        self.assertEqual(self.run_async(self.client.integers(300, 0, 255)),
+                         [i % 256 for i in range(300)])
+        self.assertEqual(self.populate(50), 400)
+        self.assertEqual(self.client.requests, 4)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_chunked(self):
+        self.server.behaviour['chunked'] = True
+        self.assertEqual(self.run_async(self.client.integers(40, 1, 6)),
+                         [1 + i for i in range(40)])
+        self.assertEqual(self.run_async(self.client.quota()), 1000)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_reconnect(self):
+        self.server.behaviour['close'] = True
+        for _ in range(3):
+            self.assertEqual(self.run_async(self.client.quota()), 1000)
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(self.client.failures, 0)
+
+    def test_retry(self):
+        self.server.behaviour['errors'] = 2
+        self.assertEqual(self.run_async(self.client.quota()), 1000)
+        self.assertEqual(self.server.paths, ['/quota/'] * 3)
+        self.assertEqual(self.client.failures, 0)
+
+        # Errors from the client aren't retried
+        with self.assertRaises(truerandom.RandomOrgError) as context:
+            self.run_async(self.client.get('/missing/'))
+        self.assertEqual(context.exception.status, 404)
+        self.assertEqual(len(self.server.paths), 4)
+        self.assertEqual(self.client.failures, 0)
+
+    def test_timeout(self):
+        self.client = self.create_client(timeout=0.1, retries=0)
+        self.server.behaviour['delay'] = 0.3
+        start = time.monotonic()
+        self.assertRaises(truerandom.RandomOrgError, self.run_async,
+                          self.client.quota())
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual(self.client.failures, 1)
+
+        # urandom is used instead
+        self.assertEqual(self.populate(20), 160)
+
+    def test_quota(self):
+        self.server.behaviour['quota'] = -500
+        self.assertEqual(self.populate(20), 160)
+        self.assertEqual(self.server.paths, ['/quota/'])
+        self.assertEqual(self.client.state, 'closed')
+
+    def test_circuit_breaker(self):
+        self.client = self.create_client(retries=1)
+        self.server.behaviour['errors'] = 100
+        for _ in range(2):
+            self.assertRaises(truerandom.RandomOrgError, self.run_async,
+                              self.client.quota())
+        self.assertEqual(self.client.state, 'open')
+        self.assertEqual(len(self.server.paths), 4)
+
+        # No requests are made while the circuit is open
+        self.assertRaises(truerandom.CircuitOpen, self.run_async,
+                          self.client.quota())
+        self.assertEqual(self.populate(10), 80)
+        self.assertEqual(len(self.server.paths), 4)
+
+        # A single failure opens it again
+        time.sleep(0.2)
+        self.assertEqual(self.client.state, 'half-open')
+        self.assertRaises(truerandom.RandomOrgError, self.run_async,
+                          self.client.quota())
+        self.assertEqual(self.client.state, 'open')
+
+        time.sleep(0.2)
+        self.server.behaviour['errors'] = 0
+        self.assertEqual(self.run_async(self.client.quota()), 1000)
+        self.assertEqual(self.client.state, 'closed')
+        self.assertEqual(self.client.failures, 0)
+
+    def test_blobs(self):
+        self.client = self.create_client(api_key='key')
+        self.assertEqual(self.run_async(self.client.quota()), 1000)
+        data = self.run_async(self.client.random_bytes(100))
+        self.assertEqual(data, bytes(range(100)))
+        self.assertEqual(self.client.bits_left, 200)
+        self.assertEqual(self.server.calls[1], ('generateBlobs', dict(
+            apiKey='key', n=1, size=800, format='base64')))
+
+        # A single request for the pool, with no quota check
+        self.assertEqual(self.populate_without_quota(20), 160)
+        self.assertEqual(self.server.paths, ['/json-rpc/4/invoke'] * 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.client.bits_left, 40)
+
+    def test_blob_errors(self):
+        self.client = self.create_client(api_key='key')
+        self.server.behaviour['quota'] = 0
+        self.assertRaises(truerandom.NoQuotaError, self.run_async,
+                          self.client.random_bytes(10))
+        self.assertEqual(self.populate(10), 80)
+
+        self.client = self.create_client(api_key='wrong')
+        with self.assertRaises(truerandom.RandomOrgError) as context:
+            self.run_async(self.client.quota())
+        self.assertEqual(context.exception.status, 400)
+        self.assertEqual(self.client.failures, 0)
+
+    def test_advisory_delay(self):
+        self.client = self.create_client(api_key='key')
+        self.server.behaviour['advisoryDelay'] = 200
+        self.run_async(self.client.random_bytes(1))
+        start = time.monotonic()
+        self.run_async(self.client.random_bytes(1))
+        self.assertGreater(time.monotonic() - start, 0.15)
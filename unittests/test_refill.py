@@ -0,0 +1,135 @@
+import unittest
+import asyncio
+
+from dice_roller.util import truerandom
+
+
+class _Client:
+    """
+    A stand-in for RandomOrgClient that counts its requests.
+    """
+
+    def __init__(self, quota=10000, rpc=False):
+        self.remaining = quota
+        self.calls = list()
+        self.state = 'closed'
+        self.rpc = rpc
+        self.bits_left = None
+
+    async def quota(self):
+        self.calls.append('quota')
+        return self.remaining
+
+    async def random_bytes(self, count):
+        self.calls.append('bytes')
+        # Let the other requests run while waiting for the answer
+        await asyncio.sleep(0.01)
+        self.remaining -= count * 8
+        if self.rpc:
+            self.bits_left = self.remaining
+        return bytes(range(count))
+
+
+class TestRefiller(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.pool = truerandom.entropy
+        self.pool.clear()
+        self.client = _Client()
+        self.refiller = truerandom.Refiller(
+            self.pool, truerandom.populate_random_buffer, self.client,
+            min_bytes=20, headroom=10, interval=0.05)
+
+    def tearDown(self):
+        task = self.refiller._task
+        self.refiller.stop()
+        if task is not None:
+            self.loop.run_until_complete(
+                asyncio.gather(task, return_exceptions=True))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.pool.clear()
+        self.pool.low_bits = self.pool.LOW_BITS
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_dedupe(self):
+        async def burst():
+            for _ in range(10):
+                self.refiller.request()
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.03)
+
+        self.run_async(burst())
+        self.assertTrue(self.refiller.running)
+        self.assertEqual(self.refiller.requests, 10)
+        self.assertEqual(self.refiller.refills, 1)
+        self.assertEqual(self.client.calls, ['quota', 'bytes'])
+        self.assertEqual(self.pool.available_bits, 20 * 8)
+
+    def test_quota_cache(self):
+        self.run_async(self.refiller.refill())
+        self.pool.clear()
+        self.run_async(self.refiller.refill())
+        self.assertEqual(self.client.calls, ['quota', 'bytes', 'bytes'])
+        self.assertEqual(self.refiller.quota, 10000 - 2 * 20 * 8)
+        self.assertEqual(self.refiller.true_bytes, 40)
+
+        # The pool is filled from urandom once the quota is spent
+        self.refiller.quota = 100
+        self.pool.clear()
+        self.run_async(self.refiller.refill())
+        self.assertEqual(len(self.client.calls), 3)
+        self.assertEqual(self.refiller.urandom_bytes, 20)
+        self.assertEqual(self.pool.available_bits, 20 * 8)
+
+    def test_quota_from_answer(self):
+        self.refiller.client = self.client = _Client(rpc=True)
+        self.client.remaining = 5000
+        for _ in range(3):
+            self.pool.clear()
+            self.run_async(self.refiller.refill())
+        self.assertEqual(self.client.calls, ['quota'] + ['bytes'] * 3)
+        self.assertEqual(self.refiller.quota, 5000 - 3 * 20 * 8)
+
+        # The quota the answer sent is used over the cached one
+        self.client.remaining = 20 * 8
+        self.pool.clear()
+        self.run_async(self.refiller.refill())
+        self.assertEqual(self.refiller.quota, 0)
+        self.pool.clear()
+        self.run_async(self.refiller.refill())
+        self.assertEqual(self.client.calls.count('bytes'), 4)
+
+    def test_rate(self):
+        self.assertEqual(self.refiller.target_bytes, 20)
+        self.assertEqual(self.refiller.low_bits, 20 * 8 // 2)
+
+        # 100 numbers a second for 10 seconds
+        self.pool.add(bytes(2000))
+        self.pool.randints(1000, 6)
+        self.refiller._sampled_at -= 10
+        self.refiller.sample()
+        self.assertAlmostEqual(self.refiller.rate, 100 * (1 - 0.5 ** (1 / 6)),
+                               delta=1)
+
+        bits = self.refiller.rate * self.pool.bits_per_number * 10
+        self.assertEqual(self.refiller.target_bytes, -(-bits // 8))
+        self.assertEqual(self.pool.low_bits, self.refiller.target_bytes * 4)
+        self.assertEqual(self.refiller.state['target_bytes'],
+                         self.refiller.target_bytes)
+
+    def test_background(self):
+        async def drain():
+            self.refiller.request()
+            await asyncio.sleep(0.03)
+            self.pool.randints(self.pool.available_bits, 2)
+            await asyncio.sleep(0.1)
+
+        self.run_async(drain())
+        # The task noticed the empty pool without being asked
+        self.assertEqual(self.refiller.refills, 2)
+        self.assertEqual(self.refiller.requests, 1)
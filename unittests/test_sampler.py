@@ -0,0 +1,91 @@
+import unittest
+import time
+
+from dice_roller import util
+from dice_roller.util import _sampler, _calculator, _budget
+
+
+class TestSampler(unittest.TestCase):
+
+    def test_matches_distribution(self):
+        # The estimates should be close to the exact odds
+        for equation in ['2d6', 'top(4, 6, 3)', 'adv(20)', '(1d4)d6',
+                         'if(1d2 > 1, 1d4, 10)', 'floor(1d20 / 3)']:
+            exact = util.calculator.distribution(equation)
+            samples = util.calculator.sample(equation, 200000, seed=1)
+            self.assertFalse(samples.exact)
+            self.assertAlmostEqual(samples.mean, exact.mean, delta=0.05)
+            self.assertGreaterEqual(samples.min, exact.min)
+            self.assertLessEqual(samples.max, exact.max)
+            self.assertAlmostEqual(samples.at_least(exact.percentile(50)),
+                                   exact.at_least(exact.percentile(50)),
+                                   delta=0.01)
+
+        samples = util.calculator.sample('1d20 + 5 >= 15', 200000, seed=1)
+        self.assertTrue(samples.is_condition)
+        self.assertAlmostEqual(samples.probability(lambda v: v == 1), 0.55,
+                               delta=0.01)
+
+    def test_seed(self):
+        first = util.calculator.sample('3d6 * 1d4', 1000, seed=5)
+        second = util.calculator.sample('3d6 * 1d4', 1000, seed=5)
+        self.assertListEqual(list(first.values), list(second.values))
+
+    def test_branches(self):
+        # Each branch is only sampled for the samples that use it
+        sizes = list()
+        sum_dice = _sampler.sum_dice
+
+        def logged(rng, size, times, sides):
+            sizes.append((sides, size))
+            return sum_dice(rng, size, times, sides)
+
+        _sampler.sum_dice = logged
+        try:
+            util.calculator.sample('if(1d2 > 1, 1d4, 1d8)', 10000, seed=2)
+        finally:
+            _sampler.sum_dice = sum_dice
+
+        sizes = dict(sizes)
+        self.assertEqual(sizes[2], 10000)
+        self.assertEqual(sizes[4] + sizes[8], 10000)
+        self.assertGreater(sizes[4], 4000)
+        self.assertGreater(sizes[8], 4000)
+
+    def test_errors(self):
+        with self.assertRaises(util.BadEquation):
+            util.calculator.sample('1d6 / (1d2 - 1)', 1000)
+        with self.assertRaises(util.BadEquation):
+            util.calculator.sample('1d(1d2 - 1)', 1000)
+
+        # Too many different dice are refused before any are rolled
+        start = time.time()
+        with self.assertRaises(util.BadEquation):
+            util.calculator.sample('(1d500)d(1d1000)', 100000)
+        self.assertLess(time.time() - start, 1)
+
+    def test_budget(self):
+        def sample(equation, **limits):
+            context = _calculator.EvaluationContext(
+                budget=_budget.Budget(**limits))
+            return util.calculator.sample(equation, 1000, context=context)
+
+        sample('if(1d2 > 1, 10d6, 10d4)', dice=11)
+        with self.assertRaises(util.BadEquation):
+            sample('(1d30)d6', dice=20)
+        with self.assertRaises(util.BadEquation):
+            sample('1d6 + 1d6 + 1d6 + 1d6', steps=5)
+        with self.assertRaises(util.BadEquation):
+            sample('1d20^1d300', bits=1024)
+
+    def test_fallback(self):
+        with self.assertRaises(util.BadEquation):
+            util.calculator.distribution('100d100d100')
+        dist = util.calculator.distribution('100d100d100', samples=1000)
+        self.assertFalse(dist.exact)
+        self.assertEqual(len(dist), 1000)
+
+    def test_speed(self):
+        start = time.time()
+        util.calculator.sample('top(4, 6, 3) + 1d20 * 2', 1000000)
+        self.assertLess(time.time() - start, 1)
@@ -0,0 +1,84 @@
+import unittest
+
+from dice_roller import util
+from dice_roller.util import _dice, _calculator, truerandom
+
+
+class TestRandomSource(unittest.TestCase):
+
+    def setUp(self):
+        self.dice = _dice.Dice()
+
+    def test_sources(self):
+        for name in truerandom.SOURCES:
+            source = truerandom.create_source(name, seed=1)
+            self.assertEqual(source.name, name)
+            numbers = source.randints(1000, 7)
+            self.assertEqual(len(numbers), 1000)
+            self.assertEqual(set(numbers), set(range(1, 8)))
+            self.assertTrue(all(type(n) is int for n in numbers))
+            self.assertTrue(1 <= source.randint(2 ** 70) <= 2 ** 70)
+            self.assertEqual(source.randints(0, 6), [])
+        self.assertRaises(ValueError, truerandom.create_source, 'dice')
+
+    def test_seeded(self):
+        first = truerandom.create_source('seeded', seed=5).randints(100, 20)
+        second = truerandom.create_source('seeded', seed=5)
+        self.assertEqual(second.randints(100, 20), first)
+        self.assertNotEqual(second.randints(100, 20), first)
+        second.seed(5)
+        self.assertEqual(second.randints(100, 20), first)
+
+        pcg = truerandom.create_source('pcg64', seed=5).randints(100, 20)
+        self.assertEqual(
+            truerandom.create_source('pcg64', seed=5).randints(100, 20), pcg)
+
+    def test_using(self):
+        default = self.dice.source
+        self.assertIs(self.dice.get_source(), default)
+        self.assertIs(self.dice.server_source(None), default)
+
+        seeded = self.dice.get_source('seeded')
+        self.assertIs(self.dice.get_source('seeded'), seeded)
+        with self.dice.using(seeded):
+            self.assertIs(self.dice.source, seeded)
+            with self.dice.using(truerandom.SeededSource(1)):
+                self.assertIsNot(self.dice.source, seeded)
+            self.assertIs(self.dice.source, seeded)
+        self.assertIs(self.dice.source, default)
+        self.assertRaises(ValueError, self.dice.get_source, 'dice')
+
+        self.dice.reset_sources()
+        self.assertIsNot(self.dice.get_source('seeded'), seeded)
+
+    def test_server(self):
+        class Server:
+            random_source = 'pcg64'
+
+        server = Server()
+        self.assertEqual(self.dice.server_source(server).name, 'pcg64')
+        # Servers can't roll the public sequence of the seeded source
+        server.random_source = 'seeded'
+        self.assertIs(self.dice.server_source(server), self.dice.get_source())
+
+    def test_roll(self):
+        def roll():
+            with self.dice.using(truerandom.SeededSource(9)):
+                return self.dice.roll_dice(20, 50), self.dice.roll(6)
+
+        self.assertEqual(roll(), roll())
+        with self.dice.using(truerandom.PCG64Source()):
+            self.dice.roll_dice(20, 50)
+            self.assertFalse(self.dice.low)
+
+    def test_context(self):
+        def calculate():
+            context = _calculator.EvaluationContext(
+                source=truerandom.SeededSource(4))
+            return [util.calculator.parse_equation('10d20 + 1d6',
+                                                   context=context)
+                    for _ in range(5)]
+
+        self.assertEqual(calculate(), calculate())
+        self.assertIs(_calculator.EvaluationContext().source,
+                      util.dice.get_source())
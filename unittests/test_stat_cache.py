@@ -0,0 +1,88 @@
+import collections
+import unittest
+
+from dice_roller.db import schema
+from dice_roller.util import _stat_cache
+
+User = collections.namedtuple('User', ['id', 'active_server_id'])
+
+
+class FakeSession:
+    """
+    A session that returns the same stats for every query, and counts the
+    queries.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.queries = 0
+
+    def query(self, cls):
+        self.queries += 1
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def all(self):
+        return self.stats
+
+
+class TestStatsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = _stat_cache.StatsCache()
+        self.user = User(10, 1)
+        self.session = FakeSession([
+            schema.Stat(name='str', value='4'),
+            schema.Stat(name='mod', value='{str} / 2', calc=2.0),
+            schema.Stat(name='hp', group='hit', value='3d8'),
+        ])
+
+    def test_get(self):
+        snapshot = self.cache.get(self.session, self.user)
+        self.assertEqual(dict(snapshot.values),
+                         {'str': '4', 'mod': '{str} / 2', 'hit.hp': '3d8'})
+        self.assertEqual(dict(snapshot.calculated),
+                         {'str': '4', 'mod': 2.0, 'hit.hp': '3d8'})
+        with self.assertRaises(TypeError):
+            snapshot.values['str'] = '5'
+
+        self.assertIs(self.cache.get(self.session, self.user), snapshot)
+        self.assertEqual(self.session.queries, 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_invalidate(self):
+        self.cache.get(self.session, self.user)
+
+        # Other users are unchanged
+        self.cache.invalidate(11, 1)
+        self.cache.get(self.session, self.user)
+        self.assertEqual(self.session.queries, 1)
+
+        for args in [(10, 1), (None, 1), (None, None)]:
+            self.cache.invalidate(*args)
+            self.cache.get(self.session, self.user)
+            self.cache.get(self.session, self.user)
+        self.assertEqual(self.session.queries, 4)
+
+    def test_bypass(self):
+        self.cache.get(self.session, self.user)
+        with self.cache.bypass():
+            self.cache.get(self.session, self.user)
+            self.cache.get(self.session, self.user)
+        self.assertEqual(self.session.queries, 3)
+        self.assertFalse(self.cache.bypassed)
+
+    def test_sync(self):
+        bot = _stat_cache.StatsCache()
+        self.cache.get(self.session, self.user)
+
+        self.assertFalse(self.cache.sync(10, 1, bot.version(10, 1)))
+        bot.invalidate(10, 1)
+        bot.invalidate(None, 1)
+        self.assertTrue(self.cache.sync(10, 1, bot.version(10, 1)))
+        self.assertEqual(self.cache.version(10, 1), bot.version(10, 1))
+
+        self.cache.get(self.session, self.user)
+        self.assertEqual(self.session.queries, 2)
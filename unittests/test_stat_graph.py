@@ -0,0 +1,61 @@
+import unittest
+
+from dice_roller import util
+from dice_roller.util._stat_graph import StatGraph, StatCycle
+
+
+class TestStatGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = StatGraph({
+            'str': '16',
+            'level': '3',
+            'mod': 'floor(({str} - 10) / 2)',
+            'atk': '1d20 + {mod} + {prof}',
+            'prof': 'ceil({level} / 4) + 1',
+            'dmg': '1d8 + {mod}',
+            'hit.hp': '{level}d8 + {0?0}',
+        })
+
+    def test_dependencies(self):
+        self.assertEqual(self.graph.dependencies['atk'], {'mod', 'prof'})
+        self.assertEqual(self.graph.dependents['mod'], {'atk', 'dmg'})
+        self.assertEqual(self.graph.affected(['str']),
+                         {'str', 'mod', 'atk', 'dmg'})
+        self.assertEqual(self.graph.affected(['nothing']), set())
+
+    def test_order(self):
+        self.assertEqual(self.graph.order(['str']),
+                         ['str', 'mod', 'atk', 'dmg'])
+        self.assertEqual(self.graph.order(['level']),
+                         ['level', 'hit.hp', 'prof', 'atk'])
+
+        order = self.graph.order()
+        self.assertEqual(len(order), 7)
+        for name, uses in self.graph.dependencies.items():
+            for used in uses & set(order):
+                self.assertLess(order.index(used), order.index(name))
+
+    def test_set(self):
+        self.graph.set('dmg', '1d8 + {level}')
+        self.assertEqual(self.graph.order(['str']), ['str', 'mod', 'atk'])
+        self.graph.remove('atk')
+        self.assertEqual(self.graph.order(['mod']), ['mod'])
+
+    def test_cycle(self):
+        self.graph.set('str', '{dmg} - 1')
+        with self.assertRaises(StatCycle) as context:
+            self.graph.order(['str'])
+        self.assertEqual(context.exception.names,
+                         ['mod', 'str', 'dmg', 'mod'])
+        self.assertIsInstance(context.exception, util.BadEquation)
+        self.assertRaises(StatCycle, self.graph.order)
+
+        # Stats that aren't affected by the cycle can still be ordered
+        self.assertEqual(self.graph.order(['level']),
+                         ['level', 'hit.hp', 'prof', 'atk'])
+
+        self.graph.set('level', '{level} + 1')
+        with self.assertRaises(StatCycle) as context:
+            self.graph.order(['level'])
+        self.assertEqual(context.exception.names, ['level', 'level'])
@@ -0,0 +1,47 @@
+import collections
+import unittest
+
+from dice_roller import util
+from dice_roller.util import _stat_index
+
+Equation = collections.namedtuple('Equation', ['id', 'name'])
+
+
+class TestStatIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = _stat_index.StatIndex()
+        # Index a server without a database
+        self.index.clear(1)
+        server = self.index._servers[1]
+        server.set(1, 10, {'mod'})
+        server.set(2, 10, {'mod:7', 'half'})
+        server.set(3, 11, {':7'})
+        server.set(4, 11, {'half'})
+
+    def test_equation_names(self):
+        self.assertEqual(
+            util.calculator.get_equation_names(
+                'mod:3({0}) + {x?half(2)} + max(1, 2) + {y} + :4'),
+            {'mod:3', 'half', ':4'})
+        self.assertEqual(util.calculator.get_equation_names('1d20 + 5'),
+                         set())
+
+    def test_find(self):
+        self.assertEqual(self.index.find(None, 1, Equation(7, 'mod')),
+                         {1: {'mod'}, 2: {'mod:7'}, 3: {':7'}})
+        self.assertEqual(self.index.find(None, 1, Equation(8, 'MOD')),
+                         {1: {'mod'}, 2: {'mod:7'}})
+        self.assertEqual(self.index.find(None, 1, Equation(9, 'nope')), {})
+
+    def test_update(self):
+        server = self.index._servers[1]
+        server.remove_user(10)
+        self.assertEqual(self.index.find(None, 1, Equation(5, 'half')),
+                         {4: {'half'}})
+        server.set(4, 11, {'mod'})
+        self.assertEqual(self.index.find(None, 1, Equation(5, 'half')), {})
+        self.assertEqual(len(self.index), 2)
+
+        self.index.clear(1)
+        self.assertEqual(len(self.index), 0)
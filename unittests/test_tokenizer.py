@@ -0,0 +1,90 @@
+import unittest
+
+from dice_roller import util
+from dice_roller.util import _tokenizer
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def assertTokens(self, equation, expected):
+        tokens = _tokenizer.tokenize(equation)
+        self.assertListEqual(
+            [(t.type, t.value) for t in tokens],
+            expected
+        )
+
+    def test_types(self):
+        self.assertTokens('max(1d20, 2.5)', [
+            (_tokenizer.IDENTIFIER, 'max'),
+            (_tokenizer.LPAREN, '('),
+            (_tokenizer.NUMBER, 1.0),
+            (_tokenizer.IDENTIFIER, 'd'),
+            (_tokenizer.NUMBER, 20.0),
+            (_tokenizer.COMMA, ','),
+            (_tokenizer.NUMBER, 2.5),
+            (_tokenizer.RPAREN, ')'),
+        ])
+        self.assertTokens('1 <= 2 <> 3', [
+            (_tokenizer.NUMBER, 1.0),
+            (_tokenizer.OPERATOR, '<='),
+            (_tokenizer.NUMBER, 2.0),
+            (_tokenizer.OPERATOR, '<>'),
+            (_tokenizer.NUMBER, 3.0),
+        ])
+
+    def test_identifiers(self):
+        self.assertTokens('mod:12(3)', [
+            (_tokenizer.IDENTIFIER, 'mod:12'),
+            (_tokenizer.LPAREN, '('),
+            (_tokenizer.NUMBER, 3.0),
+            (_tokenizer.RPAREN, ')'),
+        ])
+        self.assertTokens(':12', [(_tokenizer.IDENTIFIER, ':12')])
+        self.assertTokens('ADV', [(_tokenizer.IDENTIFIER, 'adv')])
+
+    def test_params(self):
+        self.assertTokens('$0d$12', [
+            (_tokenizer.PARAM, 0),
+            (_tokenizer.IDENTIFIER, 'd'),
+            (_tokenizer.PARAM, 12),
+        ])
+        self.assertTokens('$', [(_tokenizer.OPERATOR, '$')])
+
+    def test_negative_numbers(self):
+        self.assertTokens('-1', [(_tokenizer.NUMBER, -1.0)])
+        self.assertTokens('2 - -1', [
+            (_tokenizer.NUMBER, 2.0),
+            (_tokenizer.OPERATOR, '-'),
+            (_tokenizer.NUMBER, -1.0),
+        ])
+        self.assertTokens('2-1', [
+            (_tokenizer.NUMBER, 2.0),
+            (_tokenizer.OPERATOR, '-'),
+            (_tokenizer.NUMBER, 1.0),
+        ])
+        self.assertTokens('(2)-1', [
+            (_tokenizer.LPAREN, '('),
+            (_tokenizer.NUMBER, 2.0),
+            (_tokenizer.RPAREN, ')'),
+            (_tokenizer.OPERATOR, '-'),
+            (_tokenizer.NUMBER, 1.0),
+        ])
+
+    def test_whitespace(self):
+        # Whitespace is ignored, even inside of tokens
+        self.assertTokens('1 0 d 2 0', [
+            (_tokenizer.NUMBER, 10.0),
+            (_tokenizer.IDENTIFIER, 'd'),
+            (_tokenizer.NUMBER, 20.0),
+        ])
+
+    def test_offsets(self):
+        tokens = _tokenizer.tokenize(' 1d20 +  adv(20)')
+        self.assertListEqual(
+            [t.offset for t in tokens],
+            [1, 2, 3, 6, 9, 12, 13, 15]
+        )
+
+    def test_bad_numbers(self):
+        self.assertRaises(util.BadEquation, _tokenizer.tokenize, '1.2.3')
+        self.assertRaises(util.BadEquation, _tokenizer.tokenize, '.')
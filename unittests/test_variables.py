@@ -110,3 +110,48 @@ class TestVariableParser(unittest.TestCase):
             KeyError,
             variables.setVariables, 'asdf{aaaa}', 'qwerty', foo='bar', asdf='jeff'
         )
+
+    def test_parse(self):
+        self.assertEqual(
+            variables.parse('asdf{0}{foo?{1?bar}}'),
+            (
+                variables.Literal('asdf'),
+                variables.Positional(0, None),
+                variables.Named('foo', (
+                    variables.Positional(1, (variables.Literal('bar'),)),
+                ))
+            )
+        )
+        # Braces that aren't variables are text
+        self.assertEqual(
+            variables.parse('a{ b }c'),
+            (variables.Literal('a{ b }c'),)
+        )
+        self.assertIs(variables.parse('{foo}'), variables.parse('{foo}'))
+
+    def test_resolve(self):
+        self.assertEqual(
+            variables.resolve('{0} + {mod}', '{str}', mod='{str} / 2', str=4),
+            '4 + 4 / 2'
+        )
+        self.assertEqual(
+            variables.resolve('{bam?{foo}}', foo='{asdf}', asdf='jeff'),
+            'jeff'
+        )
+        self.assertRaises(
+            KeyError,
+            variables.resolve, '{foo}', foo='{bar}'
+        )
+        self.assertRaises(
+            IndexError,
+            variables.resolve, '{foo}', foo='{1}'
+        )
+
+    def test_resolve_recursion(self):
+        with self.assertRaises(variables.RecursiveVariable) as context:
+            variables.resolve('{a}', a='{b}', b='1 + {c}', c='{b}')
+        self.assertEqual(context.exception.names, ['b', 'c', 'b'])
+
+        chain = {'v{}'.format(i): '{{v{}}}'.format(i + 1)
+                 for i in range(variables.MAX_DEPTH + 1)}
+        self.assertRaises(variables.TooDeep, variables.resolve, '{v0}', **chain)